@@ -2,16 +2,43 @@
 Flask web application for the Dynamic Risk Map project.
 This module handles the web routes and serves the UI.
 """
+import time
+_import_started = time.perf_counter()
+
 import os
 import json
+import hashlib
+import hmac
+import multiprocessing
 import sys
-from flask import Flask, render_template, jsonify, request, Blueprint
+import threading
+import click
+from flask import Flask, render_template, jsonify, request, Blueprint, send_file
 import pandas as pd
-import geopandas as gpd
-import csv
-import json
-import csv
-from data.map_rendering import create_risk_map, create_animated_risk_map
+import numpy as np
+from data.risk_store import RiskStore
+from data.yield_store import YieldStore
+from data.response_cache import ResponseCache
+from data.parcels_service import ParcelsService
+from data.geojson_fragments import ZoomFeatureFragments
+from data.geometry_pyramid import GeometryPyramid, zoom_band
+from data.columnar_storage import table_mtime, read_table_checkpoint, read_csv_appended
+from data.startup import DataLoader
+from data.streaming import NDJSON_MIMETYPE, StaleCursorError, parse_page_args, row_positions, paginate, ndjson_lines
+from data.vector_tiles import ParcelTiles, MVT_MIMETYPE, LAYER_NAME, valid_tile
+from data.tile_cache import DiskTileCache
+from data.raster_tiles import RasterTiles, PNG_MIMETYPE, tile_range
+from data.colormaps import get_colormap
+from data.spatial_index import ParcelIndex, parse_bbox, parse_point, MAX_NEAREST
+from data.map_prerender import MapPageCache, prerender_maps, map_variant
+from data.crop_index import CropIndex, ALL_CROPS
+from data.compression import Payload, compressed_response, negotiate, ENCODING_SUFFIXES
+from data.risk_store import RISK_LEVEL_COLUMNS
+
+# geopandas, folium and branca are imported by the data loaders and map
+# routes when first needed, so the process can start serving quickly
+
+_import_seconds = round(time.perf_counter() - _import_started, 4)
 
 # Agregar el módulo de análisis de riesgos al path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules/risk_analysis'))
@@ -19,65 +46,301 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'modules/risk_analysis')
 # Initialize Flask app
 app = Flask(__name__)
 
+PARCELS_FILE = 'data/parcels.geojson'
+CLIMATE_FILE = 'data/climate_risk_30days.csv'
+YIELD_FILE = 'data/yield_predictions.csv'
+INSURANCE_FILE = 'data/insurance_products.csv'
+
+# Startup mode (AGRORISK_STARTUP environment variable):
+# - 'background': load all datasets concurrently as soon as the app is imported
+# - 'lazy': load them on the first request that needs data
+# - 'eager': load them before the module finishes importing
+STARTUP_MODE = os.environ.get('AGRORISK_STARTUP', 'background')
+
+# Generated tiles are kept on disk under a directory per data version; the
+# directories of previous versions are deleted when the version changes
+TILE_CACHE_DIR = os.environ.get('AGRORISK_TILE_CACHE', 'data/tiles')
+
+# Pre-rendered /map pages (AGRORISK_PRERENDER_MAPS=1 renders every variant
+# in the background whenever the data is loaded or reloaded)
+MAP_CACHE_DIR = os.environ.get('AGRORISK_MAP_CACHE', 'data/maps')
+PRERENDER_MAPS = os.environ.get('AGRORISK_PRERENDER_MAPS', '0') == '1'
+
+# POST /api/reload requires this token (Authorization: Bearer <token>) when it
+# is set; without it the endpoint only accepts requests from the local host
+RELOAD_TOKEN = os.environ.get('AGRORISK_RELOAD_TOKEN')
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+# Processes spawned by the pre-render pool re-import the main module (and with
+# it this module) under their own process name; they must not load the
+# datasets or start another pre-render job
+IS_WORKER_PROCESS = multiprocessing.current_process().name != 'MainProcess'
+
+# Dataset loaders, run concurrently by DataLoader
+def _load_parcels(loader):
+    with loader.phase('import geopandas'):
+        import geopandas as gpd
+    parcels_gdf = gpd.read_file(PARCELS_FILE)
+    
+    # Crops as a categorical column with the rows of every crop precomputed
+    parcels_gdf['crop'] = parcels_gdf['crop'].astype('category')
+    crop_index = CropIndex(parcels_gdf['crop'])
+    
+    # One geometry pyramid for the map and the parcel endpoints, with the
+    # topology and simplified levels built before the first zoomed request
+    with loader.phase('simplify parcel geometries'):
+        pyramid = GeometryPyramid(list(parcels_gdf.geometry)).build()
+    
+    # Encode the parcel geometries once for the /map_data responses (the
+    # simplified geometries of each zoom band are encoded on first use)
+    with loader.phase('encode parcel features'):
+        parcel_features = ZoomFeatureFragments.from_geodataframe(parcels_gdf, ['id', 'area', 'soil_type', 'crop'],
+                                                                 pyramid=pyramid)
+    
+    # Spatial index for the viewport (bbox) filters and the point queries
+    with loader.phase('index parcel geometries'):
+        parcel_index = ParcelIndex(pyramid.geometries)
+    
+    # Parcel endpoints, serving every property of the file
+    with loader.phase('encode parcel endpoints'):
+        members = {'type': 'FeatureCollection', 'name': gpd.list_layers(PARCELS_FILE)['name'][0]}
+        parcels_service = ParcelsService.from_geodataframe(parcels_gdf, pyramid, parcel_index, crop_index,
+                                                           members=members)
+    return parcels_gdf, parcel_features, parcel_index, crop_index, parcels_service
+
+def _load_climate(loader):
+    # Load climate data (memory-mapped binary file when available); rows appended
+    # to the CSV after the checkpoint are added by append_climate_data()
+    climate_data, checkpoint = read_table_checkpoint(CLIMATE_FILE)
+    
+    # Index climate data by date and parcel for the request handlers
+    with loader.phase('index climate data'):
+        risk_store = RiskStore(climate_data)
+    return climate_data, risk_store, checkpoint
+
+def _load_yield(loader):
+    # Load yield predictions (re-read only when the file changes)
+    yield_store = YieldStore(YIELD_FILE)
+    yield_store.refresh()
+    return yield_store
+
+def _load_insurance(loader):
+    return pd.read_csv(INSURANCE_FILE, encoding='utf-8')
+
+def _import_map_rendering(loader):
+    # Warm up the folium/branca import used by the map routes
+    with loader.phase('import folium'):
+        import data.map_rendering
+    return data.map_rendering
+
+DATASET_LOADERS = {
+    'parcels': _load_parcels,
+    'climate': _load_climate,
+    'yield': _load_yield,
+    'insurance': _load_insurance,
+    'map_rendering': _import_map_rendering
+}
+
 # Load data
-def load_data():
-    """Load all necessary data files for the application"""
-    parcels_file = 'data/parcels.geojson'
-    climate_file = 'data/climate_risk_30days.csv'
-    yield_file = 'data/yield_predictions.csv'
-    insurance_file = 'data/insurance_products.csv'
-    
-    # Load parcels
-    parcels_gdf = gpd.read_file(parcels_file)
-    
-    # Load climate data
-    climate_data = pd.read_csv(climate_file, encoding='utf-8')
-    
-    # Load yield predictions
-    yield_predictions = pd.read_csv(yield_file, encoding='utf-8')
-    
-    # Load insurance products
-    insurance_products = pd.read_csv(insurance_file, encoding='utf-8')
-    
-    return parcels_gdf, climate_data, yield_predictions, insurance_products
+def load_data(loader=None):
+    """Load all necessary data files for the application (concurrently)"""
+    datasets = (loader or DataLoader(DATASET_LOADERS)).result()
+    parcels_gdf, parcel_features, parcel_index, crop_index, parcels_service = datasets['parcels']
+    climate_data, risk_store, climate_checkpoint = datasets['climate']
+    return (parcels_gdf, climate_data, datasets['yield'], datasets['insurance'],
+            risk_store, parcels_service, parcel_features, parcel_index, crop_index, climate_checkpoint)
+
+# Datasets are set by ensure_data_loaded() once the startup load finishes
+parcels_gdf = climate_data = yield_store = insurance_products = risk_store = parcels_service = parcel_features = None
+parcel_index = crop_index = None
+parcel_tiles = None
+climate_checkpoint = None
+data_version = None
+_data_ready = False
+_data_lock = threading.Lock()
+
+data_loader = DataLoader(DATASET_LOADERS)
+data_loader.timings['import app modules'] = _import_seconds
+
+# Serialized /map_data responses (Payloads, compressed on first use) keyed by
+# (date, risk_type, crop_type, zoom band); viewport (bbox) responses are not
+# cached, as every pan gives a new box that would evict the slider frames
+map_data_cache = ResponseCache('map_data', maxsize=512)
+
+# Vector tiles keyed by (data version, date, z, x, y), backed by the disk cache
+vector_tile_cache = ResponseCache('vector_tiles', maxsize=4096)
+vector_tile_disk = DiskTileCache(TILE_CACHE_DIR, 'mvt')
+
+# Raster risk tiles are only cached on disk
+raster_tile_disk = DiskTileCache(TILE_CACHE_DIR, 'png')
+
+# Map pages by content address of (data version, date, risk type, crop type)
+map_pages = MapPageCache(MAP_CACHE_DIR)
+
+# Full /api/parcels responses and /animated_map pages, kept with their
+# compressed encodings
+payload_cache = ResponseCache('payloads', maxsize=128)
+_prerender_lock = threading.Lock()
 
-# Load data on startup
-parcels_gdf, climate_data, yield_predictions, insurance_products = load_data()
+def _data_version():
+    """Short identifier of the loaded parcels and climate files"""
+    stamp = f"{os.path.getmtime(PARCELS_FILE)}:{table_mtime(CLIMATE_FILE)}"
+    return hashlib.sha1(stamp.encode('utf-8')).hexdigest()[:12]
+
+def _install_data(datasets):
+    global parcels_gdf, climate_data, yield_store, insurance_products, risk_store, parcels_service, parcel_features, _data_ready
+    global parcel_tiles, parcel_index, crop_index, climate_checkpoint, data_version
+    (parcels_gdf, climate_data, yield_store, insurance_products,
+     risk_store, parcels_service, parcel_features, parcel_index, crop_index, climate_checkpoint) = datasets
+    parcel_tiles = ParcelTiles(
+        parcel_features.pyramid,
+        [{'id': props['id'], 'crop': props['crop']} for props in parcel_features.properties]
+    )
+    data_version = _data_version()
+    risk_store.version = data_version
+    _data_ready = True
+    _prune_tile_cache(data_version)
+    if PRERENDER_MAPS:
+        threading.Thread(target=_prerender_job, args=(data_version, risk_store.dates.tolist(), _map_crop_types()),
+                         name='map-prerender', daemon=True).start()
+
+def _prune_tile_cache(version):
+    """Delete the tiles of previous data versions in the background"""
+    # Vector and raster tiles share the version directories of TILE_CACHE_DIR
+    threading.Thread(target=vector_tile_disk.prune, args=(version,), name='tile-prune', daemon=True).start()
+
+def _map_crop_types():
+    """Crop filters of the pre-rendered map pages: all parcels and every single crop"""
+    return (ALL_CROPS,) + tuple(crop_index.crops)
+
+def _prerender_job(version, dates, crop_types):
+    """Pre-render every map page of a data version (one job at a time)"""
+    if not _prerender_lock.acquire(blocking=False):
+        print("Map pre-render already running, skipping")
+        return
+    try:
+        start = time.perf_counter()
+        count = prerender_maps(MAP_CACHE_DIR, version, dates, PARCELS_FILE, CLIMATE_FILE, crop_types=crop_types)
+        print(f"Pre-rendered {count} map pages in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"Error pre-rendering map pages: {str(e)}")
+    finally:
+        _prerender_lock.release()
+
+def ensure_data_loaded():
+    """Wait for the startup data load (starting it in lazy mode) and install the datasets"""
+    if _data_ready:
+        return
+    with _data_lock:
+        if not _data_ready:
+            _install_data(load_data(data_loader))
+
+def reload_data():
+    """Reload all data files and drop every cached response built from them"""
+    from data.map_rendering import clear_map_shells
+    
+    with _data_lock:
+        _install_data(load_data())
+    clear_map_shells()
+    map_data_cache.clear()
+    vector_tile_cache.clear()
+    payload_cache.clear()
+
+def _appended_climate_rows():
+    """Return the rows appended to the climate file since it was loaded, or None if they cannot be appended"""
+    try:
+        rows, checkpoint = read_csv_appended(CLIMATE_FILE, climate_checkpoint)
+    except (OSError, ValueError) as e:
+        print(f"Cannot append climate data: {str(e)}")
+        return None, None
+    if not rows['parcel_id'].isin(parcels_gdf['id']).all():
+        print("Cannot append climate data: it has rows of parcels that are not loaded")
+        return None, None
+    return rows, checkpoint
+
+def append_climate_data():
+    """
+    Add the rows appended to the climate file since it was loaded, updating the
+    risk store indexes instead of reloading every dataset. When the rows only
+    add later dates, the cached responses of the loaded dates are kept; rows of
+    loaded dates start a new data version. Falls back to reload_data() if the
+    file was rewritten or has rows of parcels that are not loaded.
+
+    Returns:
+    int: Number of climate rows added, or None if all the data was reloaded
+    """
+    global climate_data, risk_store, climate_checkpoint, data_version
+    with _data_lock:
+        rows, checkpoint = _appended_climate_rows()
+        if rows is not None and len(rows):
+            last_date = risk_store.max_date
+            later_dates = last_date is not None and rows['date'].min() > last_date
+            if not later_dates:
+                data_version = _data_version()
+                _prune_tile_cache(data_version)
+            risk_store = risk_store.append(rows, version=data_version)
+            climate_data = pd.concat([climate_data, rows[climate_data.columns]], ignore_index=True)
+            if later_dates:
+                # Only responses that fell back from a date that now has data, and
+                # the animated maps of all the dates, are out of date
+                map_data_cache.discard(lambda key: (key[2] if key[0] == 'batch' else key[0]) > last_date)
+                payload_cache.discard(lambda key: key[0] == 'animated_map')
+                new_dates = [date for date in risk_store.dates.tolist() if date > last_date]
+            else:
+                map_data_cache.clear()
+                vector_tile_cache.clear()
+                payload_cache.clear()
+                new_dates = risk_store.dates.tolist()
+            if PRERENDER_MAPS:
+                threading.Thread(target=_prerender_job, args=(data_version, new_dates, _map_crop_types()),
+                                 name='map-prerender', daemon=True).start()
+        if checkpoint is not None:
+            climate_checkpoint = checkpoint
+    if rows is None:
+        reload_data()
+        return None
+    return len(rows)
+
+# Endpoints that can be served before the datasets are loaded
+DATA_FREE_ENDPOINTS = {'readiness', 'static'}
+
+@app.before_request
+def wait_for_data():
+    """Make sure the datasets are loaded before serving routes that use them"""
+    if not _data_ready and request.endpoint not in DATA_FREE_ENDPOINTS:
+        ensure_data_loaded()
+
+if STARTUP_MODE == 'eager' and not IS_WORKER_PROCESS:
+    ensure_data_loaded()
+elif STARTUP_MODE == 'background' and not IS_WORKER_PROCESS:
+    data_loader.start()
+    if PRERENDER_MAPS:
+        # Install the datasets as soon as they load so the pre-render job starts
+        threading.Thread(target=ensure_data_loaded, name='data-install', daemon=True).start()
 
 # Routes
 @app.route('/')
 def index():
     """Main page of the application"""
     # Pass data to template
-    dates = sorted(climate_data['date'].unique())
-    
-    # Check if 'alert' column exists before filtering
-    if 'alert' in climate_data.columns:
-        alerts = climate_data.dropna(subset=['alert']).to_dict('records')
-    else:
-        alerts = []  # No alerts if column doesn't exist
+    dates = risk_store.dates.tolist()
+    alerts = risk_store.alert_records
     
     # Get page number from request, default to 1
     page = request.args.get('page', 1, type=int)
     per_page = 15
     
-    # Read yield predictions from CSV
-    with open('data/yield_predictions.csv', 'r') as file:
-        reader = csv.DictReader(file)
-        yield_predictions = list(reader)
-    
     # Calculate pagination values
-    total_predictions = len(yield_predictions)
+    total_predictions = len(yield_store)
     total_pages = (total_predictions + per_page - 1) // per_page
     start = (page - 1) * per_page
-    end = start + per_page
     
     return render_template(
         'index.html',
         dates=dates,
         alerts=alerts,
         insurance_products=insurance_products.to_dict('records'),
-        yield_predictions=yield_predictions[start:end],
+        yield_predictions=yield_store.page(start, per_page),
         current_page=page,
         total_pages=total_pages,
         total_predictions=total_predictions
@@ -89,14 +352,52 @@ def map_view():
     date = request.args.get('date')
     risk_type = request.args.get('risk_type', 'general')
     crop_type = request.args.get('crop_type', 'all')
+    zoom = request.args.get('zoom', type=int)
     
     if not date:
         date = (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
     
-    # Create the map with the specified parameters
-    risk_map = create_risk_map(date, climate_data, parcels_gdf, risk_type=risk_type, crop_type=crop_type)
-    
-    return risk_map.get_root().render()
+    # Unknown risk types and crops share the page of their normalized variant
+    risk_type, crop_type = map_variant(risk_type, crop_type, crop_index)
+    
+    # Full-resolution pages are served from the pre-rendered files
+    if zoom_band(zoom) is None:
+        data_date = date if risk_store.has_date(date) else risk_store.min_date
+        page_path = map_pages.path(data_version, data_date, risk_type, crop_type)
+        if os.path.exists(page_path):
+            return _page_file_response(page_path)
+    
+    from data.map_rendering import render_risk_map
+    
+    # Fill the cached map shell of this risk and crop type with the date's colours
+    html = render_risk_map(date, climate_data, parcels_gdf, risk_type=risk_type, crop_type=crop_type,
+                           zoom=zoom, pyramid=parcel_features.pyramid, crop_index=crop_index, risk_store=risk_store)
+    if zoom_band(zoom) is None:
+        # The stored copies reuse the body compressed for this response
+        payload = Payload(html)
+        response = _compressed(payload, 'text/html')
+        map_pages.put(data_version, data_date, risk_type, crop_type, payload)
+        return response
+    return _compressed(html, 'text/html')
+
+def _compressed(body, mimetype):
+    """Serve a body (Payload, bytes or str) with the best encoding the client accepts"""
+    return compressed_response(app.response_class, body, mimetype, request.accept_encodings)
+
+def _page_file_response(page_path):
+    """Serve a pre-rendered map page, or its precompressed copy if the client accepts it"""
+    encoding = negotiate(request.accept_encodings, map_pages.encodings(page_path))
+    if encoding:
+        response = send_file(page_path + ENCODING_SUFFIXES[encoding], mimetype='text/html')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(page_path, mimetype='text/html')
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _crop_positions(crop_type):
+    """Return the positions of the parcel features matching a crop filter (None for all)"""
+    return crop_index.positions(crop_type)
 
 @app.route('/map_data')
 def map_data():
@@ -104,68 +405,199 @@ def map_data():
     date = request.args.get('date')
     risk_type = request.args.get('risk_type', 'general')
     crop_type = request.args.get('crop_type', 'all')
+    band = zoom_band(request.args.get('zoom', type=int))
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if not date:
         date = (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
     
-    # Filter data for the selected date
-    date_data = climate_data[climate_data['date'] == date]
-    
-    # If empty, use the earliest date
-    if len(date_data) == 0:
-        earliest_date = climate_data['date'].min()
-        date_data = climate_data[climate_data['date'] == earliest_date]
-    
-    # Calculate risk_level if not present
-    if 'risk_level' not in date_data.columns:
-        if risk_type == 'drought':
-            date_data['risk_level'] = date_data['drought_probability'] / 100.0
-        elif risk_type == 'flood':
-            date_data['risk_level'] = date_data['flood_probability'] / 100.0
-        elif risk_type == 'pest':
-            date_data['risk_level'] = date_data['hail_probability'] / 100.0
-        else:
-            date_data['risk_level'] = date_data['general_risk'] / 100.0
-    
-    # Apply crop type filter if not 'all'
-    filtered_parcels = parcels_gdf
-    if crop_type != 'all':
-        if crop_type.lower() == 'soja':
-            filtered_parcels = parcels_gdf[parcels_gdf['crop'].str.lower() == 'soja']
-        elif crop_type.lower() == 'maiz':
-            filtered_parcels = parcels_gdf[parcels_gdf['crop'].str.lower() == 'maiz']
-    
-    # Create dictionaries for quick lookup
-    risk_map = dict(zip(date_data['parcel_id'], date_data['risk_level']))
-    
-    # Create GeoJSON features
-    features = []
-    for idx, row in filtered_parcels.iterrows():
-        parcel_id = row['id']
-        risk_level = risk_map.get(parcel_id, 0)
-        
-        # Create feature for this parcel
-        feature = {
-            'type': 'Feature',
-            'geometry': row['geometry'].__geo_interface__,
-            'properties': {
-                'id': parcel_id,
-                'risk_level': risk_level,
-                'area': row['area'],
-                'soil_type': row['soil_type'],
-                'crop': row['crop']
+    # Repeated frames of the time slider are served from the cache
+    cache_key = (date, risk_type, crop_index.filter_key(crop_type), band)
+    cached = map_data_cache.get(cache_key) if bbox is None else None
+    if cached is not None:
+        return _compressed(cached, 'application/json')
+    
+    # Use the earliest date if there is no data for the selected one
+    data_date = date if risk_store.has_date(date) else risk_store.min_date
+    parcel_ids, risk_levels = risk_store.risk_levels(data_date, risk_type)
+    
+    # Apply crop type filter if not 'all', and keep only the parcels in the viewport
+    positions = _crop_positions(crop_type)
+    if bbox is not None:
+        in_view = parcel_index.bbox(*bbox)
+        positions = in_view if positions is None else np.intersect1d(positions, in_view)
+    
+    # Risk level of every parcel feature (0 for parcels without data)
+    features = parcel_features.at(band)
+    feature_risk = features.align(parcel_ids, risk_levels, default=0)
+    feature_color = get_colormap(risk_type).hex_colors(feature_risk)
+    
+    # Splice the pre-encoded geometries with this request's risk levels and colours
+    geojson = features.feature_collection(
+        positions,
+        extra_properties={'risk_level': feature_risk, 'color': feature_color},
+        members={'type': 'FeatureCollection', 'risk_type': risk_type, 'date': date}
+    )
+    if bbox is not None:
+        return _compressed(geojson, 'application/json')
+    payload = Payload(geojson)
+    map_data_cache.put(cache_key, payload)
+    return _compressed(payload, 'application/json')
+
+@app.route('/map_data/batch')
+def map_data_batch():
+    """
+    API endpoint returning the parcel geometry once plus a dates x parcels
+    risk matrix, so the time slider can animate a date range locally
+    """
+    store = risk_store
+    start = request.args.get('start') or store.min_date
+    end = request.args.get('end') or store.max_date
+    risk_type = request.args.get('risk_type', 'general')
+    crop_type = request.args.get('crop_type', 'all')
+    band = zoom_band(request.args.get('zoom', type=int))
+    
+    cache_key = ('batch', start, end, risk_type, crop_index.filter_key(crop_type), band)
+    cached = map_data_cache.get(cache_key)
+    if cached is not None:
+        return _compressed(cached, 'application/json')
+    
+    # Dates with data inside the requested range
+    dates = [date for date in store.dates.tolist() if start <= date <= end]
+    
+    # One row of risk levels per date, one column per returned feature
+    positions = _crop_positions(crop_type)
+    features = parcel_features.at(band)
+    matrix = np.zeros((len(dates), len(features)))
+    for i, date in enumerate(dates):
+        parcel_ids, risk_levels = store.risk_levels(date, risk_type)
+        matrix[i] = features.align(parcel_ids, risk_levels, default=0)
+    if positions is not None:
+        matrix = matrix[:, positions]
+    
+    # Missing levels are sent as null (NaN is not valid JSON)
+    risk_rows = np.round(matrix, 4).tolist()
+    for i, j in zip(*np.nonzero(np.isnan(matrix))):
+        risk_rows[i][j] = None
+    
+    # Colours as indices into the lookup table of the risk type
+    lut = get_colormap(risk_type)
+    geojson = features.feature_collection(
+        positions,
+        members={'type': 'FeatureCollection', 'risk_type': risk_type, 'dates': dates, 'risk_levels': risk_rows,
+                 'palette': lut.hex.tolist(), 'colors': lut.indices(matrix).tolist()}
+    )
+    payload = Payload(geojson)
+    map_data_cache.put(cache_key, payload)
+    return _compressed(payload, 'application/json')
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.mvt')
+def vector_tile(z, x, y):
+    """
+    Mapbox Vector Tile of the parcels with their id, crop and the level of
+    every risk type on a date (?date=, the earliest date if it has no data)
+    """
+    if not valid_tile(z, x, y):
+        return jsonify({'error': f'Invalid tile {z}/{x}/{y}'}), 404
+    
+    date = request.args.get('date')
+    data_date = date if risk_store.has_date(date) else risk_store.min_date
+    version = data_version
+    
+    # Memory cache first, then the tile files of this data version
+    cache_key = (version, data_date, z, x, y)
+    tile = vector_tile_cache.get(cache_key)
+    if tile is None:
+        layer = f'{LAYER_NAME}-{data_date}'
+        tile = vector_tile_disk.get(version, layer, z, x, y)
+        if tile is None:
+            # Risk levels of every parcel feature for the date, per risk type
+            parcel_ids, levels = risk_store.risk_type_levels(data_date)
+            features = parcel_features.at(None)
+            attributes = {
+                f'{risk_type}_risk': features.align(parcel_ids, values, default=0)
+                for risk_type, values in levels.items()
             }
-        }
-        
-        features.append(feature)
+            tile = parcel_tiles.render(z, x, y, attributes)
+            vector_tile_disk.put(version, layer, z, x, y, tile)
+        vector_tile_cache.put(cache_key, tile)
     
-    # Return GeoJSON data
-    return jsonify({
-        'type': 'FeatureCollection',
-        'features': features,
-        'risk_type': risk_type,
-        'date': date
-    })
+    return app.response_class(tile, mimetype=MVT_MIMETYPE)
+
+def _raster_tile(risk_type, data_date, z, x, y):
+    """Return a PNG risk tile from the disk cache, rendering and storing it if needed"""
+    version = data_version
+    layer = f'risk-{risk_type}-{data_date}'
+    tile = raster_tile_disk.get(version, layer, z, x, y)
+    if tile is None:
+        # Colour every parcel with the lookup table of the risk type
+        parcel_ids, levels = risk_store.risk_type_levels(data_date)
+        feature_levels = parcel_features.at(None).align(parcel_ids, levels[risk_type], default=0)
+        colors = get_colormap(risk_type).rgb_colors(feature_levels)
+        tile = RasterTiles(parcel_tiles).render(z, x, y, colors)
+        raster_tile_disk.put(version, layer, z, x, y, tile)
+    return tile
+
+@app.route('/tiles/<risk_type>/<int:z>/<int:x>/<int:y>.png')
+def raster_tile(risk_type, z, x, y):
+    """PNG tile of the parcels coloured by the level of a risk type on a date (?date=)"""
+    if risk_type not in RISK_LEVEL_COLUMNS or not valid_tile(z, x, y):
+        return jsonify({'error': f'Invalid tile {risk_type}/{z}/{x}/{y}'}), 404
+    
+    date = request.args.get('date')
+    data_date = date if risk_store.has_date(date) else risk_store.min_date
+    return app.response_class(_raster_tile(risk_type, data_date, z, x, y), mimetype=PNG_MIMETYPE)
+
+@app.cli.command('seed-tiles')
+@click.option('--zoom', 'zoom_range', default='8-12', show_default=True, help='Zoom range to render, e.g. 8-12')
+@click.option('--date', 'dates', multiple=True, help='Date to render (repeatable, default: every date)')
+@click.option('--risk-type', 'risk_types', multiple=True, type=click.Choice(sorted(RISK_LEVEL_COLUMNS)),
+              help='Risk type to render (repeatable, default: every risk type)')
+def seed_tiles(zoom_range, dates, risk_types):
+    """Render the raster risk tiles covering the parcels into the disk cache"""
+    ensure_data_loaded()
+    first, _, last = zoom_range.partition('-')
+    zooms = range(int(first), int(last or first) + 1)
+    dates = dates or risk_store.dates.tolist()
+    risk_types = risk_types or sorted(RISK_LEVEL_COLUMNS)
+    bounds = tuple(parcels_gdf.total_bounds)
+    
+    count = 0
+    for z in zooms:
+        columns, rows = tile_range(bounds, z)
+        for date in dates:
+            for risk_type in risk_types:
+                for x in columns:
+                    for y in rows:
+                        _raster_tile(risk_type, date, z, x, y)
+                        count += 1
+        print(f"Zoom {z}: {len(columns) * len(rows)} tiles per date and risk type")
+    print(f"Seeded {count} tiles in {os.path.join(TILE_CACHE_DIR, data_version)}")
+
+@app.cli.command('append-climate')
+@click.option('--days', type=int, default=1, show_default=True, help='Days to add after the last date of the file')
+@click.option('--seed', type=int, default=None, help='Seed the climate file was generated with')
+def append_climate_command(days, seed):
+    """Append new days, and the parcels without climate data, to the climate file"""
+    import geopandas as gpd
+    from data.data_generation2 import update_climate_data
+    rows = update_climate_data(gpd.read_file(PARCELS_FILE), CLIMATE_FILE, new_days=days, seed=seed)
+    print(f"Appended {len(rows)} climate rows to {CLIMATE_FILE} "
+          f"(POST /api/reload?mode=append adds them to a running server)")
+
+@app.cli.command('prerender-maps')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+@click.option('--force', is_flag=True, help='Render pages that are already in the cache again')
+def prerender_maps_command(workers, force):
+    """Render every date, risk type and crop type /map page into the page cache"""
+    ensure_data_loaded()
+    start = time.perf_counter()
+    count = prerender_maps(MAP_CACHE_DIR, data_version, risk_store.dates.tolist(), PARCELS_FILE, CLIMATE_FILE,
+                           crop_types=_map_crop_types(), workers=workers, skip_existing=not force)
+    print(f"Pre-rendered {count} map pages in {MAP_CACHE_DIR} ({time.perf_counter() - start:.1f}s)")
 
 @app.route('/animated_map')
 def animated_map_view():
@@ -173,105 +605,129 @@ def animated_map_view():
     risk_type = request.args.get('risk_type', 'general')
     crop_type = request.args.get('crop_type', 'all')
     
-    # Create animated map using the imported module
-    m = create_animated_risk_map(parcels_gdf, climate_data, risk_type=risk_type, crop_type=crop_type)
-    
-    # Save map to HTML string
-    map_html = m.get_root().render()
+    # The page only depends on the data, so it is rendered once per variant
+    cache_key = ('animated_map',) + map_variant(risk_type, crop_type, crop_index)
+    payload = payload_cache.get(cache_key)
+    if payload is None:
+        from data.map_rendering import create_animated_risk_map
+        
+        # Create animated map using the imported module
+        m = create_animated_risk_map(parcels_gdf, climate_data, risk_type=risk_type, crop_type=crop_type,
+                                     crop_index=crop_index)
+        
+        # Save map to HTML string
+        payload = Payload(m.get_root().render())
+        payload_cache.put(cache_key, payload)
     
-    return map_html
+    return _compressed(payload, 'text/html')
 
 @app.route('/api/parcels')
 def get_parcels():
-    """API endpoint for getting parcel data"""
-    # Convert to GeoJSON for API response
-    # But DO NOT save to file
-    geojson = parcels_gdf.to_json()
-    return geojson
+    """
+    API endpoint for getting parcel data (?zoom= for simplified geometries,
+    ?format=topojson, ?bbox=west,south,east,north for the parcels in a viewport)
+    """
+    zoom = request.args.get('zoom', type=int)
+    response_format = 'topojson' if request.args.get('format') == 'topojson' else 'geojson'
+    try:
+        bbox = parse_bbox(request.args.get('bbox')) if response_format == 'geojson' else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if bbox is not None:
+        return _compressed(parcels_service.parcels_geojson(zoom, bbox), 'application/json')
+    
+    # Served from the GeoJSON serialized once at startup, compressed once per encoding
+    cache_key = ('parcels', response_format, zoom_band(zoom))
+    payload = payload_cache.get(cache_key)
+    if payload is None:
+        if response_format == 'topojson':
+            payload = Payload(parcels_service.parcels_topojson(zoom))
+        else:
+            payload = Payload(parcels_service.parcels_geojson(zoom))
+        payload_cache.put(cache_key, payload)
+    return _compressed(payload, 'application/json')
+
+@app.route('/api/parcels/at')
+def get_parcels_at():
+    """API endpoint returning the parcels containing a point (?lon=&lat=)"""
+    try:
+        lon, lat = parse_point(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    zoom = request.args.get('zoom', type=int)
+    return _compressed(parcels_service.parcels_at(lon, lat, zoom), 'application/json')
+
+@app.route('/api/parcels/nearest')
+def get_nearest_parcels():
+    """API endpoint returning the k parcels nearest to a point (?lon=&lat=&k=), nearest first"""
+    try:
+        lon, lat = parse_point(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    k = request.args.get('k', 1, type=int)
+    if not 1 <= k <= MAX_NEAREST:
+        return jsonify({'error': f'k must be between 1 and {MAX_NEAREST}'}), 400
+    zoom = request.args.get('zoom', type=int)
+    return _compressed(parcels_service.nearest_parcels(lon, lat, k, zoom), 'application/json')
+
+def _rows_response(records_for, positions, version):
+    """
+    Serve selected store rows (sorted row positions) as a JSON list or as streamed NDJSON
+    
+    With ?limit= and ?after= only one page of rows is served and the cursor of
+    the next page is returned in the X-Next-Cursor header. Cursors of a
+    previous version of the rows are answered with 409 Conflict.
+    """
+    response_format, limit, after = parse_page_args(request.args)
+    try:
+        rows, next_cursor = paginate(positions, limit=limit, after=after, version=version)
+    except StaleCursorError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if response_format == 'ndjson':
+        # Records are converted and sent in chunks instead of all at once
+        response = app.response_class(ndjson_lines(records_for, rows), mimetype=NDJSON_MIMETYPE)
+    else:
+        response = jsonify(records_for(rows))
+    
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/api/risk_data')
 def get_risk_data():
-    """API endpoint for getting risk data"""
-    date = request.args.get('date', climate_data['date'].min())
+    """API endpoint for getting risk data (supports ?format=ndjson and ?limit=&after=)"""
+    date = request.args.get('date', risk_store.min_date)
     parcel_id = request.args.get('parcel_id', None)
     
-    # Filter data
-    filtered_data = climate_data[climate_data['date'] == date]
-    
+    # Select rows from the date index, narrowed to one parcel if requested
+    store = risk_store
     if parcel_id:
-        filtered_data = filtered_data[filtered_data['parcel_id'] == parcel_id]
-    
-    # Convert to records (list of dicts)
-    records = filtered_data.to_dict('records')
-    
-    # Ensure alerts are properly filtered (None, empty strings, NaN values, etc.)
-    for record in records:
-        # Convert NaN values to None (which becomes null in JSON)
-        for key, value in record.items():
-            # Check if value is a float and is NaN
-            if isinstance(value, float) and pd.isna(value):
-                record[key] = None
-        
-        # Specific handling for alert field
-        if pd.isna(record.get('alert')) or not record.get('alert'):
-            record['alert'] = None
+        rows = store.parcel_rows(parcel_id, start_date=date, end_date=date)
+    else:
+        rows = store.date_rows(date)
     
-    return jsonify(records)
+    # Records come back with NaN as None and empty alerts as None
+    try:
+        return _rows_response(store.records, row_positions(rows, len(store)), store.version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/yield_predictions')
 def get_yield_predictions():
-    """API endpoint for getting yield prediction data"""
+    """API endpoint for getting yield prediction data (supports ?format=ndjson and ?limit=&after=)"""
     date = request.args.get('date', '')
     parcel_id = request.args.get('parcel_id', None)
     
     try:
-        # Read data directly from CSV for the most up-to-date information
-        with open('data/yield_predictions.csv', 'r') as file:
-            reader = csv.DictReader(file)
-            predictions_data = list(reader)
-        
-        # Filter by date if provided
-        if date:
-            predictions_data = [row for row in predictions_data if row.get('date') == date]
-        
-        # Filter by parcel_id if provided
-        if parcel_id:
-            predictions_data = [row for row in predictions_data if row.get('parcel_id') == parcel_id]
-        
-        # Enhance data with risk calculations
-        for prediction in predictions_data:
-            # Rename probability fields to risk for frontend consistency
-            prediction['drought_risk'] = prediction.get('drought_probability', '0')
-            prediction['flood_risk'] = prediction.get('flood_probability', '0')
-            prediction['pest_risk'] = prediction.get('hail_probability', '0')  # Using hail as pest for now
-            
-            # Ensure all fields are present even if missing
-            for field in ['predicted_yield', 'confidence', 'drought_risk', 'flood_risk', 'pest_risk', 'crop']:
-                if field not in prediction or not prediction[field]:
-                    prediction[field] = '0' if field != 'crop' else 'Unknown'
-            
-            # Convert numerical fields to float/int for JSON serialization
-            try:
-                prediction['predicted_yield'] = float(prediction['predicted_yield'])
-                prediction['confidence'] = int(prediction['confidence'])
-                prediction['drought_risk'] = float(prediction['drought_risk'])
-                prediction['flood_risk'] = float(prediction['flood_risk'])
-                prediction['pest_risk'] = float(prediction['pest_risk'])
-            except (ValueError, TypeError):
-                # Handle cases where conversion fails
-                if not isinstance(prediction['predicted_yield'], (int, float)):
-                    prediction['predicted_yield'] = 0.0
-                if not isinstance(prediction['confidence'], (int, float)):
-                    prediction['confidence'] = 0
-                if not isinstance(prediction['drought_risk'], (int, float)):
-                    prediction['drought_risk'] = 0.0
-                if not isinstance(prediction['flood_risk'], (int, float)):
-                    prediction['flood_risk'] = 0.0
-                if not isinstance(prediction['pest_risk'], (int, float)):
-                    prediction['pest_risk'] = 0.0
+        # The store re-reads the CSV only when it changes on disk
+        table = yield_store.table
+        positions = row_positions(table.rows(date, parcel_id), len(table))
         
-        print(f"API: Found {len(predictions_data)} yield predictions for date: {date}")
-        return jsonify(predictions_data)
+        print(f"API: Found {len(positions)} yield predictions for date: {date}")
+        return _rows_response(table.records, positions, table.version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in yield predictions API: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -281,59 +737,16 @@ def get_risk_map():
     date = request.args.get('date')
     risk_type = request.args.get('risk_type', 'general')
     crop_type = request.args.get('crop_type', 'all')
+    zoom = request.args.get('zoom', type=int)
     
     if not date:
         return jsonify({'error': 'Date parameter is required'}), 400
     
     # Get GeoJSON for the given date and risk type
     try:
-        geojson_path = os.path.join('data', 'parcels.geojson')
-        with open(geojson_path, 'r') as f:
-            geojson = json.load(f)
-        
-        # Apply crop type filter if specified
-        if crop_type != 'all':
-            filtered_features = []
-            for feature in geojson['features']:
-                if crop_type.lower() == 'soja':
-                    if 'crop' in feature['properties'] and feature['properties']['crop'] and feature['properties']['crop'].lower() == 'soja':
-                        filtered_features.append(feature)
-                elif crop_type.lower() == 'maiz':
-                    if 'crop' in feature['properties'] and feature['properties']['crop'] and feature['properties']['crop'].lower() == 'maiz':
-                        filtered_features.append(feature)
-            
-            # Replace the features with the filtered list
-            geojson['features'] = filtered_features
-        
-        # Apply risk level based on the selected risk type
-        for feature in geojson['features']:
-            if risk_type == 'drought':
-                feature['properties']['risk_level'] = feature['properties'].get('drought_probability', 0) / 100
-            elif risk_type == 'flood':
-                feature['properties']['risk_level'] = feature['properties'].get('flood_probability', 0) / 100
-            elif risk_type == 'pest':
-                feature['properties']['risk_level'] = feature['properties'].get('pest_probability', 0) / 100
-            else:
-                # General risk is an average of all risk factors
-                drought = feature['properties'].get('drought_probability', 0)
-                flood = feature['properties'].get('flood_probability', 0)
-                hail = feature['properties'].get('hail_probability', 0)
-                pest = feature['properties'].get('pest_probability', 0)
-                
-                # Average all available risk factors
-                total = 0
-                count = 0
-                for risk in [drought, flood, hail, pest]:
-                    if risk > 0:
-                        total += risk
-                        count += 1
-                
-                if count > 0:
-                    feature['properties']['risk_level'] = total / (count * 100)
-                else:
-                    feature['properties']['risk_level'] = 0
-        
-        return jsonify(geojson)
+        # Crop filter and risk levels are computed over the parcel property arrays
+        geojson = parcels_service.risk_map_geojson(risk_type=risk_type, crop_type=crop_type, zoom=zoom)
+        return app.response_class(geojson, mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -341,61 +754,17 @@ def get_risk_map():
 def dashboard_summary():
     try:
         # Get total number of parcels
-        with open('data/parcels.geojson') as f:
-            parcels_data = json.load(f)
-            if 'features' not in parcels_data:
-                raise ValueError("Invalid parcels.geojson format: missing 'features' key")
-        total_parcels = len(parcels_data['features'])
+        total_parcels = len(parcels_service)
 
         # Calculate high risk areas using base_risk > 0.35
-        high_risk_areas = sum(1 for feature in parcels_data['features'] 
-                             if feature.get('properties', {}).get('base_risk', 0) > 0.35)
+        high_risk_areas = parcels_service.high_risk_count(0.35)
 
         # Calculate insured parcels (assuming all are insured for now)
         insured_parcels = total_parcels
 
-        # Calculate crop-specific metrics
-        crop_metrics = {}
+        # Calculate crop-specific metrics (precomputed when the yield file is loaded)
         try:
-            with open('data/yield_predictions.csv') as f:
-                reader = csv.DictReader(f)
-                if not reader.fieldnames:
-                    raise ValueError("Empty yield_predictions.csv file")
-
-                required_fields = ['crop', 'predicted_yield', 'drought_probability', 'flood_probability', 'hail_probability']
-                for field in required_fields:
-                    if field not in reader.fieldnames:
-                        raise ValueError(f"Missing required field in yield_predictions.csv: {field}")
-
-                crop_data = {}
-                for row in reader:
-                    try:
-                        crop = row['crop']
-                        if crop not in crop_data:
-                            crop_data[crop] = {
-                                'yield_sum': 0,
-                                'count': 0,
-                                'risk_sum': {'drought': 0, 'flood': 0, 'pest': 0}
-                            }
-                        crop_data[crop]['yield_sum'] += float(row['predicted_yield'])
-                        crop_data[crop]['count'] += 1
-                        crop_data[crop]['risk_sum']['drought'] += float(row['drought_probability'])
-                        crop_data[crop]['risk_sum']['flood'] += float(row['flood_probability'])
-                        crop_data[crop]['risk_sum']['pest'] += float(row['hail_probability'])
-                    except (ValueError, KeyError) as e:
-                        print(f"Error processing row: {row}. Error: {str(e)}")
-                        continue
-
-                # Calculate averages
-                for crop, data in crop_data.items():
-                    crop_metrics[crop] = {
-                        'average_yield': round(data['yield_sum'] / data['count'], 2),
-                        'average_risks': {
-                            'drought': round(data['risk_sum']['drought'] / data['count'], 2),
-                            'flood': round(data['risk_sum']['flood'] / data['count'], 2),
-                            'pest': round(data['risk_sum']['pest'] / data['count'], 2)
-                        }
-                    }
+            crop_metrics = yield_store.table.crop_metrics
         except Exception as e:
             print(f"Error processing yield predictions: {str(e)}")
             crop_metrics = {}
@@ -421,22 +790,23 @@ def get_dashboard_data():
 def get_risk_analysis():
     """API endpoint for getting risk analysis data"""
     # Analysis date can be specified or default to latest
-    date = request.args.get('date', climate_data['date'].max())
+    date = request.args.get('date', risk_store.max_date)
     
     # Get aggregated risk statistics by risk type
     risk_stats = {
-        'drought': climate_data[climate_data['date'] == date]['drought_risk'].mean(),
-        'flood': climate_data[climate_data['date'] == date]['flood_risk'].mean(),
-        'frost': climate_data[climate_data['date'] == date]['frost_risk'].mean(),
-        'hail': climate_data[climate_data['date'] == date]['hail_risk'].mean(),
-        'general': climate_data[climate_data['date'] == date]['overall_risk'].mean()
+        'drought': float(risk_store.column('drought_risk', date).mean()),
+        'flood': float(risk_store.column('flood_risk', date).mean()),
+        'frost': float(risk_store.column('frost_risk', date).mean()),
+        'hail': float(risk_store.column('hail_risk', date).mean()),
+        'general': float(risk_store.column('overall_risk', date).mean())
     }
     
     # Count parcels by risk level
+    overall_risk = risk_store.column('overall_risk', date)
     risk_levels = {
-        'high': len(climate_data[(climate_data['date'] == date) & (climate_data['overall_risk'] > 0.7)]),
-        'medium': len(climate_data[(climate_data['date'] == date) & (climate_data['overall_risk'].between(0.3, 0.7))]),
-        'low': len(climate_data[(climate_data['date'] == date) & (climate_data['overall_risk'] < 0.3)])
+        'high': int((overall_risk > 0.7).sum()),
+        'medium': int(((overall_risk >= 0.3) & (overall_risk <= 0.7)).sum()),
+        'low': int((overall_risk < 0.3).sum())
     }
     
     return jsonify({
@@ -449,7 +819,8 @@ def get_risk_analysis():
 def get_crop_performance():
     """API endpoint for getting crop performance data"""
     # Get date or default to latest
-    date = request.args.get('date', yield_predictions['date'].max())
+    yield_table = yield_store.table
+    date = request.args.get('date', yield_table.dates[-1] if yield_table.dates else None)
     
     # Group by crop and calculate averages
     crop_data = []
@@ -461,16 +832,14 @@ def get_crop_performance():
         crop_parcels = parcels_gdf[parcels_gdf['crop'] == crop_type]['id'].tolist()
         
         # Get yield predictions for these parcels
-        crop_yields = yield_predictions[
-            (yield_predictions['date'] == date) & 
-            (yield_predictions['parcel_id'].isin(crop_parcels))
-        ]
+        rows = yield_table.rows(date=date)
+        rows = rows[np.isin(yield_table.values('parcel_id', rows), crop_parcels)]
         
-        if not crop_yields.empty:
+        if len(rows) > 0:
             crop_data.append({
                 'crop': crop_type,
-                'avg_yield': crop_yields['predicted_yield'].mean(),
-                'avg_health': crop_yields['crop_health'].mean() if 'crop_health' in crop_yields.columns else None,
+                'avg_yield': float(yield_table.values('predicted_yield', rows).mean()),
+                'avg_health': float(yield_table.values('crop_health', rows).mean()) if 'crop_health' in yield_table.columns else None,
                 'parcel_count': len(crop_parcels)
             })
     
@@ -482,6 +851,46 @@ def get_insurance_overview():
     # Simply return all insurance products
     return jsonify(insurance_products.to_dict('records'))
 
+def _reload_allowed():
+    """Whether the request may reload the data (see RELOAD_TOKEN)"""
+    if RELOAD_TOKEN:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode('utf-8'), RELOAD_TOKEN.encode('utf-8'))
+    return request.remote_addr in LOCAL_ADDRESSES
+
+@app.route('/api/reload', methods=['POST'])
+def reload_application_data():
+    """
+    API endpoint for reloading the data files and invalidating cached responses
+    (?mode=append only adds the rows appended to the climate file since it was loaded)
+    """
+    if not _reload_allowed():
+        return jsonify({'error': 'Reloading the data requires a valid token or a local request'}), 403
+    try:
+        if request.args.get('mode') == 'append':
+            added = append_climate_data()
+            if added is not None:
+                return jsonify({'status': 'appended', 'climate_rows_added': added, 'climate_entries': len(risk_store)})
+        else:
+            reload_data()
+        return jsonify({'status': 'reloaded', 'parcels': len(parcels_gdf), 'climate_entries': len(risk_store)})
+    except Exception as e:
+        print(f"Error reloading data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache_stats')
+def get_cache_stats():
+    """API endpoint for getting response cache hit/miss counters"""
+    return jsonify([map_data_cache.stats(), vector_tile_cache.stats(), payload_cache.stats()])
+
+@app.route('/api/ready')
+def readiness():
+    """Readiness endpoint reporting the startup load state and per-phase timings"""
+    # In lazy mode the first readiness probe starts the load in the background
+    data_loader.start()
+    status = data_loader.status()
+    return jsonify(status), 200 if status['state'] == 'ready' else 503
+
 # Ensure the templates and static directories exist
 os.makedirs('templates', exist_ok=True)
 os.makedirs('static', exist_ok=True)
@@ -496,8 +905,10 @@ def risk_analysis():
 # Start the application
 if __name__ == '__main__':
     print("Loading application data...")
+    ensure_data_loaded()
+    print(f"Data loaded in {data_loader.status()['elapsed']}s")
     print(f"Loaded {len(parcels_gdf)} parcels")
     print(f"Loaded {len(climate_data)} climate data entries")
-    print(f"Loaded {len(yield_predictions)} yield predictions")
+    print(f"Loaded {len(yield_store)} yield predictions")
     print("Starting Flask application on http://127.0.0.1:5000/")
     app.run(debug=True, port=5000)
@@ -0,0 +1,93 @@
+"""
+Shared colour lookup tables for the risk renderers.
+Each risk type has a colour scheme and a precomputed 256-entry lookup table,
+so the map functions, /map_data and the tile renderers colour whole risk
+arrays with one vectorized index operation instead of one colormap call per
+feature.
+"""
+import numpy as np
+
+
+# Number of entries of every lookup table (risk levels are quantized to it)
+LUT_SIZE = 256
+
+# Colour stops, legend caption and map title of every risk type
+COLOR_SCHEMES = {
+    # Yellow-orange-red color scheme for drought
+    'drought': (['#ffeb3b', '#ffc107', '#ff9800', '#ff5722'], 'Drought Risk Level', 'Drought Risk Map'),
+    # Blue color scheme for flood
+    'flood': (['#e3f2fd', '#90caf9', '#42a5f5', '#1565c0'], 'Flood Risk Level', 'Flood Risk Map'),
+    # Purple color scheme for pests
+    'pest': (['#f3e5f5', '#ce93d8', '#ab47bc', '#7b1fa2'], 'Pest Risk Level', 'Pest Risk Map'),
+    # Default general risk (green-yellow-red)
+    'general': (['#4caf50', '#cddc39', '#ffeb3b', '#ff9800', '#f44336'], 'Risk Level', 'General Risk Map')
+}
+
+
+def _hex_to_rgb(color):
+    return [int(color[i:i + 2], 16) / 255.0 for i in (1, 3, 5)]
+
+
+class RiskColormap:
+    """
+    Colour scheme of a risk type with its precomputed lookup table.
+
+    Risk levels between vmin and vmax are mapped to LUT_SIZE evenly spaced
+    colours, interpolated linearly between evenly spaced colour stops (the
+    same interpolation as branca's LinearColormap).
+    """
+
+    def __init__(self, colors, caption, title, vmin=0.0, vmax=1.0):
+        """
+        Parameters:
+        colors (list): Hex colour stops from vmin to vmax
+        caption (str): Legend caption
+        title (str): Map title
+        vmin (float): Risk level of the first colour
+        vmax (float): Risk level of the last colour
+        """
+        self.colors = list(colors)
+        self.caption = caption
+        self.title = title
+        self.vmin = vmin
+        self.vmax = vmax
+
+        stops = np.linspace(0.0, 1.0, len(self.colors))
+        samples = np.linspace(0.0, 1.0, LUT_SIZE)
+        channels = np.array([_hex_to_rgb(color) for color in self.colors])
+        rgb = np.column_stack([np.interp(samples, stops, channels[:, j]) for j in range(3)])
+
+        # Lookup tables: RGB bytes and '#rrggbbff' strings
+        self.rgb = np.floor(rgb * 255.9999).astype(np.uint8)
+        self.hex = np.array(['#%02x%02x%02xff' % tuple(color) for color in self.rgb.tolist()], dtype=object)
+
+    def indices(self, levels):
+        """Return the lookup table index of every risk level (NaN counts as vmin)"""
+        levels = np.nan_to_num(np.asarray(levels, dtype=float), nan=self.vmin)
+        scaled = (levels - self.vmin) / (self.vmax - self.vmin) * (LUT_SIZE - 1)
+        return np.clip(np.rint(scaled), 0, LUT_SIZE - 1).astype(np.intp)
+
+    def hex_colors(self, levels):
+        """Return the '#rrggbbff' colour of every risk level"""
+        return self.hex[self.indices(levels)]
+
+    def rgb_colors(self, levels):
+        """Return the uint8 RGB colour of every risk level, shape (n, 3)"""
+        return self.rgb[self.indices(levels)]
+
+    def legend(self):
+        """Return a new branca LinearColormap for a map legend"""
+        import branca.colormap as cm
+        return cm.LinearColormap(colors=self.colors, vmin=self.vmin, vmax=self.vmax, caption=self.caption)
+
+
+# Registry of the lookup tables, built once per process
+RISK_COLORMAPS = {
+    risk_type: RiskColormap(colors, caption, title)
+    for risk_type, (colors, caption, title) in COLOR_SCHEMES.items()
+}
+
+
+def get_colormap(risk_type='general'):
+    """Return the RiskColormap of a risk type (the general one for unknown types)"""
+    return RISK_COLORMAPS.get(risk_type, RISK_COLORMAPS['general'])
@@ -0,0 +1,263 @@
+"""
+Binary columnar storage for the climate and yield tables.
+Converts the CSV files to uncompressed Arrow IPC (Feather v2) files with
+explicit dtypes, which can be memory-mapped at startup instead of parsed as
+text. Loaders fall back to the CSV when pyarrow is not installed or when the
+binary file is missing or older than the CSV. Rows appended to a CSV file
+after it was loaded can be read on their own from a checkpoint of the file.
+
+Usage:
+    python -m data.columnar_storage [csv_file ...]
+"""
+import io
+import os
+import sys
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, the CSV files are always readable
+    pa = None
+    feather = None
+
+
+# Explicit column types of data/climate_risk_30days.csv
+CLIMATE_DTYPES = {
+    'parcel_id': 'object',
+    'date': 'object',
+    'drought_probability': 'int64',
+    'flood_probability': 'int64',
+    'hail_probability': 'int64',
+    'general_risk': 'int64',
+    'alert': 'object',
+    'alert_type': 'object',
+    'risk_level': 'float64',
+    'drought_risk_level': 'float64',
+    'flood_risk_level': 'float64',
+    'pest_risk_level': 'float64',
+    'premium_ha': 'float64',
+    'risk_category': 'object'
+}
+
+# Explicit column types of data/yield_predictions.csv
+YIELD_DTYPES = {
+    'parcel_id': 'object',
+    'date': 'object',
+    'predicted_yield': 'float64',
+    'confidence': 'int64',
+    'drought_probability': 'int64',
+    'flood_probability': 'int64',
+    'hail_probability': 'int64',
+    'crop': 'object'
+}
+
+# Dtypes of the known tables, by CSV file name
+TABLE_DTYPES = {
+    'climate_risk_30days.csv': CLIMATE_DTYPES,
+    'yield_predictions.csv': YIELD_DTYPES
+}
+
+BINARY_EXTENSION = '.arrow'
+
+# Bytes at the end of a CSV file kept in its checkpoint
+CHECKPOINT_BYTES = 4096
+
+
+def binary_path(csv_path):
+    """Return the path of the binary file stored next to a CSV file"""
+    return os.path.splitext(csv_path)[0] + BINARY_EXTENSION
+
+
+def _dtypes_for(csv_path, dtypes=None):
+    return dtypes if dtypes is not None else TABLE_DTYPES.get(os.path.basename(csv_path))
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def has_fresh_binary(csv_path):
+    """Return True if a binary file exists and is at least as recent as its CSV"""
+    if feather is None:
+        return False
+    binary_mtime = _mtime(binary_path(csv_path))
+    if binary_mtime is None:
+        return False
+    csv_mtime = _mtime(csv_path)
+    return csv_mtime is None or binary_mtime >= csv_mtime
+
+
+def table_mtime(csv_path):
+    """Return the modification time of the file read_table would load"""
+    return _mtime(binary_path(csv_path)) if has_fresh_binary(csv_path) else _mtime(csv_path)
+
+
+def read_csv_typed(csv_path, dtypes=None):
+    """
+    Read a CSV file applying the explicit dtypes of its table
+
+    Parameters:
+    csv_path (str): Path to the CSV file
+    dtypes (dict): Column dtypes, defaults to the schema of the known table
+
+    Returns:
+    DataFrame: Table contents
+    """
+    return _read_csv(csv_path, _dtypes_for(csv_path, dtypes))
+
+
+def _read_csv(source, dtypes):
+    if not dtypes:
+        return pd.read_csv(source, encoding='utf-8')
+
+    df = pd.read_csv(source, encoding='utf-8', dtype={
+        column: dtype for column, dtype in dtypes.items() if dtype == 'object'
+    })
+    for column, dtype in dtypes.items():
+        if column in df.columns and dtype != 'object' and df[column].dtype != dtype:
+            # Columns with missing values cannot be held as integers
+            if df[column].isna().any():
+                continue
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def csv_checkpoint(csv_path):
+    """
+    Return a checkpoint of a CSV file for read_csv_appended(): the offset after
+    its last complete line and the bytes before that offset, which identify the
+    file contents the checkpoint was taken from
+    """
+    with open(csv_path, 'rb') as f:
+        start = max(f.seek(0, os.SEEK_END) - CHECKPOINT_BYTES, 0)
+        f.seek(start)
+        tail = f.read()
+    end = tail.rfind(b'\n') + 1
+    return start + end, tail[:end]
+
+
+def read_csv_appended(csv_path, checkpoint, dtypes=None):
+    """
+    Read the rows appended to a CSV file since a checkpoint
+
+    Parameters:
+    csv_path (str): Path to the CSV file
+    checkpoint (tuple): Checkpoint returned by csv_checkpoint() or by a previous call
+    dtypes (dict): Column dtypes, defaults to the schema of the known table
+
+    Returns:
+    tuple: (DataFrame of the appended rows, checkpoint after them); a partially
+    written last line is left for the next call
+
+    Raises:
+    ValueError: If the file was rewritten rather than appended to since the checkpoint
+    """
+    offset, tail = checkpoint
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset - len(tail))
+        if f.read(len(tail)) != tail:
+            raise ValueError(f"{csv_path} was rewritten since it was loaded")
+        appended = f.read()
+
+    # Only complete lines are read
+    end = appended.rfind(b'\n') + 1
+    df = _read_csv(io.BytesIO(header + appended[:end]), _dtypes_for(csv_path, dtypes))
+    tail = (tail + appended[max(end - CHECKPOINT_BYTES, 0):end])[-CHECKPOINT_BYTES:]
+    return df, (offset + end, tail)
+
+
+def read_table(csv_path, dtypes=None):
+    """
+    Load a table, preferring its memory-mapped binary file when it is up to date
+
+    Parameters:
+    csv_path (str): Path to the CSV file of the table
+    dtypes (dict): Column dtypes used when falling back to the CSV
+
+    Returns:
+    DataFrame: Table contents
+    """
+    if has_fresh_binary(csv_path):
+        table = feather.read_table(binary_path(csv_path), memory_map=True)
+        return table.to_pandas()
+    return read_csv_typed(csv_path, dtypes)
+
+
+def read_table_checkpoint(csv_path, dtypes=None):
+    """
+    Load a table like read_table(), with the checkpoint of the CSV rows it holds
+
+    The checkpoint is taken from the CSV bytes that are parsed (or, for the
+    binary file, before it is found to be up to date), so rows appended while
+    the table is loaded are returned by the next read_csv_appended() call
+    instead of being loaded twice.
+
+    Parameters:
+    csv_path (str): Path to the CSV file of the table
+    dtypes (dict): Column dtypes used when falling back to the CSV
+
+    Returns:
+    tuple: (DataFrame of the table contents, checkpoint for read_csv_appended())
+    """
+    checkpoint = csv_checkpoint(csv_path)
+    if has_fresh_binary(csv_path):
+        table = feather.read_table(binary_path(csv_path), memory_map=True)
+        return table.to_pandas(), checkpoint
+
+    with open(csv_path, 'rb') as f:
+        data = f.read()
+    # A partially written last line is left for read_csv_appended()
+    end = data.rfind(b'\n') + 1
+    df = _read_csv(io.BytesIO(data[:end]), _dtypes_for(csv_path, dtypes))
+    return df, (end, data[max(end - CHECKPOINT_BYTES, 0):end])
+
+
+def write_binary(df, csv_path, dtypes=None):
+    """
+    Write a DataFrame as the binary file of a table
+
+    Parameters:
+    df (DataFrame): Table contents
+    csv_path (str): Path to the CSV file of the table (the binary goes next to it)
+    dtypes (dict): Column dtypes to enforce in the binary schema
+
+    Returns:
+    str: Path of the binary file
+    """
+    if feather is None:
+        raise ImportError('pyarrow is required to write binary columnar files')
+
+    dtypes = _dtypes_for(csv_path, dtypes) or {}
+    fields = []
+    for column in df.columns:
+        if dtypes.get(column) == 'object' or df[column].dtype == object:
+            fields.append(pa.field(column, pa.string()))
+        else:
+            fields.append(pa.field(column, pa.from_numpy_dtype(df[column].dtype)))
+
+    table = pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+    # Uncompressed so the file can be memory-mapped without decoding
+    path = binary_path(csv_path)
+    temp_path = path + '.tmp'
+    feather.write_feather(table, temp_path, compression='uncompressed')
+    os.replace(temp_path, path)
+    return path
+
+
+def convert_csv(csv_path, dtypes=None):
+    """Convert a CSV table to its binary file and return the binary path"""
+    df = read_csv_typed(csv_path, dtypes)
+    return write_binary(df, csv_path, dtypes)
+
+
+if __name__ == '__main__':
+    csv_files = sys.argv[1:] or ['data/climate_risk_30days.csv', 'data/yield_predictions.csv']
+    for csv_file in csv_files:
+        path = convert_csv(csv_file)
+        print(f"Converted {csv_file} to {path}")
@@ -0,0 +1,138 @@
+"""
+Compressed HTTP responses for the large map pages and GeoJSON payloads.
+Bodies are wrapped in a Payload that compresses itself once per encoding, so
+cached responses are compressed on their first request and then served as
+stored bytes. Brotli is used when the optional 'brotli' package is installed;
+gzip is always available.
+"""
+import gzip
+import os
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+# Encodings in order of preference (when the client accepts them equally)
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# File suffix of the precompressed copies stored on disk
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Bodies smaller than this are not worth compressing
+MIN_SIZE = 1024
+
+# Maximum compression for stored bodies (compressed once); faster levels for
+# bodies compressed on every request
+STORED_LEVELS = {'br': 11, 'gzip': 9}
+DYNAMIC_LEVELS = {'br': 5, 'gzip': 6}
+
+
+def compress(data, encoding, stored=True):
+    """
+    Compress bytes with a content encoding
+
+    Parameters:
+    data (bytes): Body to compress
+    encoding (str): 'br' or 'gzip'
+    stored (bool): Use the maximum level (the result is cached) or a fast level
+
+    Returns:
+    bytes: Compressed body
+    """
+    level = (STORED_LEVELS if stored else DYNAMIC_LEVELS)[encoding]
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def negotiate(accept_encodings, available=ENCODINGS):
+    """
+    Choose the content encoding of a response
+
+    Parameters:
+    accept_encodings (Accept): Parsed Accept-Encoding header (request.accept_encodings)
+    available (tuple): Encodings the body can be served with, in order of preference
+
+    Returns:
+    str: The accepted encoding with the highest quality, or None for identity
+    """
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class Payload:
+    """
+    Response body with its compressed encodings, each computed on first use.
+    """
+
+    def __init__(self, data):
+        """
+        Parameters:
+        data (bytes or str): Uncompressed body (str is encoded as UTF-8)
+        """
+        self.data = data.encode('utf-8') if isinstance(data, str) else data
+        self._encoded = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def encoded(self, encoding):
+        """Return the body compressed with an encoding (cached)"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = compress(self.data, encoding)
+            self._encoded[encoding] = body
+        return body
+
+
+def compressed_response(response_class, body, mimetype, accept_encodings):
+    """
+    Build a response, compressed with the best encoding the client accepts
+
+    Parameters:
+    response_class (type): Flask response class
+    body (Payload or bytes or str): Response body; Payload bodies keep their
+    compressed encodings, other bodies are compressed at a fast level
+    mimetype (str): Response mimetype
+    accept_encodings (Accept): Parsed Accept-Encoding header
+
+    Returns:
+    Response: Response with Content-Encoding and Vary: Accept-Encoding
+    """
+    if not isinstance(body, Payload):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        encoding = negotiate(accept_encodings) if len(data) >= MIN_SIZE else None
+        content = compress(data, encoding, stored=False) if encoding else data
+    else:
+        encoding = negotiate(accept_encodings) if len(body) >= MIN_SIZE else None
+        content = body.encoded(encoding) if encoding else body.data
+
+    response = response_class(content, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def write_compressed_copies(path, data):
+    """
+    Store the precompressed copies of a file next to it (path + '.gz', '.br')
+
+    Parameters:
+    path (str): Path of the uncompressed file
+    data (bytes or Payload): File contents; the encodings a Payload has already
+    compressed (e.g. for the response) are reused
+    """
+    payload = data if isinstance(data, Payload) else Payload(data)
+    for encoding in ENCODINGS:
+        compressed_path = path + ENCODING_SUFFIXES[encoding]
+        temp_path = f'{compressed_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(payload.encoded(encoding))
+        os.replace(temp_path, compressed_path)
@@ -0,0 +1,100 @@
+"""
+Categorical crop index of the parcels.
+Crop names are normalized and stored as categorical codes once, with the row
+positions of every crop precomputed, so crop filters are answered by index
+lookups instead of lowercasing the crop of every parcel per request. Any crop
+present in the data can be filtered, alone or combined ('soja,maiz'); cache
+keys only keep the crops present in the data, so arbitrary filter values
+cannot create new cache entries.
+"""
+import numpy as np
+import pandas as pd
+
+
+ALL_CROPS = 'all'
+
+# Cache key of the filters that match no crop of the data
+NO_CROPS = 'none'
+
+
+def normalize_crop(crop):
+    """Return the normalized name of a crop (lowercase, no surrounding spaces)"""
+    return str(crop).strip().lower() if crop is not None and crop == crop else ''
+
+
+def normalize_crop_filter(crop_type, known_crops=None):
+    """
+    Normalize a crop filter for use in cache keys
+
+    Parameters:
+    crop_type (str): 'all', one crop, or comma-separated crops (any case)
+    known_crops (list): Normalized crops of the data; other crops are dropped
+
+    Returns:
+    str: 'all', or the distinct normalized crops sorted and comma-separated
+    ('none' if known_crops is given and no requested crop is in it)
+    """
+    if crop_type is None:
+        return ALL_CROPS
+    crops = {normalize_crop(crop) for crop in str(crop_type).split(',')} - {''}
+    if not crops or ALL_CROPS in crops:
+        return ALL_CROPS
+    if known_crops is not None:
+        crops &= set(known_crops)
+        if not crops:
+            return NO_CROPS
+    return ','.join(sorted(crops))
+
+
+class CropIndex:
+    """
+    Crop -> row positions map over the parcels, in row order.
+    """
+
+    def __init__(self, crops):
+        """
+        Parameters:
+        crops (array-like): Crop name of every parcel row (any case)
+        """
+        categories = pd.Categorical([normalize_crop(crop) for crop in crops])
+        self.codes = categories.codes
+        self.crops = [crop for crop in categories.categories.tolist() if crop]
+        self._positions = {
+            crop: np.flatnonzero(self.codes == code)
+            for code, crop in enumerate(categories.categories.tolist())
+        }
+
+    def __len__(self):
+        return len(self.codes)
+
+    def filter_key(self, crop_type=ALL_CROPS):
+        """Return the cache key of a crop filter, keeping only the crops in the data"""
+        return normalize_crop_filter(crop_type, self.crops)
+
+    def positions(self, crop_type=ALL_CROPS):
+        """
+        Return the sorted row positions of the parcels matching a crop filter
+
+        Parameters:
+        crop_type (str): 'all', one crop, or comma-separated crops; crops that
+        are not in the data match no parcels
+
+        Returns:
+        ndarray: Row positions, or None when the filter matches every parcel ('all')
+        """
+        crop_filter = normalize_crop_filter(crop_type)
+        if crop_filter == ALL_CROPS:
+            return None
+        parts = [self._positions[crop] for crop in crop_filter.split(',') if crop in self._positions]
+        if not parts:
+            return np.array([], dtype=np.intp)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def mask(self, crop_type=ALL_CROPS):
+        """Return a boolean mask of the parcels matching a crop filter"""
+        positions = self.positions(crop_type)
+        if positions is None:
+            return np.ones(len(self), dtype=bool)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[positions] = True
+        return mask
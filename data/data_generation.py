@@ -6,32 +6,25 @@ import pandas as pd
 import geopandas as gpd
 from shapely.geometry import Polygon
 from datetime import datetime, timedelta
-import pyproj
 from functools import partial
-from shapely.ops import transform
 import csv
+try:
+    from data.parcel_areas import areas_in_hectares
+except ImportError:  # Running this file directly from the data directory
+    from parcel_areas import areas_in_hectares
+try:
+    from data.portfolio_generator import parcel_name
+except ImportError:  # Running this file directly from the data directory
+    from portfolio_generator import parcel_name
 
-def calculate_area_in_hectares(polygon, lat_center):
+def calculate_area_in_hectares(polygon, lat_center=None):
     """
     Calculate the area of a polygon in hectares
     polygon: shapely Polygon object
-    lat_center: approximate latitude of the center point for projection
+    lat_center: unused, the UTM zone of the projection is chosen from the polygon centroid
+    For many polygons use areas_in_hectares(), which reprojects them in one pass
     """
-    # Create a suitable projection for the area (UTM zone based on latitude)
-    project = pyproj.Transformer.from_crs(
-        'EPSG:4326',  # WGS84
-        'EPSG:32721', # UTM zone 21S
-        always_xy=True
-    ).transform
-    
-    # Apply the projection to the polygon
-    polygon_utm = transform(project, polygon)
-    
-    # Calculate area in square meters and convert to hectares
-    area_m2 = polygon_utm.area
-    area_ha = area_m2 / 10000  # 1 hectare = 10,000 m²
-    
-    return round(area_ha, 2)  # Round to 2 decimal places
+    return float(areas_in_hectares([polygon])[0])
 
 def generate_parcels(n=7):
     """
@@ -71,7 +64,7 @@ def generate_parcels(n=7):
         area = calculate_area_in_hectares(polygon, center_lat)
         
         parcel = {
-            'id': f'Field_{chr(65+i)}',
+            'id': f'Field_{parcel_name(i)}',
             'area': area,
             'soil_type': random.choice(soil_types),
             'crop': 'Soja',
@@ -82,13 +75,125 @@ def generate_parcels(n=7):
     
     return gpd.GeoDataFrame(parcels, geometry='geometry')
 
-def generate_climate_data(parcels_gdf, days=30):
+# Upper bounds (exclusive) of the Low, Moderate, Medium and High categories of the total risk
+RISK_CATEGORY_THRESHOLDS = [0.05, 0.10, 0.20, 0.30]
+RISK_CATEGORIES = ["Low", "Moderate", "Medium", "High", "Extreme"]
+
+# Alert types in order of priority (a row gets the alert of the first hazard above 50%)
+ALERT_TYPES = ['drought', 'flood', 'pest']
+
+# Premium loading: 15% administrative expenses, 10% profit margin and 5% reinsurance costs
+LOADING_FACTOR = 1 + 0.15 + 0.10 + 0.05
+
+# Parcels whose parcels x days grid is computed at once (bounds the memory of the intermediate arrays)
+CLIMATE_CHUNK_SIZE = 10000
+
+def _climate_chunk(streams, base_risk, impacts, crop_value, days):
+    """
+    Compute the climate risk columns of a chunk of parcels as (parcels, days) arrays
+    streams: SeedSequence of every parcel, each parcel draws from its own Generator
+    base_risk: base risk of every parcel (NaN for a random one)
+    impacts: (parcels, 3) drought, flood and pest impact factors
+    crop_value: crop value per hectare of every parcel
+    days: number of days per parcel
+    """
+    n = len(streams)
+    fallback_base_risk = np.empty(n)
+    uniforms = np.empty((4, n, days))
+    for i, stream in enumerate(streams):
+        rng = np.random.default_rng(stream)
+        fallback_base_risk[i] = rng.uniform(0.1, 0.5)
+        uniforms[:, i] = rng.random((4, days))
+    drought_noise, flood_noise, pest_noise, swap_noise = uniforms
+    
+    # Base risk from parcel properties or random if not present
+    base_risk = np.where(np.isnan(base_risk), fallback_base_risk, base_risk)[:, None]
+    
+    # General trend is increasing risk, but with periodic variations
+    day = np.arange(days)
+    day_phase = (day % 7) / 7.0  # Weekly cycle
+    season_phase = (day % 30) / 30.0  # Monthly cycle
+    drought_trend = 0.2 + day * 0.01 + 0.1 * np.sin(day_phase * 2 * np.pi)
+    flood_trend = 0.3 - day * 0.005 + 0.15 * np.sin(season_phase * 2 * np.pi)
+    pest_trend = 0.1 + day * 0.003 + 0.05 * np.sin((day_phase + 0.5) * 2 * np.pi)
+    
+    # Add some randomness (uniform noise of +-0.1, +-0.1 and +-0.05)
+    drought_prob = np.clip(drought_trend + (drought_noise * 0.2 - 0.1), 0.01, 0.95)
+    flood_prob = np.clip(flood_trend + (flood_noise * 0.2 - 0.1), 0.01, 0.95)
+    pest_prob = np.clip(pest_trend + (pest_noise * 0.1 - 0.05), 0.01, 0.95)
+    
+    # Implement strong negative correlation between drought and flood
+    low_prob = 0.01 + swap_noise * 0.04
+    high_drought = drought_prob > 0.5
+    high_flood = ~high_drought & (flood_prob > 0.5)
+    flood_prob = np.where(high_drought, low_prob, flood_prob)
+    drought_prob = np.where(high_flood, low_prob, drought_prob)
+    
+    # Combine with base risk
+    drought_prob = 0.7 * drought_prob + 0.3 * base_risk
+    flood_prob = 0.7 * flood_prob + 0.3 * base_risk
+    pest_prob = 0.7 * pest_prob + 0.3 * base_risk
+    
+    # Calculate expected losses (risk) for each hazard
+    drought_risk = drought_prob * impacts[:, 0:1]
+    flood_risk = flood_prob * impacts[:, 1:2]
+    pest_risk = pest_prob * impacts[:, 2:3]
+    
+    # Calculate total risk using loss expectancy approach
+    # This is the probability-weighted average of potential losses
+    total_risk = drought_risk + flood_risk + pest_risk
+    
+    return {
+        # Convert to percentage for storage (0-100)
+        'drought_probability': np.rint(drought_prob * 100),
+        'flood_probability': np.rint(flood_prob * 100),
+        'hail_probability': np.rint(pest_prob * 100),  # "hail" in column name but used for pest risk
+        # For backward compatibility, store in general_risk as percentage
+        'general_risk': np.rint(total_risk * 100),
+        # Combined risk level for map rendering, using maximum approach for visualization intensity
+        'risk_level': np.maximum(np.maximum(drought_risk, flood_risk), pest_risk),
+        # Individual risk levels (probabilities) for backward compatibility
+        'drought_risk_level': drought_prob,
+        'flood_risk_level': flood_prob,
+        'pest_risk_level': pest_prob,
+        # Calculate premium using actuarial principles (pure risk premium plus loading factors)
+        'premium_ha': np.round(total_risk * crop_value[:, None] * LOADING_FACTOR, 2),
+        # Risk category determination based on total risk (code into RISK_CATEGORIES)
+        'risk_category': np.digitize(total_risk, RISK_CATEGORY_THRESHOLDS),
+        # Expected yield losses (percentages) for the alert messages
+        'drought_loss': np.rint(drought_risk * 100),
+        'flood_loss': np.rint(flood_risk * 100),
+        'pest_loss': np.rint(pest_risk * 100),
+    }
+
+def _alert_codes(prefix, probability, loss, messages):
+    """
+    Return the message code of the rows with an alert
+    probability, loss: integer percentages of every row; each distinct pair is formatted once
+    messages: message -> code of the messages formatted so far, extended with the new ones
+    """
+    pairs, inverse = np.unique(probability * 1000 + loss, return_inverse=True)
+    codes = np.array([
+        messages.setdefault(f'{prefix}{pair // 1000}% probability with estimated {pair % 1000}% yield loss',
+                            len(messages))
+        for pair in pairs.tolist()
+    ], dtype=np.int32)
+    return codes[inverse.ravel()]
+
+def _label_column(labels, codes):
+    """Return the column of labels selected by integer codes (-1 for a missing value)"""
+    return pd.Index(labels).take(codes, allow_fill=True, fill_value=np.nan)
+
+def generate_climate_data(parcels_gdf, days=30, seed=None):
     """
     Generate climate risk data for each parcel and day with improved risk calculation methodology
+    The parcels x days grid is computed with NumPy arrays, in chunks of parcels, and
+    every parcel draws from its own seeded random Generator
     parcels_gdf: GeoDataFrame containing parcel information
     days: number of days to generate data for
+    seed: seed for reproducible data (None for different data on every call); the
+          data of a parcel only depends on the seed and on its position
     """
-    climate_data = []
     base_date = datetime.strptime('2025-01-15', '%Y-%m-%d')
     
     # Define impact severity factors for different crops and risk types
@@ -108,12 +213,6 @@ def generate_climate_data(parcels_gdf, days=30):
     # Default impact factors if crop not in the dictionary
     default_impacts = {'drought': 0.40, 'flood': 0.60, 'pest': 0.25}
     
-    # Administrative and operational cost factors for premium calculation
-    admin_expense_factor = 0.15  # 15% for administrative expenses
-    profit_margin_factor = 0.10  # 10% profit margin
-    reinsurance_factor = 0.05    # 5% for reinsurance costs
-    loading_factor = 1 + admin_expense_factor + profit_margin_factor + reinsurance_factor
-    
     # Base crop values per hectare (USD)
     crop_values = {
         'Soja': 1200,  # $1,200 per hectare
@@ -121,124 +220,75 @@ def generate_climate_data(parcels_gdf, days=30):
     }
     default_value = 1000  # Default value if crop not specified
     
-    for i, parcel in parcels_gdf.iterrows():
-        # Base risk from parcel properties or random if not present
-        base_risk = parcel.get('base_risk', random.uniform(0.1, 0.5))
-        crop_type = parcel.get('crop', 'Soja')
-        
-        # Get crop-specific impact factors and value
-        crop_impacts = impact_factors.get(crop_type, default_impacts)
-        crop_value = crop_values.get(crop_type, default_value)
-        
-        # Risk tends to increase over time
-        for day in range(days):
-            date = base_date + timedelta(days=day)
-            
-            # General trend is increasing risk, but with periodic variations
-            day_phase = (day % 7) / 7.0  # Weekly cycle
-            season_phase = (day % 30) / 30.0  # Monthly cycle
-            
-            # Generate probability values with trends
-            drought_prob = (0.2 + day * 0.01 + 0.1 * np.sin(day_phase * 2 * np.pi))
-            flood_prob = (0.3 - day * 0.005 + 0.15 * np.sin(season_phase * 2 * np.pi))
-            pest_prob = (0.1 + day * 0.003 + 0.05 * np.sin((day_phase + 0.5) * 2 * np.pi))
-            
-            # Add some randomness
-            drought_prob = max(0.01, min(0.95, drought_prob + random.uniform(-0.1, 0.1)))
-            flood_prob = max(0.01, min(0.95, flood_prob + random.uniform(-0.1, 0.1)))
-            pest_prob = max(0.01, min(0.95, pest_prob + random.uniform(-0.05, 0.05)))
-            
-            # Implement strong negative correlation between drought and flood
-            if drought_prob > 0.5:
-                flood_prob = random.uniform(0.01, 0.05)
-            elif flood_prob > 0.5:
-                drought_prob = random.uniform(0.01, 0.05)
-            
-            # Combine with base risk
-            drought_prob = (0.7 * drought_prob + 0.3 * base_risk)
-            flood_prob = (0.7 * flood_prob + 0.3 * base_risk)
-            pest_prob = (0.7 * pest_prob + 0.3 * base_risk)
-            
-            # Convert to percentage for storage (0-100)
-            drought_probability = round(drought_prob * 100)
-            flood_probability = round(flood_prob * 100)
-            hail_probability = round(pest_prob * 100)  # "hail" in column name but used for pest risk
-            
-            # Calculate expected losses (risk) for each hazard
-            drought_risk = drought_prob * crop_impacts['drought']
-            flood_risk = flood_prob * crop_impacts['flood']
-            pest_risk = pest_prob * crop_impacts['pest']
-            
-            # Calculate total risk using loss expectancy approach
-            # This is the probability-weighted average of potential losses
-            total_risk = drought_risk + flood_risk + pest_risk
-            
-            # For backward compatibility, store in general_risk as percentage
-            general_risk = round(total_risk * 100)
-            
-            # Calculate premium using actuarial principles
-            pure_premium = total_risk * crop_value  # Pure risk premium
-            loaded_premium = pure_premium * loading_factor  # Add loading factors
-            premium_ha = round(loaded_premium, 2)  # Premium per hectare
-            
-            # Risk category determination based on total risk
-            risk_category = get_risk_category(total_risk)
-            
-            # Store individual risk levels (probabilities) for backward compatibility
-            drought_risk_level = drought_prob
-            flood_risk_level = flood_prob
-            pest_risk_level = pest_prob
-            
-            # Combined risk level for map rendering (keep as value between 0-1)
-            # Using maximum approach for visualization intensity
-            risk_level = max(drought_risk, flood_risk, pest_risk)
-            
-            # Create record with all required fields
-            record = {
-                'parcel_id': parcel['id'],
-                'date': date.strftime('%Y-%m-%d'),
-                'drought_probability': drought_probability,
-                'flood_probability': flood_probability,
-                'hail_probability': hail_probability,
-                'general_risk': general_risk,
-                'alert': None,  # Will be populated if thresholds exceeded
-                'alert_type': None,  # Will be populated if thresholds exceeded
-                'risk_level': risk_level,  # For map rendering (normalized 0-1)
-                'drought_risk_level': drought_risk_level,  # Keep for backward compatibility
-                'flood_risk_level': flood_risk_level,  # Keep for backward compatibility
-                'pest_risk_level': pest_risk_level,  # Keep for backward compatibility
-                'premium_ha': premium_ha,  # Insurance premium per hectare
-                'risk_category': risk_category  # Risk category label
-            }
-            
-            # Add alert for high risk situations
-            if drought_prob > 0.5:
-                expected_loss = round(drought_prob * crop_impacts['drought'] * 100)
-                record['alert'] = f'High drought risk: {drought_probability}% probability with estimated {expected_loss}% yield loss'
-                record['alert_type'] = 'drought'
-            elif flood_prob > 0.5:
-                expected_loss = round(flood_prob * crop_impacts['flood'] * 100)
-                record['alert'] = f'Flood warning: {flood_probability}% probability with estimated {expected_loss}% yield loss'
-                record['alert_type'] = 'flood'
-            elif pest_prob > 0.5:
-                expected_loss = round(pest_prob * crop_impacts['pest'] * 100)
-                record['alert'] = f'Pest outbreak: {hail_probability}% probability with estimated {expected_loss}% yield loss'
-                record['alert_type'] = 'pest'
-            
-            climate_data.append(record)
+    n = len(parcels_gdf)
+    streams = np.random.SeedSequence(seed).spawn(n)
+    
+    # Per-parcel inputs (NaN base risk where the parcel has none)
+    if 'base_risk' in parcels_gdf.columns:
+        base_risk = pd.to_numeric(parcels_gdf['base_risk'], errors='coerce').to_numpy(dtype=float)
+    else:
+        base_risk = np.full(n, np.nan)
+    crops = parcels_gdf['crop'].to_numpy() if 'crop' in parcels_gdf.columns else np.full(n, 'Soja', dtype=object)
+    impacts = np.array([
+        [impact_factors.get(crop, default_impacts)[hazard] for hazard in ('drought', 'flood', 'pest')]
+        for crop in crops
+    ], dtype=float).reshape(n, 3)
+    crop_value = np.array([crop_values.get(crop, default_value) for crop in crops], dtype=float)
     
-    # Create DataFrame and ensure alert columns exist
-    df = pd.DataFrame(climate_data)
+    # Output columns, filled chunk by chunk (one row per parcel and day, parcels first)
+    columns = {name: np.empty(n * days, dtype=np.int64)
+               for name in ('drought_probability', 'flood_probability', 'hail_probability', 'general_risk')}
+    columns.update({name: np.empty(n * days)
+                    for name in ('risk_level', 'drought_risk_level', 'flood_risk_level', 'pest_risk_level', 'premium_ha')})
+    columns['risk_category'] = np.empty(n * days, dtype=np.int8)
+    
+    # String columns are stored as codes into their distinct labels
+    alert = np.full(n * days, -1, dtype=np.int32)
+    alert_type = np.full(n * days, -1, dtype=np.int8)
+    alert_messages = {}
+    
+    for start in range(0, n, CLIMATE_CHUNK_SIZE):
+        stop = min(start + CLIMATE_CHUNK_SIZE, n)
+        chunk = _climate_chunk(streams[start:stop], base_risk[start:stop], impacts[start:stop],
+                               crop_value[start:stop], days)
+        rows = slice(start * days, stop * days)
+        for name, values in columns.items():
+            values[rows] = chunk[name].ravel()
+        
+        # Add alert for high risk situations: drought first, then flood, then pest
+        drought_alert = chunk['drought_risk_level'].ravel() > 0.5
+        flood_alert = ~drought_alert & (chunk['flood_risk_level'].ravel() > 0.5)
+        pest_alert = ~drought_alert & ~flood_alert & (chunk['pest_risk_level'].ravel() > 0.5)
+        chunk_alert = alert[rows]
+        chunk_alert_type = alert_type[rows]
+        for code, (mask, prefix, probability) in enumerate((
+            (drought_alert, 'High drought risk: ', 'drought_probability'),
+            (flood_alert, 'Flood warning: ', 'flood_probability'),
+            (pest_alert, 'Pest outbreak: ', 'hail_probability'),
+        )):
+            if mask.any():
+                loss = chunk[f'{ALERT_TYPES[code]}_loss'].ravel()[mask].astype(np.int64)
+                chunk_alert[mask] = _alert_codes(prefix, columns[probability][rows][mask], loss, alert_messages)
+                chunk_alert_type[mask] = code
     
-    # Force these columns to exist
-    if 'alert' not in df.columns:
-        df['alert'] = None
-    if 'alert_type' not in df.columns:
-        df['alert_type'] = None
-    if 'risk_level' not in df.columns:
-        df['risk_level'] = df['general_risk'] / 100
+    dates = [(base_date + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(days)]
     
-    return df
+    return pd.DataFrame({
+        'parcel_id': pd.Index(parcels_gdf['id']).repeat(days),
+        'date': _label_column(dates, np.tile(np.arange(days), n)),
+        'drought_probability': columns['drought_probability'],
+        'flood_probability': columns['flood_probability'],
+        'hail_probability': columns['hail_probability'],
+        'general_risk': columns['general_risk'],
+        'alert': _label_column(list(alert_messages), alert),  # Populated where thresholds are exceeded
+        'alert_type': _label_column(ALERT_TYPES, alert_type),
+        'risk_level': columns['risk_level'],
+        'drought_risk_level': columns['drought_risk_level'],
+        'flood_risk_level': columns['flood_risk_level'],
+        'pest_risk_level': columns['pest_risk_level'],
+        'premium_ha': columns['premium_ha'],
+        'risk_category': _label_column(RISK_CATEGORIES, columns['risk_category'])
+    }, copy=False)
 
 def get_risk_category(risk_level):
     """
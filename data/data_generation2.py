@@ -6,32 +6,30 @@ import pandas as pd
 import geopandas as gpd
 from shapely.geometry import Polygon
 from datetime import datetime, timedelta
-import pyproj
 from functools import partial
-from shapely.ops import transform
 import csv
+import hashlib
+try:
+    from data.columnar_storage import read_table
+except ImportError:  # Running this file directly from the data directory
+    from columnar_storage import read_table
+try:
+    from data.parcel_areas import areas_in_hectares
+except ImportError:  # Running this file directly from the data directory
+    from parcel_areas import areas_in_hectares
+try:
+    from data.portfolio_generator import parcel_name
+except ImportError:  # Running this file directly from the data directory
+    from portfolio_generator import parcel_name
 
-def calculate_area_in_hectares(polygon, lat_center):
+def calculate_area_in_hectares(polygon, lat_center=None):
     """
     Calculate the area of a polygon in hectares
     polygon: shapely Polygon object
-    lat_center: approximate latitude of the center point for projection
+    lat_center: unused, the UTM zone of the projection is chosen from the polygon centroid
+    For many polygons use areas_in_hectares(), which reprojects them in one pass
     """
-    # Create a suitable projection for the area (UTM zone based on latitude)
-    project = pyproj.Transformer.from_crs(
-        'EPSG:4326',  # WGS84
-        'EPSG:32721', # UTM zone 21S
-        always_xy=True
-    ).transform
-    
-    # Apply the projection to the polygon
-    polygon_utm = transform(project, polygon)
-    
-    # Calculate area in square meters and convert to hectares
-    area_m2 = polygon_utm.area
-    area_ha = area_m2 / 10000  # 1 hectare = 10,000 m²
-    
-    return round(area_ha, 2)  # Round to 2 decimal places
+    return float(areas_in_hectares([polygon])[0])
 
 def generate_parcels(n=7):
     """
@@ -71,7 +69,7 @@ def generate_parcels(n=7):
         area = calculate_area_in_hectares(polygon, center_lat)
         
         parcel = {
-            'id': f'Field_{chr(65+i)}',
+            'id': f'Field_{parcel_name(i)}',
             'area': area,
             'soil_type': random.choice(soil_types),
             'crop': 'Soja',
@@ -82,94 +80,232 @@ def generate_parcels(n=7):
     
     return gpd.GeoDataFrame(parcels, geometry='geometry')
 
-def generate_climate_data(parcels_gdf, days=30):
+# Upper bounds (exclusive) of the Low, Moderate, Medium and High categories of the general risk
+RISK_CATEGORY_THRESHOLDS = [0.2, 0.4, 0.6, 0.8]
+RISK_CATEGORIES = ["Low", "Moderate", "Medium", "High", "Extreme"]
+
+# Alert types in order of priority (a row gets the alert of the first hazard above 50%)
+ALERT_TYPES = ['drought', 'flood', 'pest']
+
+# Parcels whose parcels x days grid is computed at once (bounds the memory of the intermediate arrays)
+CLIMATE_CHUNK_SIZE = 10000
+
+# Date of the first day of the generated climate series
+CLIMATE_BASE_DATE = '2025-01-15'
+
+def stable_seed(value):
+    """
+    Return a 64-bit seed derived from a string with BLAKE2, the same in every
+    process and interpreter run (unlike hash(), which is randomized per process)
+    """
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'little')
+
+def parcel_streams(parcel_ids, seed=None):
+    """
+    Return the random stream (SeedSequence) of every parcel, derived from the seed and
+    the parcel id, so the data of a parcel does not depend on the other parcels or their order
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    return [np.random.SeedSequence(entropy, spawn_key=(stable_seed(parcel_id),)) for parcel_id in parcel_ids]
+
+def _climate_chunk(streams, base_risk, days, start_day=0):
+    """
+    Compute the climate risk columns of a chunk of parcels as (parcels, days) arrays
+    streams: SeedSequence of every parcel, each parcel draws from its own Generator
+    base_risk: base risk of every parcel (NaN for a random one)
+    days: number of days per parcel
+    start_day: number of the first day (days since CLIMATE_BASE_DATE)
+    """
+    n = len(streams)
+    fallback_base_risk = np.empty(n)
+    uniforms = np.empty((4, n, days))
+    for i, stream in enumerate(streams):
+        rng = np.random.default_rng(stream)
+        fallback_base_risk[i] = rng.uniform(0.1, 0.5)
+        # Every day draws 4 consecutive values, so the earlier days are skipped
+        # without drawing them and a day gets the same values in any date range
+        rng.bit_generator.advance(4 * start_day)
+        uniforms[:, i] = rng.random((days, 4)).T
+    drought_noise, flood_noise, pest_noise, swap_noise = uniforms
+    
+    # Base risk from parcel properties or random if not present
+    base_risk = np.where(np.isnan(base_risk), fallback_base_risk, base_risk)[:, None]
+    
+    # General trend is increasing risk, but with periodic variations
+    day = np.arange(start_day, start_day + days)
+    day_phase = (day % 7) / 7.0  # Weekly cycle
+    season_phase = (day % 30) / 30.0  # Monthly cycle
+    drought_trend = 0.2 + day * 0.01 + 0.1 * np.sin(day_phase * 2 * np.pi)
+    flood_trend = 0.3 - day * 0.005 + 0.15 * np.sin(season_phase * 2 * np.pi)
+    pest_trend = 0.1 + day * 0.003 + 0.05 * np.sin((day_phase + 0.5) * 2 * np.pi)
+    
+    # Add some randomness (uniform noise of +-0.1, +-0.1 and +-0.05)
+    drought_risk = np.clip(drought_trend + (drought_noise * 0.2 - 0.1), 0.01, 0.95)
+    flood_risk = np.clip(flood_trend + (flood_noise * 0.2 - 0.1), 0.01, 0.95)
+    pest_risk = np.clip(pest_trend + (pest_noise * 0.1 - 0.05), 0.01, 0.95)
+    
+    # Implement new rule: if drought risk > 50%, flood risk < 5% and vice versa
+    low_risk = 0.01 + swap_noise * 0.04
+    high_drought = drought_risk > 0.5
+    high_flood = ~high_drought & (flood_risk > 0.5)
+    flood_risk = np.where(high_drought, low_risk, flood_risk)
+    drought_risk = np.where(high_flood, low_risk, drought_risk)
+    
+    # Combine with base risk
+    drought_risk = 0.7 * drought_risk + 0.3 * base_risk
+    flood_risk = 0.7 * flood_risk + 0.3 * base_risk
+    pest_risk = 0.7 * pest_risk + 0.3 * base_risk
+    
+    # Calculate the general risk level (normalized to 0-1 scale)
+    general_risk = (drought_risk + flood_risk + pest_risk) / 3
+    
+    return {
+        'drought_probability': np.rint(drought_risk * 100),
+        'flood_probability': np.rint(flood_risk * 100),
+        'hail_probability': np.rint(pest_risk * 100),
+        'general_risk': np.rint(general_risk * 100),
+        'risk_level': general_risk,  # Risk level for map rendering (normalized 0-1)
+        'drought_risk_level': drought_risk,  # Drought specific risk level
+        'flood_risk_level': flood_risk,  # Flood specific risk level
+        'pest_risk_level': pest_risk,  # Pest specific risk level
+        'premium_ha': np.round(general_risk * 300, 2),  # Insurance premium per hectare
+        # Risk category label (code into RISK_CATEGORIES)
+        'risk_category': np.digitize(general_risk, RISK_CATEGORY_THRESHOLDS),
+    }
+
+def _alert_codes(prefix, probability, messages):
+    """
+    Return the message code of the rows with an alert
+    probability: integer percentage of every row; each distinct value is formatted once
+    messages: message -> code of the messages formatted so far, extended with the new ones
+    """
+    values, inverse = np.unique(probability, return_inverse=True)
+    codes = np.array([messages.setdefault(f'{prefix}{value}%', len(messages)) for value in values.tolist()],
+                     dtype=np.int32)
+    return codes[inverse.ravel()]
+
+def _label_column(labels, codes):
+    """Return the column of labels selected by integer codes (-1 for a missing value)"""
+    return pd.Index(labels).take(codes, allow_fill=True, fill_value=np.nan)
+
+def generate_climate_data(parcels_gdf, days=30, seed=None, start_day=0):
     """
     Generate climate risk data for each parcel and day
+    The parcels x days grid is computed with NumPy arrays, in chunks of parcels, and
+    every parcel draws from its own seeded random Generator
     parcels_gdf: GeoDataFrame containing parcel information
     days: number of days to generate data for
+    seed: seed for reproducible data (None for different data on every call); the
+          data of a parcel and day only depends on the seed and on the parcel id
+    start_day: first day to generate (days since CLIMATE_BASE_DATE), so a later date
+               range can be generated on its own and appended to earlier data
     """
-    climate_data = []
-    base_date = datetime.strptime('2025-01-15', '%Y-%m-%d')
+    base_date = datetime.strptime(CLIMATE_BASE_DATE, '%Y-%m-%d')
     
-    for i, parcel in parcels_gdf.iterrows():
-        # Base risk from parcel properties or random if not present
-        base_risk = parcel.get('base_risk', random.uniform(0.1, 0.5))
-        
-        # Risk tends to increase over time
-        for day in range(days):
-            date = base_date + timedelta(days=day)
-            
-            # General trend is increasing risk, but with periodic variations
-            day_phase = (day % 7) / 7.0  # Weekly cycle
-            season_phase = (day % 30) / 30.0  # Monthly cycle
-            
-            # Generate risk values with trends
-            drought_risk = (0.2 + day * 0.01 + 0.1 * np.sin(day_phase * 2 * np.pi))
-            flood_risk = (0.3 - day * 0.005 + 0.15 * np.sin(season_phase * 2 * np.pi))
-            pest_risk = (0.1 + day * 0.003 + 0.05 * np.sin((day_phase + 0.5) * 2 * np.pi))
-            
-            # Add some randomness
-            drought_risk = max(0.01, min(0.95, drought_risk + random.uniform(-0.1, 0.1)))
-            flood_risk = max(0.01, min(0.95, flood_risk + random.uniform(-0.1, 0.1)))
-            pest_risk = max(0.01, min(0.95, pest_risk + random.uniform(-0.05, 0.05)))
-            
-            # Implement new rule: if drought risk > 50%, flood risk < 5% and vice versa
-            if drought_risk > 0.5:
-                flood_risk = random.uniform(0.01, 0.05)
-            elif flood_risk > 0.5:
-                drought_risk = random.uniform(0.01, 0.05)
-            
-            # Combine with base risk
-            drought_risk = (0.7 * drought_risk + 0.3 * base_risk)
-            flood_risk = (0.7 * flood_risk + 0.3 * base_risk)
-            pest_risk = (0.7 * pest_risk + 0.3 * base_risk)
-            
-            # Calculate the general risk level (normalized to 0-1 scale)
-            general_risk = (drought_risk + flood_risk + pest_risk) / 3
-            
-            # Create record with mandatory fields including alert and alert_type (initially empty)
-            record = {
-                'parcel_id': parcel['id'],
-                'date': date.strftime('%Y-%m-%d'),
-                'drought_probability': round(drought_risk * 100),
-                'flood_probability': round(flood_risk * 100),
-                'hail_probability': round(pest_risk * 100),
-                'general_risk': round(general_risk * 100),
-                'alert': None,  # Always include alert column but set to None by default
-                'alert_type': None,  # Always include alert_type column but set to None by default
-                'risk_level': general_risk,  # Add risk_level for map rendering (normalized 0-1)
-                'drought_risk_level': drought_risk,  # Add drought specific risk level
-                'flood_risk_level': flood_risk,  # Add flood specific risk level
-                'pest_risk_level': pest_risk,  # Add pest specific risk level
-                'premium_ha': round(general_risk * 300, 2),  # Insurance premium per hectare
-                'risk_category': get_risk_category(general_risk)  # Risk category label
-            }
-            
-            # Add alert for high risk situations
-            if drought_risk > 0.5:
-                record['alert'] = f'High drought risk: {round(drought_risk * 100)}%'
-                record['alert_type'] = 'drought'
-            elif flood_risk > 0.5:
-                record['alert'] = f'Flood warning: {round(flood_risk * 100)}%'
-                record['alert_type'] = 'flood'
-            elif pest_risk > 0.5:
-                record['alert'] = f'Pest outbreak: {round(pest_risk * 100)}%'
-                record['alert_type'] = 'pest'
-            
-            climate_data.append(record)
-    
-    # Create DataFrame and ensure alert columns exist
-    df = pd.DataFrame(climate_data)
-    
-    # Force these columns to exist
-    if 'alert' not in df.columns:
-        df['alert'] = None
-    if 'alert_type' not in df.columns:
-        df['alert_type'] = None
-    if 'risk_level' not in df.columns:
-        df['risk_level'] = df['general_risk'] / 100
+    n = len(parcels_gdf)
+    streams = parcel_streams(parcels_gdf['id'], seed)
     
-    return df
+    # Base risk from parcel properties (NaN where the parcel has none)
+    if 'base_risk' in parcels_gdf.columns:
+        base_risk = pd.to_numeric(parcels_gdf['base_risk'], errors='coerce').to_numpy(dtype=float)
+    else:
+        base_risk = np.full(n, np.nan)
+    
+    # Output columns, filled chunk by chunk (one row per parcel and day, parcels first)
+    columns = {name: np.empty(n * days, dtype=np.int64)
+               for name in ('drought_probability', 'flood_probability', 'hail_probability', 'general_risk')}
+    columns.update({name: np.empty(n * days)
+                    for name in ('risk_level', 'drought_risk_level', 'flood_risk_level', 'pest_risk_level', 'premium_ha')})
+    columns['risk_category'] = np.empty(n * days, dtype=np.int8)
+    
+    # String columns are stored as codes into their distinct labels
+    alert = np.full(n * days, -1, dtype=np.int32)
+    alert_type = np.full(n * days, -1, dtype=np.int8)
+    alert_messages = {}
+    
+    for start in range(0, n, CLIMATE_CHUNK_SIZE):
+        stop = min(start + CLIMATE_CHUNK_SIZE, n)
+        chunk = _climate_chunk(streams[start:stop], base_risk[start:stop], days, start_day)
+        rows = slice(start * days, stop * days)
+        for name, values in columns.items():
+            values[rows] = chunk[name].ravel()
+        
+        # Add alert for high risk situations: drought first, then flood, then pest
+        drought_alert = chunk['drought_risk_level'].ravel() > 0.5
+        flood_alert = ~drought_alert & (chunk['flood_risk_level'].ravel() > 0.5)
+        pest_alert = ~drought_alert & ~flood_alert & (chunk['pest_risk_level'].ravel() > 0.5)
+        chunk_alert = alert[rows]
+        chunk_alert_type = alert_type[rows]
+        for code, (mask, prefix, probability) in enumerate((
+            (drought_alert, 'High drought risk: ', 'drought_probability'),
+            (flood_alert, 'Flood warning: ', 'flood_probability'),
+            (pest_alert, 'Pest outbreak: ', 'hail_probability'),
+        )):
+            if mask.any():
+                chunk_alert[mask] = _alert_codes(prefix, columns[probability][rows][mask], alert_messages)
+                chunk_alert_type[mask] = code
+    
+    dates = [(base_date + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(start_day, start_day + days)]
+    
+    return pd.DataFrame({
+        'parcel_id': pd.Index(parcels_gdf['id']).repeat(days),
+        'date': _label_column(dates, np.tile(np.arange(days), n)),
+        'drought_probability': columns['drought_probability'],
+        'flood_probability': columns['flood_probability'],
+        'hail_probability': columns['hail_probability'],
+        'general_risk': columns['general_risk'],
+        'alert': _label_column(list(alert_messages), alert),  # Populated where thresholds are exceeded
+        'alert_type': _label_column(ALERT_TYPES, alert_type),
+        'risk_level': columns['risk_level'],
+        'drought_risk_level': columns['drought_risk_level'],
+        'flood_risk_level': columns['flood_risk_level'],
+        'pest_risk_level': columns['pest_risk_level'],
+        'premium_ha': columns['premium_ha'],
+        'risk_category': _label_column(RISK_CATEGORIES, columns['risk_category'])
+    }, copy=False)
+
+def update_climate_data(parcels_gdf, climate_file='data/climate_risk_30days.csv', new_days=1, seed=None):
+    """
+    Append climate risk data to an existing climate file instead of regenerating it
+    Rows are only generated for the new days after the last date of the file (for the
+    parcels already in it) and for every date of the parcels that have no rows yet, and
+    are appended to the file with its column order
+    parcels_gdf: GeoDataFrame containing parcel information
+    climate_file: path to the climate CSV file
+    new_days: number of days to add after the last date of the file
+    seed: seed of the data (the seed the file was generated with continues its series)
+    Returns the DataFrame of the appended rows (empty if there was nothing to add)
+    """
+    columns = list(pd.read_csv(climate_file, nrows=0).columns)
+    existing = pd.read_csv(climate_file, usecols=['parcel_id', 'date'], dtype=str)
+    
+    # Day numbers of the first and last dates of the file
+    base_date = datetime.strptime(CLIMATE_BASE_DATE, '%Y-%m-%d')
+    first_day = (datetime.strptime(existing['date'].min(), '%Y-%m-%d') - base_date).days
+    last_day = (datetime.strptime(existing['date'].max(), '%Y-%m-%d') - base_date).days
+    
+    known = parcels_gdf['id'].astype(str).isin(existing['parcel_id'].unique()).to_numpy()
+    parts = []
+    if (~known).any():
+        # Parcels added since the file was generated get its whole date range
+        parts.append(generate_climate_data(parcels_gdf[~known], last_day + new_days - first_day + 1, seed,
+                                           start_day=first_day))
+    if new_days > 0 and known.any():
+        parts.append(generate_climate_data(parcels_gdf[known], new_days, seed, start_day=last_day + 1))
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    
+    rows = pd.concat(parts, ignore_index=True).reindex(columns=columns)
+    
+    # Appended rows must start on a new line
+    with open(climate_file, 'rb') as f:
+        f.seek(max(os.path.getsize(climate_file) - 1, 0))
+        needs_newline = f.read(1) not in (b'\n', b'')
+    with open(climate_file, 'a', encoding='utf-8', newline='') as f:
+        if needs_newline:
+            f.write('\n')
+        rows.to_csv(f, header=False, index=False, lineterminator='\n')
+    return rows
 
 def get_risk_category(risk_level):
     """Convert numerical risk level to category label"""
@@ -239,18 +375,8 @@ def load_or_generate_parcels(parcels_file='data/parcels.geojson', n=7):
         parcels_gdf = gpd.read_file(parcels_file)
         print(f"Loaded existing parcels from {parcels_file}")
         
-        # Recalculate areas based on actual geometries
-        for idx, row in parcels_gdf.iterrows():
-            # Get the centroid latitude for better projection
-            centroid = row['geometry'].centroid
-            lat_center = centroid.y
-            
-            # Update area with calculated value - ensure it's the right data type
-            area_value = float(calculate_area_in_hectares(row['geometry'], lat_center))
-            # Convert the area column to float type if it's not already
-            if parcels_gdf['area'].dtype != 'float64':
-                parcels_gdf['area'] = parcels_gdf['area'].astype(float)
-            parcels_gdf.at[idx, 'area'] = area_value
+        # Recalculate areas based on actual geometries (one vectorized pass per UTM zone)
+        parcels_gdf['area'] = areas_in_hectares(parcels_gdf.geometry)
             
     else:
         # Only generate new parcels if file doesn't exist
@@ -263,7 +389,7 @@ def load_or_generate_parcels(parcels_file='data/parcels.geojson', n=7):
     return parcels_gdf
 
 # Function to initialize all data
-def initialize_data(days=30, force_regenerate_climate=False, force_regenerate_yield=False):
+def initialize_data(days=30, force_regenerate_climate=False, force_regenerate_yield=False, append_climate_days=0):
     """
     Initialize all data for the dynamic risk map application
     
@@ -271,6 +397,7 @@ def initialize_data(days=30, force_regenerate_climate=False, force_regenerate_yi
     days (int): Number of days to generate data for
     force_regenerate_climate (bool): If True, regenerate climate data even if file exists
     force_regenerate_yield (bool): If True, regenerate yield predictions even if file exists
+    append_climate_days (int): Days to append to an existing climate file (without regenerating it)
     
     Returns:
     tuple: (parcels_gdf, climate_data, yield_predictions, insurance_products)
@@ -283,7 +410,10 @@ def initialize_data(days=30, force_regenerate_climate=False, force_regenerate_yi
     climate_file = 'data/climate_risk_30days.csv'
     if os.path.exists(climate_file) and not force_regenerate_climate:
         try:
-            climate_data = pd.read_csv(climate_file)
+            if append_climate_days:
+                appended = update_climate_data(parcels_gdf, climate_file, append_climate_days)
+                print(f"Appended {len(appended)} climate data rows to {climate_file}")
+            climate_data = read_table(climate_file)
             print(f"Loaded existing climate data from {climate_file}")
         except Exception as e:
             print(f"Error loading climate data: {e}. Regenerating...")
@@ -298,15 +428,15 @@ def initialize_data(days=30, force_regenerate_climate=False, force_regenerate_yi
     yield_file = 'data/yield_predictions.csv'
     if os.path.exists(yield_file) and not force_regenerate_yield:
         try:
-            yield_predictions = pd.read_csv(yield_file)
+            yield_predictions = read_table(yield_file)
             print(f"Loaded existing yield predictions from {yield_file}")
         except Exception as e:
             print(f"Error loading yield predictions: {e}. Regenerating...")
             update_yield_predictions()
-            yield_predictions = pd.read_csv(yield_file)
+            yield_predictions = read_table(yield_file)
     else:
         update_yield_predictions()
-        yield_predictions = pd.read_csv(yield_file)
+        yield_predictions = read_table(yield_file)
         print(f"Generated new yield predictions and saved to {yield_file}")
     
     # Insurance products
@@ -326,13 +456,22 @@ def initialize_data(days=30, force_regenerate_climate=False, force_regenerate_yi
     
     return parcels_gdf, climate_data, yield_predictions, insurance_products
 
+# Parcels whose yield predictions are computed and written at once
+YIELD_CHUNK_SIZE = 10000
+
+# CSV text of the integer percentages 0-100
+PERCENT_STRINGS = np.array([str(value) for value in range(101)], dtype=object)
+
 # Function to update yield predictions that PRESERVES original crop types
-def update_yield_predictions():
+def update_yield_predictions(input_file="data/parcels.geojson", output_file="data/yield_predictions.csv", days=30):
     """
     Update the yield_predictions.csv file to ensure:
     1. Original crop types are preserved (Maize and Soybean)
     2. Yield values are within the specified ranges for each location-crop combination
     3. Risk values (Drought, Flood, Hail) are different for each parcel with inverse correlation
+    The parcels x days columns are computed as arrays, and the random values of every
+    parcel come from a Generator seeded with a stable hash of its id, so the file is
+    identical on every run and in every process
     """
     # Define yield ranges for each location and crop
     yield_ranges = {
@@ -386,183 +525,196 @@ def update_yield_predictions():
         "default": {"drought": 50, "flood": 30}
     }
     
-    # Create the yield predictions file from scratch
-    input_file = "data/parcels.geojson"
-    output_file = "data/yield_predictions.csv"
-    
     # Read the parcels data to get the original crop types and parcel IDs
     try:
         import geopandas as gpd
-        parcels_df = gpd.read_file(input_file)
+        parcels_df = gpd.read_file(input_file, ignore_geometry=True)
     except Exception as e:
         print(f"Error reading parcels file: {e}")
         return
     
     # Base date for predictions
-    base_date = "2025-01-15"
-    days = 30
-    
-    # List to store all predictions
-    predictions = []
-    
-    # Add header
-    header = ["parcel_id", "date", "predicted_yield", "confidence", 
-              "drought_probability", "flood_probability", "hail_probability", "crop"]
-    predictions.append(header)
-    
-    # For each parcel, generate predictions for each day
-    for idx, parcel in parcels_df.iterrows():
-        parcel_id = parcel['id']
-        
-        # PRESERVE THE ORIGINAL CROP - don't modify it
-        original_crop = parcel['crop']
-        
-        # Debug print to check what crop is being read from the parcel
-        print(f"Parcel {parcel_id} has crop: {original_crop}")
-        
-        # Extract location from parcel_id
+    base_date = datetime.strptime("2025-01-15", "%Y-%m-%d")
+    dates = np.array([(base_date + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(days)], dtype=object)
+    
+    # Per-parcel yield range and drought baseline (the ranges depend on the
+    # location extracted from the parcel_id and on the ORIGINAL crop, which is preserved)
+    parcel_ids = parcels_df['id'].astype(str).tolist()
+    crops = parcels_df['crop'].tolist()
+    n = len(parcel_ids)
+    yield_bounds = np.empty((n, 2))
+    drought_base = np.empty(n)
+    for i, (parcel_id, original_crop) in enumerate(zip(parcel_ids, crops)):
         parts = parcel_id.split('_')
         location = parts[1] if len(parts) > 1 else "Unknown"
-        
-        # Get appropriate yield range based on location and crop
         location_ranges = yield_ranges.get(location, default_range)
-        
-        # Get the yield range for the specific crop type
         if original_crop == "Soja":
             # Use Soja range if available, otherwise use Soybean range
-            min_yield, max_yield = location_ranges.get("Soja", default_range.get("Soja", (2.5, 3.5)))
+            yield_bounds[i] = location_ranges.get("Soja", default_range.get("Soja", (2.5, 3.5)))
         elif original_crop == "Maiz":
             # Use Maiz range if available, otherwise use Maize range
-            min_yield, max_yield = location_ranges.get("Maiz", default_range.get("Maiz", (6.5, 7.5)))
+            yield_bounds[i] = location_ranges.get("Maiz", default_range.get("Maiz", (6.5, 7.5)))
         else:
             # For any other crop, use a default range
-            min_yield, max_yield = default_range.get(original_crop, (2.5, 3.5))
-        
-        # Get the risk base values for this region
-        risk_base = region_risk_bases.get(location, region_risk_bases["default"])
-        
-        # Create a parcel-specific variation within 10% of the region base
-        parcel_seed = hash(parcel_id) % 1000
-        random.seed(parcel_seed)
-        
-        # Generate parcel-specific risk baselines with up to 10% variation from region base
-        parcel_drought_base = risk_base["drought"] * random.uniform(0.9, 1.1)
-        
-        # For each day, generate prediction
-        for day in range(days):
-            # Calculate date
-            date_obj = datetime.strptime(base_date, "%Y-%m-%d") + timedelta(days=day)
-            date = date_obj.strftime("%Y-%m-%d")
-            
-            # Calculate yield with slight decrease over time
-            day_percentage = day / 30
-            yield_reduction = (max_yield - min_yield) * day_percentage * 0.5
-            predicted_yield = round(max(min_yield, max_yield - yield_reduction), 2)
-            
-            # Confidence decreases with time
-            confidence = max(40, 85 - day)
-            
-            # Set a consistent seed for risk values
-            day_seed = hash(f"{parcel_id}_{date}") % 10000
-            random.seed(day_seed)
+            yield_bounds[i] = default_range.get(original_crop, (2.5, 3.5))
+        drought_base[i] = region_risk_bases.get(location, region_risk_bases["default"])["drought"]
+    
+    # Yield decreases slightly over time, the same for every parcel with the same
+    # range, so it is calculated once per distinct range
+    ranges, range_of_parcel = np.unique(yield_bounds, axis=0, return_inverse=True)
+    range_yields = np.array([
+        [round(max(min_yield, max_yield - (max_yield - min_yield) * (day / 30) * 0.5), 2) for day in range(days)]
+        for min_yield, max_yield in ranges.tolist()
+    ]).reshape(len(ranges), days)
+    yield_strings = np.array([[str(value) for value in row] for row in range_yields.tolist()],
+                             dtype=object).reshape(len(ranges), days)
+    range_of_parcel = range_of_parcel.ravel()
+    
+    # Confidence decreases with time
+    day = np.arange(days)
+    confidence_strings = PERCENT_STRINGS[np.maximum(40, 85 - day)]
+    day_factor = 1 + (day / 30) * 0.5  # Increases up to 50% over 30 days
+    
+    # Write to a temporary file chunk by chunk, then replace the output file
+    temp_output_file = f"{output_file}.{os.getpid()}.tmp"
+    header = ["parcel_id", "date", "predicted_yield", "confidence",
+              "drought_probability", "flood_probability", "hail_probability", "crop"]
+    with open(temp_output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile, lineterminator='\n')
+        writer.writerow(header)
+        for start in range(0, n, YIELD_CHUNK_SIZE):
+            stop = min(start + YIELD_CHUNK_SIZE, n)
+            chunk = slice(start, stop)
             
-            # Daily risk variations
-            daily_variation = random.uniform(0.95, 1.05)
+            # Parcel-specific risk baselines with up to 10% variation from the region
+            # base, daily risk variations and hail risk, drawn from each parcel's stable stream
+            # (one draw of 1 + 2 * days uniforms per parcel)
+            uniforms = np.empty((stop - start, 1 + 2 * days))
+            for i, parcel_id in enumerate(parcel_ids[chunk]):
+                np.random.default_rng(stable_seed(parcel_id)).random(out=uniforms[i])
+            parcel_variation = 0.9 + 0.2 * uniforms[:, :1]  # Up to 10% variation from the region base
+            daily_variation = 0.95 + 0.1 * uniforms[:, 1:1 + days]
+            hail_risk = 5 + np.floor(11 * uniforms[:, 1 + days:]).astype(np.int64)  # Hail risk (5-15) generated independently
+            parcel_drought_base = drought_base[chunk, None] * parcel_variation
             
             # Calculate drought risk with day progression factor
-            day_factor = 1 + (day / 30) * 0.5  # Increases up to 50% over 30 days
-            drought_risk = min(95, int(parcel_drought_base * day_factor * daily_variation))
+            drought_risk = np.minimum(95, np.floor(parcel_drought_base * day_factor * daily_variation)).astype(np.int64)
             
-            # Calculate flood risk with EXTREME negative correlation to drought
+            # Calculate flood risk with EXTREME negative correlation to drought:
+            # when drought is high, flood is very low
             drought_normalized = drought_risk / 100.0
+            flood_risk = np.maximum(1, np.floor(np.select(
+                [drought_normalized > 0.9, drought_normalized > 0.7],  # Very high drought, high drought
+                [5 * (1 - drought_normalized) ** 2, 10 * (1 - drought_normalized) ** 1.5],
+                50 * (1 - drought_normalized)  # Normal to low drought
+            ))).astype(np.int64)
             
-            # Stronger inverse correlation - when drought is high, flood is very low
-            if drought_normalized > 0.9:  # Very high drought
-                flood_risk = max(1, int(5 * (1 - drought_normalized) ** 2))
-            elif drought_normalized > 0.7:  # High drought
-                flood_risk = max(1, int(10 * (1 - drought_normalized) ** 1.5))
-            else:  # Normal to low drought
-                flood_risk = max(1, int(50 * (1 - drought_normalized)))
-            
-            # Generate hail risk independently
-            hail_risk = random.randint(5, 15)
-            
-            # Create row
-            row = [
-                parcel_id, 
-                date, 
-                str(predicted_yield),
-                str(confidence), 
-                str(drought_risk), 
-                str(flood_risk), 
-                str(hail_risk), 
-                original_crop  # Keep the original crop type - should be Soja or Maiz from parcels.geojson
-            ]
-            
-            predictions.append(row)
-    
-    # Write to the file
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerows(predictions)
+            # Every column is written from pre-formatted strings
+            parcels = stop - start
+            writer.writerows(zip(
+                np.repeat(np.array(parcel_ids[chunk], dtype=object), days),
+                np.tile(dates, parcels),
+                yield_strings[range_of_parcel[chunk]].ravel(),
+                np.tile(confidence_strings, parcels),
+                PERCENT_STRINGS[drought_risk.ravel()],
+                PERCENT_STRINGS[flood_risk.ravel()],
+                PERCENT_STRINGS[hail_risk.ravel()],
+                # Keep the original crop type - should be Soja or Maiz from parcels.geojson
+                np.repeat(np.array(crops[chunk], dtype=object), days)
+            ))
+    os.replace(temp_output_file, output_file)
     
     print(f"Created {output_file} with preserved crop types and risk values.")
 
 # Add the risk correlation function from update_risk_correlation.py
-def calculate_correlated_risks(drought_prob, flood_prob, hail_prob):
+def correlate_risks(drought_prob, flood_prob, hail_prob, out=None):
     """
     Calculate correlated risks with the following relationships:
     - Strong negative correlation between drought and flood
     - Moderate positive correlation between flood and hail
+    Works like a NumPy ufunc: the probabilities (0-100) are scalars or arrays
+    broadcast together, and the results are rounded to whole percentages
+    
+    Parameters:
+    drought_prob, flood_prob, hail_prob (array-like): Probabilities (0-100)
+    out (tuple): Optional (drought, flood, hail) arrays to store the results in;
+    they may be the input arrays themselves, every result is computed before writing
+    
+    Returns:
+    tuple: (drought, flood, hail) correlated probabilities (float arrays, or out)
     """
+    base_drought = np.asarray(drought_prob, dtype=float)
+    base_flood = np.asarray(flood_prob, dtype=float)
+    base_hail = np.asarray(hail_prob, dtype=float)
+    
     # Drought and flood correlation
     correlation_factor = 0.8  # 80% inverse relationship
-    base_drought = drought_prob
-    base_flood = flood_prob
     
     # Adjust flood probability based on drought
-    flood_prob = base_flood * (1 - correlation_factor) + \
-                (100 - base_drought) * correlation_factor
+    flood = base_flood * (1 - correlation_factor) + (100 - base_drought) * correlation_factor
     
     # Adjust drought probability based on flood
-    drought_prob = base_drought * (1 - correlation_factor) + \
-                  (100 - base_flood) * correlation_factor
+    drought = base_drought * (1 - correlation_factor) + (100 - base_flood) * correlation_factor
     
     # Moderate positive correlation between flood and hail
     hail_correlation = 0.4  # 40% relationship
-    hail_prob = hail_prob * (1 - hail_correlation) + \
-               base_flood * hail_correlation * 0.2  # Scaled down
+    hail = base_hail * (1 - hail_correlation) + base_flood * hail_correlation * 0.2  # Scaled down
     
-    return round(drought_prob), round(flood_prob), round(hail_prob)
+    if out is None:
+        return np.rint(drought), np.rint(flood), np.rint(hail)
+    for result, target in zip((drought, flood, hail), out):
+        np.rint(result, out=target, casting='unsafe')
+    return out
 
-def update_risk_correlations(file_path):
+def calculate_correlated_risks(drought_prob, flood_prob, hail_prob):
+    """
+    Calculate the correlated risks of one set of probabilities (see correlate_risks)
+    """
+    drought, flood, hail = correlate_risks(drought_prob, flood_prob, hail_prob)
+    return int(drought), int(flood), int(hail)
+
+# Rows of the yield predictions file read, correlated and written at once
+CORRELATION_CHUNK_ROWS = 1000000
+
+def update_risk_correlations(file_path, chunk_rows=CORRELATION_CHUNK_ROWS):
     """
     Update risk correlations in the yield predictions CSV file
+    The file is processed in chunks of rows (so it can be larger than memory) and
+    written to a temporary file that then replaces it; columns other than the
+    probabilities are copied as text, and correlated probabilities that depend on
+    a missing one are left empty
     """
+    probability_columns = ['drought_probability', 'flood_probability', 'hail_probability']
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
     try:
-        # Read the CSV file
-        df = pd.read_csv(file_path)
-        
-        # Process each row to update risk correlations
-        for i, row in df.iterrows():
-            drought_prob = float(row['drought_probability'])
-            flood_prob = float(row['flood_probability'])
-            hail_prob = float(row['hail_probability'])
-            
-            # Calculate correlated risks
-            drought_prob, flood_prob, hail_prob = calculate_correlated_risks(
-                drought_prob, flood_prob, hail_prob)
-            
-            # Update the DataFrame
-            df.at[i, 'drought_probability'] = drought_prob
-            df.at[i, 'flood_probability'] = flood_prob
-            df.at[i, 'hail_probability'] = hail_prob
+        columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+        chunks = pd.read_csv(
+            file_path, chunksize=chunk_rows, keep_default_na=False,
+            dtype={column: float if column in probability_columns else object for column in columns},
+            na_values={column: [''] for column in probability_columns}
+        )
+        with open(temp_path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output, lineterminator='\n')
+            writer.writerow(columns)
+            for df in chunks:
+                # Calculate correlated risks over the whole columns
+                correlated = correlate_risks(*(df[column].to_numpy() for column in probability_columns))
+                
+                # Write the updated probabilities as integers (empty where a probability is missing)
+                values = {column: df[column].to_numpy(dtype=object) for column in columns}
+                for column, probabilities in zip(probability_columns, correlated):
+                    valid = ~np.isnan(probabilities)
+                    values[column] = np.full(len(df), '', dtype=object)
+                    values[column][valid] = probabilities[valid].astype(np.int64)
+                writer.writerows(zip(*(values[column] for column in columns)))
         
-        # Save the updated DataFrame back to the CSV file
-        df.to_csv(file_path, index=False)
+        # Replace the original file with the updated one
+        os.replace(temp_path, file_path)
         print(f"Updated risk correlations in {file_path}")
     
     except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         print(f"Error updating risk correlations: {e}")
 
 if __name__ == "__main__":
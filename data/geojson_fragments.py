@@ -0,0 +1,185 @@
+"""
+GeoJSON serialization from pre-encoded feature fragments.
+Each feature's geometry and static properties are encoded to JSON bytes once;
+responses are then assembled by concatenating those fragments with the
+per-request property values instead of re-encoding the coordinates.
+"""
+import json
+import threading
+import numpy as np
+from data.geometry_pyramid import GeometryPyramid, zoom_band
+
+
+def _default(value):
+    # NumPy scalars (e.g. int64 areas) are not JSON serializable by default
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def dumps(value):
+    """Serialize a value to compact JSON bytes"""
+    return json.dumps(value, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+class FeatureFragments:
+    """
+    Pre-serialized geometry and property fragments for a list of features.
+    """
+
+    def __init__(self, geometries, properties, ids=None):
+        """
+        Parameters:
+        geometries (list): GeoJSON geometry dicts (or None) per feature
+        properties (list): Static property dicts per feature
+        ids (list): Optional feature identifiers used by align()
+        """
+        self._geometries = [dumps(geometry) for geometry in geometries]
+        # Properties are kept without their braces so values can be appended
+        self._properties = [dumps(props or {})[1:-1] for props in properties]
+
+        self.ids = np.array(ids if ids is not None else [None] * len(self._geometries), dtype=object)
+        if ids is not None:
+            self._id_order = np.argsort(self.ids.astype(str), kind='stable')
+            self._sorted_ids = self.ids[self._id_order].astype(str)
+
+    @classmethod
+    def from_geodataframe(cls, gdf, columns, id_column='id'):
+        """
+        Build the fragments of a GeoDataFrame
+
+        Parameters:
+        gdf (GeoDataFrame): Features to encode
+        columns (list): Property columns to include in every feature
+        id_column (str): Column identifying each feature
+
+        Returns:
+        FeatureFragments: Encoded features in the row order of the frame
+        """
+        geometries = [geometry.__geo_interface__ if geometry is not None else None for geometry in gdf.geometry]
+        properties = gdf[columns].to_dict('records')
+        ids = gdf[id_column].tolist() if id_column in gdf.columns else None
+        return cls(geometries, properties, ids=ids)
+
+    def __len__(self):
+        return len(self._geometries)
+
+    def align(self, ids, values, default=0.0):
+        """
+        Spread values given per identifier onto the feature order
+
+        Parameters:
+        ids (ndarray): Feature identifiers of the values
+        values (ndarray): One value per identifier
+        default (float): Value for features without an identifier match
+
+        Returns:
+        ndarray: One value per feature
+        """
+        aligned = np.full(len(self), default, dtype=float)
+        if len(ids) == 0 or not hasattr(self, '_sorted_ids'):
+            return aligned
+
+        ids = np.asarray(ids).astype(str)
+        found = np.searchsorted(self._sorted_ids, ids)
+        found = np.clip(found, 0, len(self._sorted_ids) - 1)
+        matched = self._sorted_ids[found] == ids
+        aligned[self._id_order[found[matched]]] = np.asarray(values, dtype=float)[matched]
+        return aligned
+
+    def feature_collection(self, positions=None, extra_properties=None, members=None):
+        """
+        Assemble a FeatureCollection from the cached fragments
+
+        Parameters:
+        positions (ndarray): Feature positions to include, or None for all
+        extra_properties (dict): Property name -> array of per-feature values to append
+        members (dict): Extra top-level members of the collection (e.g. 'date')
+
+        Returns:
+        bytes: Serialized GeoJSON FeatureCollection
+        """
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.intp)
+        extra_properties = extra_properties or {}
+
+        # Encode the per-request columns of the included features only, as
+        # '"name":value' members
+        extra_fragments = []
+        for name, values in extra_properties.items():
+            key = dumps(name) + b':'
+            extra_fragments.append([key + dumps(value) for value in np.asarray(values)[positions].tolist()])
+
+        features = []
+        for n, i in enumerate(positions.tolist()):
+            property_members = [self._properties[i]] + [column[n] for column in extra_fragments]
+            features.append(
+                b'{"type":"Feature","properties":{' + b','.join(m for m in property_members if m)
+                + b'},"geometry":' + self._geometries[i] + b'}'
+            )
+
+        members = dict(members or {})
+        members.setdefault('type', 'FeatureCollection')
+        head = dumps(members)[1:-1]
+        return b'{' + head + b',"features":[' + b','.join(features) + b']}'
+
+
+class ZoomFeatureFragments:
+    """
+    FeatureFragments of the same features for every zoom band of a GeometryPyramid.
+
+    The full-resolution fragments are encoded up front; the simplified bands
+    are encoded on their first request.
+    """
+
+    def __init__(self, pyramid, properties, ids=None):
+        """
+        Parameters:
+        pyramid (GeometryPyramid): Geometries of the features
+        properties (list): Static property dicts per feature
+        ids (list): Optional feature identifiers used by align()
+        """
+        self.pyramid = pyramid
+        self.properties = properties
+        self._ids = ids
+        self._bands = {None: FeatureFragments(pyramid.geojson(None), properties, ids=ids)}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_geodataframe(cls, gdf, columns, id_column='id', pyramid=None):
+        """
+        Build the zoom fragments of a GeoDataFrame
+
+        Parameters:
+        gdf (GeoDataFrame): Features to encode
+        columns (list): Property columns to include in every feature
+        id_column (str): Column identifying each feature
+        pyramid (GeometryPyramid): Pyramid of the frame's geometries, built
+        from the frame if None
+
+        Returns:
+        ZoomFeatureFragments: Encoded features in the row order of the frame
+        """
+        ids = gdf[id_column].tolist() if id_column in gdf.columns else None
+        if pyramid is None:
+            pyramid = GeometryPyramid(list(gdf.geometry))
+        return cls(pyramid, gdf[columns].to_dict('records'), ids=ids)
+
+    def __len__(self):
+        return len(self.pyramid)
+
+    def at(self, zoom=None):
+        """Return the FeatureFragments serving a map zoom (None for full resolution)"""
+        band = zoom_band(zoom)
+        fragments = self._bands.get(band)
+        if fragments is None:
+            with self._lock:
+                fragments = self._bands.get(band)
+                if fragments is None:
+                    fragments = FeatureFragments(self.pyramid.geojson(band), self.properties, ids=self._ids)
+                    self._bands[band] = fragments
+        return fragments
+
+    def topojson(self, zoom=None, positions=None, object_name='features'):
+        """Return the features as a quantized TopoJSON Topology for a map zoom"""
+        return self.pyramid.topojson(zoom, properties=self.properties, positions=positions,
+                                     object_name=object_name)
@@ -0,0 +1,324 @@
+"""
+Zoom-dependent simplification of the parcel geometries.
+Polygons are converted once to a TopoJSON-style topology: coordinates are
+quantized to an integer grid and rings are split into arcs at the points where
+neighbouring parcels stop sharing a border, so every shared border is stored
+(and simplified) only once. Each zoom band simplifies the arcs with a
+tolerance of about one screen pixel, which keeps adjacent parcels consistent
+while dropping vertices that cannot be seen at that zoom.
+"""
+import threading
+import numpy as np
+import shapely
+from shapely.geometry import shape, mapping
+
+
+# Zoom levels with a simplified geometry level; requests above the last level
+# get the original full-resolution geometries
+ZOOM_LEVELS = (8, 11, 14)
+
+# Grid steps per axis used to quantize coordinates (TopoJSON "quantization")
+QUANTIZATION = 1000000
+
+# Simplification tolerance in screen pixels
+PIXEL_TOLERANCE = 1.0
+
+
+def zoom_band(zoom):
+    """
+    Return the simplified zoom level serving a map zoom
+
+    Parameters:
+    zoom (int): Map zoom level, or None for full resolution
+
+    Returns:
+    int: The smallest level of ZOOM_LEVELS at or above the zoom, or None when
+    the zoom needs full-resolution geometries
+    """
+    if zoom is None:
+        return None
+    for level in ZOOM_LEVELS:
+        if zoom <= level:
+            return level
+    return None
+
+
+def _polygons(geometry):
+    """Return the polygons of a geometry as lists of rings (lists of (x, y))"""
+    if geometry is None or geometry.is_empty:
+        return []
+    if geometry.geom_type == 'Polygon':
+        parts = [geometry]
+    elif geometry.geom_type == 'MultiPolygon':
+        parts = list(geometry.geoms)
+    else:
+        raise ValueError(f'Unsupported geometry type for the pyramid: {geometry.geom_type}')
+    return [
+        [list(part.exterior.coords)] + [list(interior.coords) for interior in part.interiors]
+        for part in parts
+    ]
+
+
+class GeometryPyramid:
+    """
+    Topology of a list of polygon geometries with simplified levels per zoom band.
+
+    build() computes the topology and every level up front, so requests never
+    wait for them (the app builds its pyramid while loading the data). A
+    pyramid that was not built computes them on first use instead.
+    """
+
+    def __init__(self, geometries, quantization=QUANTIZATION):
+        """
+        Parameters:
+        geometries (list): Shapely (Multi)Polygons, or GeoJSON geometry dicts
+        quantization (int): Grid steps per axis used to quantize coordinates
+        """
+        self._geometries = [
+            shape(geometry) if isinstance(geometry, dict) else geometry
+            for geometry in geometries
+        ]
+        self.quantization = quantization
+        self._topology = None
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._geometries)
+
+    @property
+    def geometries(self):
+        """The original full-resolution geometries"""
+        return self._geometries
+
+    # Topology
+
+    def _build_topology(self):
+        """Quantize the rings, split them into shared arcs and index the arcs"""
+        valid = [geometry for geometry in self._geometries if geometry is not None and not geometry.is_empty]
+        if valid:
+            x0, y0, x1, y1 = shapely.total_bounds(np.array(valid, dtype=object))
+        else:
+            x0 = y0 = 0.0
+            x1 = y1 = 1.0
+        kx = (x1 - x0) / (self.quantization - 1) or 1.0
+        ky = (y1 - y0) / (self.quantization - 1) or 1.0
+
+        def quantize(ring):
+            points = np.asarray(ring, dtype=float)[:, :2]
+            grid = np.round((points - (x0, y0)) / (kx, ky)).astype(np.int64)
+            # Drop consecutive duplicates created by the quantization
+            keep = np.ones(len(grid), dtype=bool)
+            keep[1:] = np.any(grid[1:] != grid[:-1], axis=1)
+            return [tuple(point) for point in grid[keep].tolist()]
+
+        # Geometries as polygons of quantized closed rings
+        shapes = [[[quantize(ring) for ring in polygon] for polygon in _polygons(geometry)]
+                  for geometry in self._geometries]
+        rings = [ring for polygons in shapes for polygon in polygons for ring in polygon]
+
+        # Rings sharing each segment and each point
+        segment_rings = {}
+        point_rings = {}
+        for ring_id, ring in enumerate(rings):
+            for a, b in zip(ring[:-1], ring[1:]):
+                segment_rings.setdefault((a, b) if a < b else (b, a), set()).add(ring_id)
+                point_rings.setdefault(a, set()).add(ring_id)
+
+        arcs = []
+        arc_index = {}
+
+        def add_arc(points):
+            key = tuple(points)
+            if key in arc_index:
+                return arc_index[key]
+            reverse_key = key[::-1]
+            if reverse_key in arc_index:
+                return ~arc_index[reverse_key]
+            arc_index[key] = len(arcs)
+            arcs.append(points)
+            return arc_index[key]
+
+        def split_ring(ring):
+            points = ring[:-1]
+            count = len(points)
+            if count < 3:
+                return [add_arc(ring)]
+
+            def segment(i):
+                a, b = points[i % count], points[(i + 1) % count]
+                return segment_rings[(a, b) if a < b else (b, a)]
+
+            # A point is a junction where the set of rings along the border changes
+            cuts = [
+                i for i in range(count)
+                if segment(i - 1) != segment(i) or point_rings[points[i]] != (segment(i - 1) | segment(i))
+            ]
+            if not cuts:
+                # Isolated ring: cut it in three so simplification keeps a triangle
+                cuts = sorted({0, count // 3, 2 * count // 3})
+
+            ring_arcs = []
+            for start, stop in zip(cuts, cuts[1:] + [cuts[0] + count]):
+                ring_arcs.append(add_arc([points[i % count] for i in range(start, stop + 1)]))
+            return ring_arcs
+
+        topology_shapes = [[[split_ring(ring) for ring in polygon] for polygon in polygons]
+                           for polygons in shapes]
+        self._topology = {
+            'transform': {'scale': [kx, ky], 'translate': [x0, y0]},
+            'arcs': [np.asarray(arc, dtype=np.int64) for arc in arcs],
+            'shapes': topology_shapes
+        }
+
+    def build(self):
+        """
+        Build the topology and the simplified arcs of every zoom level
+
+        Returns:
+        GeometryPyramid: The pyramid itself
+        """
+        for level in ZOOM_LEVELS:
+            self._level(level)
+        return self
+
+    @property
+    def topology(self):
+        if self._topology is None:
+            with self._lock:
+                if self._topology is None:
+                    self._build_topology()
+        return self._topology
+
+    # Simplified levels
+
+    def _level(self, level):
+        """Return the arcs of a zoom level, simplified with a one-pixel tolerance"""
+        arcs = self._levels.get(level)
+        if arcs is None:
+            topology = self.topology
+            kx, ky = topology['transform']['scale']
+            # Degrees per screen pixel at this zoom, converted to grid units
+            tolerance = PIXEL_TOLERANCE * 360.0 / (256 * 2 ** level) / max(kx, ky)
+            arcs = topology['arcs']
+            if arcs:
+                # All arcs as one vectorized array of linestrings
+                lengths = [len(arc) for arc in arcs]
+                lines = shapely.linestrings(
+                    np.concatenate(arcs).astype(float),
+                    indices=np.repeat(np.arange(len(arcs)), lengths)
+                )
+                simplified = shapely.simplify(lines, tolerance, preserve_topology=False)
+                arcs = [shapely.get_coordinates(line).astype(np.int64) for line in simplified]
+            self._levels[level] = arcs
+        return arcs
+
+    def _arcs(self, zoom):
+        level = zoom_band(zoom)
+        return self.topology['arcs'] if level is None else self._level(level)
+
+    def _ring(self, arcs, ring_arcs, fallback_arcs):
+        """Join the arcs of a ring into a closed array of grid points"""
+        def join(source):
+            parts = []
+            for i, arc_id in enumerate(ring_arcs):
+                arc = source[arc_id] if arc_id >= 0 else source[~arc_id][::-1]
+                parts.append(arc if i == 0 else arc[1:])
+            return np.concatenate(parts)
+
+        ring = join(arcs)
+        if len(ring) < 4:
+            # Rings collapsed by the simplification keep their original shape
+            ring = join(fallback_arcs)
+        return ring
+
+    def geojson(self, zoom=None):
+        """
+        Return the GeoJSON geometry dicts for a map zoom
+
+        Parameters:
+        zoom (int): Map zoom level, or None for the original geometries
+
+        Returns:
+        list: One GeoJSON geometry dict (or None) per geometry
+        """
+        level = zoom_band(zoom)
+        if level is None:
+            return [mapping(geometry) if geometry is not None else None for geometry in self._geometries]
+
+        topology = self.topology
+        arcs = self._arcs(zoom)
+        scale = np.array(topology['transform']['scale'])
+        translate = np.array(topology['transform']['translate'])
+
+        geometries = []
+        for polygons, geometry in zip(topology['shapes'], self._geometries):
+            if geometry is None:
+                geometries.append(None)
+                continue
+            coordinates = []
+            for polygon in polygons:
+                rings = []
+                for ring_number, ring_arcs in enumerate(polygon):
+                    ring = self._ring(arcs, ring_arcs, topology['arcs'])
+                    if ring_number > 0 and len(ring) < 4:
+                        continue
+                    # Seven decimals (about 1 cm) are enough for the simplified levels
+                    rings.append(np.round(ring * scale + translate, 7).tolist())
+                coordinates.append(rings)
+            if geometry.geom_type == 'MultiPolygon':
+                geometries.append({'type': 'MultiPolygon', 'coordinates': coordinates})
+            else:
+                geometries.append({'type': 'Polygon', 'coordinates': coordinates[0] if coordinates else []})
+        return geometries
+
+    def topojson(self, zoom=None, properties=None, positions=None, object_name='parcels'):
+        """
+        Return a quantized TopoJSON Topology for a map zoom
+
+        Parameters:
+        zoom (int): Map zoom level, or None for the unsimplified topology
+        properties (list): Optional properties dict per geometry
+        positions (ndarray): Geometries to include, or None for all
+        object_name (str): Name of the geometry collection in 'objects'
+
+        Returns:
+        dict: TopoJSON Topology with delta-encoded arcs
+        """
+        topology = self.topology
+        arcs = self._arcs(zoom)
+        positions = range(len(self)) if positions is None else np.asarray(positions).tolist()
+
+        geometries = []
+        for i in positions:
+            polygons = topology['shapes'][i]
+            if self._geometries[i] is None or not polygons:
+                geometry = {'type': None}
+            elif self._geometries[i].geom_type == 'MultiPolygon':
+                geometry = {'type': 'MultiPolygon', 'arcs': polygons}
+            else:
+                geometry = {'type': 'Polygon', 'arcs': polygons[0]}
+            if properties is not None:
+                geometry['properties'] = properties[i]
+            geometries.append(geometry)
+
+        # Delta-encode the arcs: first point absolute, then offsets
+        encoded = []
+        for arc in arcs:
+            deltas = arc.copy()
+            deltas[1:] -= arc[:-1]
+            encoded.append(deltas.tolist())
+
+        return {
+            'type': 'Topology',
+            'transform': {
+                'scale': list(topology['transform']['scale']),
+                'translate': [float(value) for value in topology['transform']['translate']]
+            },
+            'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+            'arcs': encoded
+        }
+
+    def vertex_count(self, zoom=None):
+        """Return the number of arc vertices served at a map zoom"""
+        return int(sum(len(arc) for arc in self._arcs(zoom)))
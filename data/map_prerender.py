@@ -0,0 +1,153 @@
+"""
+Pre-rendering of the static /map pages.
+Every date x risk type x crop type variant is rendered with a process pool
+into a content-addressed directory: the file name is a hash of the data
+version and the variant, so pages rendered from older data files are never
+served and /map can return a pre-rendered page without touching folium.
+"""
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data.compression import ENCODING_SUFFIXES, Payload, write_compressed_copies
+from data.crop_index import ALL_CROPS, normalize_crop_filter
+
+
+# Risk types rendered by the pre-render job (same values the map filters accept)
+RISK_TYPES = ('general', 'drought', 'flood', 'pest')
+
+
+def map_variant(risk_type, crop_type, crop_index=None):
+    """
+    Normalize a risk and crop type the same way the map filters interpret them
+    (with a CropIndex, crops that are not in the data are dropped from the key)
+    """
+    if risk_type not in RISK_TYPES:
+        risk_type = 'general'
+    return risk_type, crop_index.filter_key(crop_type) if crop_index is not None else normalize_crop_filter(crop_type)
+
+
+class MapPageCache:
+    """
+    Pre-rendered map pages stored as <root>/<key[:2]>/<key>.html, with their
+    precompressed copies (<key>.html.gz and, with brotli, <key>.html.br).
+    """
+
+    def __init__(self, root):
+        """
+        Parameters:
+        root (str): Cache directory
+        """
+        self.root = root
+
+    def key(self, version, date, risk_type, crop_type):
+        """Return the content address of a map page"""
+        risk_type, crop_type = map_variant(risk_type, crop_type)
+        return hashlib.sha1(f'{version}|{date}|{risk_type}|{crop_type}'.encode('utf-8')).hexdigest()
+
+    def path(self, version, date, risk_type, crop_type):
+        """Return the file path of a map page"""
+        key = self.key(version, date, risk_type, crop_type)
+        return os.path.join(self.root, key[:2], f'{key}.html')
+
+    def exists(self, version, date, risk_type, crop_type):
+        return os.path.exists(self.path(version, date, risk_type, crop_type))
+
+    def encodings(self, path):
+        """Return the encodings with a precompressed copy of a page on disk"""
+        return tuple(encoding for encoding, suffix in ENCODING_SUFFIXES.items()
+                     if os.path.exists(path + suffix))
+
+    def put(self, version, date, risk_type, crop_type, html):
+        """
+        Write a map page and its compressed copies to disk (atomically, so
+        readers never see partial files; the page is written last). html may
+        be a Payload whose encodings were already compressed for a response.
+        """
+        path = self.path(version, date, risk_type, crop_type)
+        payload = html if isinstance(html, Payload) else Payload(html)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_compressed_copies(path, payload)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(payload.data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # The page cache is an optimization, maps are still rendered on demand
+            print(f"Could not write map cache file {path}: {str(e)}")
+
+
+# Datasets of a pre-render worker process, loaded once by _init_worker()
+_worker_data = {}
+
+
+def _init_worker(parcels_file, climate_file):
+    import geopandas as gpd
+    from data.columnar_storage import read_table
+    from data.crop_index import CropIndex
+    from data.risk_store import RiskStore
+
+    _worker_data['parcels'] = gpd.read_file(parcels_file)
+    _worker_data['climate'] = read_table(climate_file)
+    _worker_data['risk_store'] = RiskStore(_worker_data['climate'])
+    _worker_data['crop_index'] = CropIndex(_worker_data['parcels']['crop'])
+
+
+def _render_variant(root, version, dates, risk_type, crop_type):
+    """Render every date of one risk and crop type (the map shell is built once per worker)"""
+    from data.map_rendering import render_risk_map
+
+    cache = MapPageCache(root)
+    for date in dates:
+        html = render_risk_map(date, _worker_data['climate'], _worker_data['parcels'],
+                               risk_type=risk_type, crop_type=crop_type, crop_index=_worker_data['crop_index'],
+                               risk_store=_worker_data['risk_store'])
+        cache.put(version, date, risk_type, crop_type, html)
+    return len(dates)
+
+
+def prerender_maps(root, version, dates, parcels_file, climate_file,
+                   risk_types=RISK_TYPES, crop_types=(ALL_CROPS,), workers=None, skip_existing=True):
+    """
+    Render every map page variant into the page cache with a process pool
+
+    Parameters:
+    root (str): Cache directory
+    version (str): Data version the pages are rendered from
+    dates (list): Dates to render
+    parcels_file (str): Parcels GeoJSON file loaded by every worker
+    climate_file (str): Climate table loaded by every worker
+    risk_types (tuple): Risk types to render
+    crop_types (tuple): Crop filters to render ('all' and/or crop names)
+    workers (int): Worker processes, defaults to one per CPU (at most one per variant)
+    skip_existing (bool): Do not render pages that are already in the cache
+
+    Returns:
+    int: Number of pages rendered
+    """
+    cache = MapPageCache(root)
+    tasks = []
+    for risk_type in risk_types:
+        for crop_type in crop_types:
+            pending = [date for date in dates
+                       if not (skip_existing and cache.exists(version, date, risk_type, crop_type))]
+            if pending:
+                tasks.append((risk_type, crop_type, pending))
+    if not tasks:
+        return 0
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    # Spawned workers load their own copy of the data files, so the job is
+    # safe to start from a multi-threaded server process
+    context = multiprocessing.get_context('spawn')
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(parcels_file, climate_file)) as executor:
+        futures = [
+            executor.submit(_render_variant, root, version, pending, risk_type, crop_type)
+            for risk_type, crop_type, pending in tasks
+        ]
+        for future in as_completed(futures):
+            rendered += future.result()
+    return rendered
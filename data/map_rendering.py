@@ -2,24 +2,262 @@
 Map rendering module for the dynamic risk map application.
 Contains functions for creating and styling maps.
 """
+import json
+import threading
+import numpy as np
+import pandas as pd
 import folium
-import branca.colormap as cm
-from folium.plugins import TimestampedGeoJson
+from shapely.geometry import shape
+from data.geometry_pyramid import zoom_band
+from data.colormaps import get_colormap
+from data.crop_index import CropIndex
 
 
-def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', crop_type='all'):
+# Placeholder replaced with the per-date style table in cached map shells
+STYLE_TABLE_PLACEHOLDER = '/*__PARCEL_STYLES__*/{}'
+
+# Rendered map shells by (risk_type, crop_type, zoom band), see render_risk_map();
+# dropped by clear_map_shells() when the data is reloaded
+_map_shells = {}
+_map_shells_lock = threading.Lock()
+
+# Time slider of the animated map. The parcels layer holds each geometry once;
+# colours and popup values come from per-parcel arrays indexed by time step.
+ANIMATION_SCRIPT = """
+<style>
+    .risk-time-control { background: white; padding: 6px 10px; border-radius: 4px;
+                         box-shadow: 0 1px 5px rgba(0,0,0,0.4); font: 12px sans-serif; }
+    .risk-time-control button { margin-right: 6px; cursor: pointer; }
+    .risk-time-control input { width: 220px; vertical-align: middle; }
+    .risk-time-control span { margin-left: 6px; font-weight: bold; }
+</style>
+<script>
+// Per-parcel animation arrays (parcel position x time step)
+var riskAnimation = __ANIMATION_DATA__;
+document.addEventListener('DOMContentLoaded', function() {
+    var map = window['__MAP__'];
+    var parcelsLayer = window['__PARCELS_LAYER__'];
+    if (!map || !parcelsLayer) {
+        console.error('Animated map layers not found');
+        return;
+    }
+    var data = riskAnimation;
+    var step = 0;
+    var timer = null;
+    
+    // Parcel position of every Leaflet layer, by parcel id
+    var positions = {};
+    data.ids.forEach(function(parcelId, i) { positions[parcelId] = i; });
+    
+    function popupHtml(i) {
+        var risk = data.risk[i][step];
+        var premium = data.premium[i][step];
+        var html = '<div style="width:200px">' +
+            '<h4>' + data.ids[i] + '</h4>' +
+            '<b>Area:</b> ' + data.area[i] + ' ha<br>' +
+            '<b>Soil type:</b> ' + data.soil[i] + '<br>' +
+            '<b>Risk level:</b> ' + data.categories[data.category[i][step]] + ' (' + risk.toFixed(2) + ')<br>' +
+            '<b>Premium:</b> $' + premium.toFixed(2) + '/ha<br>' +
+            '<b>Total premium:</b> $' + (premium * data.area[i]).toFixed(2) + '<br>';
+        var alert = data.alert[i][step];
+        if (alert >= 0) {
+            html += '<div style="color:red;"><b>Alert:</b> ' + data.alerts[alert] + '</div>';
+        }
+        return html + '</div>';
+    }
+    
+    parcelsLayer.eachLayer(function(parcel) {
+        var i = positions[parcel.feature.properties.id];
+        parcel.bindPopup(function() { return popupHtml(i); });
+    });
+    
+    function showStep(newStep) {
+        step = newStep;
+        parcelsLayer.eachLayer(function(parcel) {
+            var i = positions[parcel.feature.properties.id];
+            parcel.setStyle({fillColor: data.palette[data.color[i][step]]});
+            if (parcel.isPopupOpen()) {
+                parcel.setPopupContent(popupHtml(i));
+            }
+        });
+        slider.value = step;
+        label.textContent = data.dates[step];
+    }
+    
+    // Play/pause button, time slider and date label
+    var control = L.control({position: 'bottomleft'});
+    var slider, label, button;
+    control.onAdd = function() {
+        var div = L.DomUtil.create('div', 'risk-time-control');
+        button = L.DomUtil.create('button', '', div);
+        button.textContent = '\u25B6';
+        slider = L.DomUtil.create('input', '', div);
+        slider.type = 'range';
+        slider.min = 0;
+        slider.max = Math.max(data.dates.length - 1, 0);
+        slider.value = 0;
+        label = L.DomUtil.create('span', '', div);
+        L.DomEvent.disableClickPropagation(div);
+        L.DomEvent.on(slider, 'input', function() { showStep(parseInt(slider.value, 10)); });
+        L.DomEvent.on(button, 'click', function() {
+            if (timer) {
+                clearInterval(timer);
+                timer = null;
+                button.textContent = '\u25B6';
+                return;
+            }
+            button.textContent = '\u275A\u275A';
+            timer = setInterval(function() {
+                showStep((step + 1) % data.dates.length);
+            }, 1000);
+        });
+        return div;
+    };
+    control.addTo(map);
+    
+    if (data.dates.length > 0) {
+        showStep(0);
+    }
+});
+</script>
+"""
+
+
+def _animation_data(filtered_parcels, climate_data, lut, risk_type='general'):
     """
-    Create a risk map for a specific date and risk type
+    Build the per-parcel time series of the animated map
     
     Parameters:
-    date_str (str): Date string in format 'YYYY-MM-DD'
+    filtered_parcels (GeoDataFrame): Parcels shown on the map
     climate_data (DataFrame): Climate risk data
-    parcels_gdf (GeoDataFrame): Parcels data
+    lut (RiskColormap): Colour lookup table of the risk type
+    risk_type (str): Type of risk used when the data has no 'risk_level' column
+    
+    Returns:
+    dict: JSON-ready arrays indexed by [parcel position][time step]; strings
+    (colours, categories, alerts) are stored once and referenced by index
+    """
+    dates = sorted(climate_data['date'].unique())
+    parcel_ids = filtered_parcels['id'].tolist()
+    shape = (len(parcel_ids), len(dates))
+    
+    # Matrix cell of every climate row (rows of other parcels are dropped)
+    rows = np.flatnonzero(pd.Index(parcel_ids).get_indexer(climate_data['parcel_id']) >= 0)
+    parcel_pos = pd.Index(parcel_ids).get_indexer(climate_data['parcel_id'].iloc[rows])
+    date_pos = np.searchsorted(dates, climate_data['date'].iloc[rows].to_numpy())
+    
+    def matrix(values, default, dtype):
+        result = np.full(shape, default, dtype=dtype)
+        result[parcel_pos, date_pos] = values
+        return result
+    
+    # Calculate risk level if not present
+    if 'risk_level' in climate_data.columns:
+        levels = climate_data['risk_level'].iloc[rows].to_numpy(dtype=float)
+    else:
+        column = {'drought': 'drought_probability', 'flood': 'flood_probability',
+                  'pest': 'hail_probability'}.get(risk_type, 'general_risk')
+        levels = climate_data[column].iloc[rows].to_numpy(dtype=float) / 100.0
+    risk = np.nan_to_num(matrix(levels, 0.0, float), nan=0.0)
+    premium = np.nan_to_num(matrix(climate_data['premium_ha'].iloc[rows].to_numpy(dtype=float), 0.0, float), nan=0.0)
+    
+    # Colours are indices into the lookup table of the risk type
+    color_index = lut.indices(risk)
+    
+    categories = matrix(climate_data['risk_category'].iloc[rows].to_numpy(dtype=object), 'Unknown', object)
+    category_names, category_index = np.unique(categories.astype(str), return_inverse=True)
+    
+    # Alerts: index into the alert texts, -1 for no alert
+    alert_values = climate_data['alert'].iloc[rows].to_numpy(dtype=object)
+    alert_values = np.where(pd.isna(alert_values) | (alert_values == ''), None, alert_values)
+    alerts = matrix(alert_values, None, object)
+    has_alert = pd.notna(alerts)
+    alert_names, alert_codes = np.unique(alerts[has_alert].astype(str), return_inverse=True)
+    alert_index = np.full(shape, -1, dtype=int)
+    alert_index[has_alert] = alert_codes
+    
+    return {
+        'dates': [str(date) for date in dates],
+        'ids': parcel_ids,
+        'area': filtered_parcels['area'].tolist(),
+        'soil': filtered_parcels['soil_type'].tolist(),
+        'palette': lut.hex.tolist(),
+        'color': color_index.tolist(),
+        'risk': np.round(risk, 4).tolist(),
+        'premium': np.round(premium, 2).tolist(),
+        'categories': category_names.tolist(),
+        'category': category_index.reshape(shape).tolist(),
+        'alerts': alert_names.tolist(),
+        'alert': alert_index.tolist()
+    }
+
+
+def risk_colormap(risk_type='general'):
+    """
+    Return the colormap and title used to display a risk type
+    
+    Parameters:
     risk_type (str): Type of risk to display ('general', 'drought', 'flood', 'pest')
-    crop_type (str): Type of crop to filter ('all', 'soja', 'maiz')
     
     Returns:
-    folium.Map: Map with parcels colored by risk level
+    tuple: (branca LinearColormap, map title)
+    """
+    lut = get_colormap(risk_type)
+    return lut.legend(), lut.title
+
+
+def _parcel_colors(parcel_ids, risk_map, lut):
+    """Return parcel id -> fill colour, looked up vectorized in the risk type's table"""
+    levels = np.array([risk_map.get(parcel_id, 0) for parcel_id in parcel_ids], dtype=float)
+    return dict(zip(parcel_ids, lut.hex_colors(levels).tolist()))
+
+
+def _crop_index_for(parcels_gdf, crop_index=None):
+    """Return the given crop index, or a crop index of the parcels frame built for this call"""
+    return crop_index if crop_index is not None else CropIndex(parcels_gdf['crop'])
+
+
+def _filter_parcels(parcels_gdf, crop_type='all', crop_index=None):
+    """
+    Return the parcels matching a crop filter ('all', a crop or comma-separated crops)
+    
+    crop_index must index the rows of parcels_gdf (it may have been built from
+    the unsimplified frame, the row order is the same).
+    """
+    positions = _crop_index_for(parcels_gdf, crop_index).positions(crop_type)
+    return parcels_gdf if positions is None else parcels_gdf.iloc[positions]
+
+
+def _zoomed_parcels(parcels_gdf, zoom=None, pyramid=None):
+    """
+    Return the parcels with the simplified geometries of a map zoom
+    
+    Parameters:
+    parcels_gdf (GeoDataFrame): Parcels data
+    zoom (int): Map zoom level, or None for full resolution
+    pyramid (GeometryPyramid): Simplified geometries of parcels_gdf, in row order
+    
+    Returns:
+    GeoDataFrame: parcels_gdf itself, or a copy with simplified geometries
+    """
+    if pyramid is None or zoom_band(zoom) is None:
+        return parcels_gdf
+    simplified = parcels_gdf.copy()
+    simplified['geometry'] = [shape(geometry) if geometry else None for geometry in pyramid.geojson(zoom)]
+    return simplified
+
+
+def _date_risk_levels(date_str, climate_data, risk_type='general'):
+    """
+    Return the risk level of every parcel on a date
+    
+    Parameters:
+    date_str (str): Date string in format 'YYYY-MM-DD' (the earliest date is used if it has no data)
+    climate_data (DataFrame): Climate risk data
+    risk_type (str): Type of risk used when the data has no 'risk_level' column
+    
+    Returns:
+    dict: Parcel id -> risk level (0-1)
     """
     # Filter data for the selected date
     date_data = climate_data[climate_data['date'] == date_str]
@@ -47,6 +285,21 @@ def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', cr
         else:
             date_data['risk_level'] = date_data['general_risk'] / 100.0
     
+    return dict(zip(date_data['parcel_id'], date_data['risk_level']))
+
+
+def _build_risk_map(filtered_parcels, colormap, fill_color):
+    """
+    Build the folium map of the parcels with base layers, legend and controls
+    
+    Parameters:
+    filtered_parcels (GeoDataFrame): Parcels to display
+    colormap (LinearColormap): Colormap shown as the legend
+    fill_color (callable): Returns the fill colour of a GeoJSON feature
+    
+    Returns:
+    tuple: (folium.Map, folium.GeoJson layer of the parcels)
+    """
     # Center coordinates for the Chacra parcels
     # Update map center to focus specifically on San Javier parcels
     map_center = [-32.71, -58.08]  # San Javier parcels center coordinates
@@ -60,40 +313,6 @@ def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', cr
         zoom_control=True  # Enable native Leaflet zoom controls
     )
     
-    # Define color scheme based on risk type
-    if risk_type == 'drought':
-        # Use yellow-orange-red color scheme for drought
-        colormap = cm.LinearColormap(
-            colors=['#ffeb3b', '#ffc107', '#ff9800', '#ff5722'],
-            vmin=0, vmax=1,
-            caption='Drought Risk Level'
-        )
-        map_title = 'Drought Risk Map'
-    elif risk_type == 'flood':
-        # Use blue color scheme for flood
-        colormap = cm.LinearColormap(
-            colors=['#e3f2fd', '#90caf9', '#42a5f5', '#1565c0'],
-            vmin=0, vmax=1,
-            caption='Flood Risk Level'
-        )
-        map_title = 'Flood Risk Map'
-    elif risk_type == 'pest':
-        # Use purple color scheme for pests
-        colormap = cm.LinearColormap(
-            colors=['#f3e5f5', '#ce93d8', '#ab47bc', '#7b1fa2'],
-            vmin=0, vmax=1,
-            caption='Pest Risk Level'
-        )
-        map_title = 'Pest Risk Map'
-    else:
-        # Default general risk (green-yellow-red)
-        colormap = cm.LinearColormap(
-            colors=['#4caf50', '#cddc39', '#ffeb3b', '#ff9800', '#f44336'],
-            vmin=0, vmax=1,
-            caption='Risk Level'
-        )
-        map_title = 'General Risk Map'
-    
     m.add_child(colormap)
     
     # Add terrain tiles directly
@@ -124,28 +343,18 @@ def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', cr
         overlay=False
     ).add_to(m)
 
-    # Apply crop type filter if not 'all'
-    filtered_parcels = parcels_gdf
-    if crop_type != 'all':
-        if crop_type.lower() == 'soja':
-            filtered_parcels = parcels_gdf[parcels_gdf['crop'].str.lower() == 'soja']
-        elif crop_type.lower() == 'maiz':
-            filtered_parcels = parcels_gdf[parcels_gdf['crop'].str.lower() == 'maiz']
-    
-    # Create dictionaries for quick lookup
-    risk_map = dict(zip(date_data['parcel_id'], date_data['risk_level']))
-    
     # Add GeoJSON parcels with styling based on risk level
-    folium.GeoJson(
+    parcels_layer = folium.GeoJson(
         filtered_parcels,
         name='Parcels',
         style_function=lambda feature: {
-            'fillColor': colormap(risk_map.get(feature['properties']['id'], 0)),
+            'fillColor': fill_color(feature),
             'color': 'black',
             'weight': 2,
             'fillOpacity': 0.49
         },
-        tooltip=folium.GeoJsonTooltip(
+        # Field tooltips and popups need at least one feature (crop filters can match none)
+        tooltip=None if filtered_parcels.empty else folium.GeoJsonTooltip(
             fields=['id', 'area', 'soil_type', 'crop'],
             aliases=['Parcel ID:', 'Area (ha):', 'Soil Type:', 'Crop:'],
             localize=True,
@@ -159,7 +368,7 @@ def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', cr
             """,
             max_width=800,
         ),
-        popup=folium.GeoJsonPopup(
+        popup=None if filtered_parcels.empty else folium.GeoJsonPopup(
             fields=['id', 'area', 'soil_type', 'crop'],
             aliases=['Parcel ID:', 'Area (ha):', 'Soil Type:', 'Crop:'],
             localize=True,
@@ -244,60 +453,156 @@ def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', cr
     
     m.get_root().html.add_child(folium.Element(message_listener))
     
-    return m
+    return m, parcels_layer
 
-def create_animated_risk_map(parcels_gdf, climate_data, risk_type='general', crop_type='all'):
+def create_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', crop_type='all',
+                    zoom=None, pyramid=None, crop_index=None):
     """
-    Create an animated risk map showing changes over time
+    Create a risk map for a specific date and risk type
     
     Parameters:
-    parcels_gdf (GeoDataFrame): Parcels data
+    date_str (str): Date string in format 'YYYY-MM-DD'
     climate_data (DataFrame): Climate risk data
+    parcels_gdf (GeoDataFrame): Parcels data
     risk_type (str): Type of risk to display ('general', 'drought', 'flood', 'pest')
-    crop_type (str): Type of crop to filter ('all', 'soja', 'maiz')
+    crop_type (str): Crop filter ('all', a crop such as 'soja', or comma-separated crops)
+    zoom (int): Map zoom selecting simplified geometries from the pyramid, or None
+    pyramid (GeometryPyramid): Simplified geometries of parcels_gdf, in row order
+    crop_index (CropIndex): Crop index of parcels_gdf, built for this call if None
     
     Returns:
-    folium.Map: Map with time-based animation
+    folium.Map: Map with parcels colored by risk level
     """
-    # Define color scheme based on risk type
-    if risk_type == 'drought':
-        # Use yellow-orange-red color scheme for drought
-        colormap = cm.LinearColormap(
-            colors=['#ffeb3b', '#ffc107', '#ff9800', '#ff5722'],
-            vmin=0, vmax=1,
-            caption='Drought Risk Level'
-        )
-        map_title = 'Drought Risk Map'
-    elif risk_type == 'flood':
-        # Use blue color scheme for flood
-        colormap = cm.LinearColormap(
-            colors=['#e3f2fd', '#90caf9', '#42a5f5', '#1565c0'],
-            vmin=0, vmax=1,
-            caption='Flood Risk Level'
-        )
-        map_title = 'Flood Risk Map'
-    elif risk_type == 'pest':
-        # Use purple color scheme for pests
-        colormap = cm.LinearColormap(
-            colors=['#f3e5f5', '#ce93d8', '#ab47bc', '#7b1fa2'],
-            vmin=0, vmax=1,
-            caption='Pest Risk Level'
+    risk_map = _date_risk_levels(date_str, climate_data, risk_type)
+    lut = get_colormap(risk_type)
+    
+    # Apply crop type filter if not 'all'
+    crop_index = _crop_index_for(parcels_gdf, crop_index)
+    filtered_parcels = _filter_parcels(_zoomed_parcels(parcels_gdf, zoom, pyramid), crop_type, crop_index)
+    colors = _parcel_colors(filtered_parcels['id'].tolist(), risk_map, lut)
+    
+    m, _ = _build_risk_map(
+        filtered_parcels, lut.legend(),
+        lambda feature: colors[feature['properties']['id']]
+    )
+    return m
+
+def clear_map_shells():
+    """Drop the cached map shells (and the parcels frames they reference)"""
+    with _map_shells_lock:
+        _map_shells.clear()
+
+def _risk_map_shell(parcels_gdf, risk_type, crop_type, crop_index, zoom=None, pyramid=None):
+    """
+    Return the rendered map HTML of a risk and crop type without per-date colours
+    
+    The shell is rendered once per (risk_type, crop_type, zoom band) and parcels data; it
+    contains a script that applies the style table substituted for
+    STYLE_TABLE_PLACEHOLDER to the parcels layer when the page loads.
+    """
+    # Normalize the key the same way the filters interpret the values
+    if risk_type not in ('drought', 'flood', 'pest'):
+        risk_type = 'general'
+    crop_type = crop_index.filter_key(crop_type)
+    band = zoom_band(zoom) if pyramid is not None else None
+    key = (risk_type, crop_type, band)
+    
+    cached = _map_shells.get(key)
+    if cached is not None and cached[0] is parcels_gdf:
+        return cached[1]
+    
+    with _map_shells_lock:
+        cached = _map_shells.get(key)
+        if cached is not None and cached[0] is parcels_gdf:
+            return cached[1]
+        
+        lut = get_colormap(risk_type)
+        default_color = lut.hex[0]
+        m, parcels_layer = _build_risk_map(
+            _filter_parcels(_zoomed_parcels(parcels_gdf, band, pyramid), crop_type, crop_index),
+            lut.legend(),
+            lambda feature: default_color
         )
-        map_title = 'Pest Risk Map'
+        
+        style_script = """
+    <script>
+    // Per-date fill colours, substituted into the cached map shell for each request
+    var parcelStyles = %s;
+    document.addEventListener('DOMContentLoaded', function() {
+        var parcelsLayer = window['%s'];
+        if (!parcelsLayer) {
+            console.error('Parcels layer not found');
+            return;
+        }
+        parcelsLayer.eachLayer(function(parcel) {
+            var fillColor = parcelStyles[parcel.feature.properties.id];
+            if (fillColor) {
+                parcel.setStyle({fillColor: fillColor});
+            }
+        });
+    });
+    </script>
+    """ % (STYLE_TABLE_PLACEHOLDER, parcels_layer.get_name())
+        m.get_root().html.add_child(folium.Element(style_script))
+        
+        html = m.get_root().render()
+        _map_shells[key] = (parcels_gdf, html)
+        return html
+
+def render_risk_map(date_str, climate_data, parcels_gdf, risk_type='general', crop_type='all',
+                    zoom=None, pyramid=None, crop_index=None, risk_store=None):
+    """
+    Render the risk map HTML of a date from the cached map shell
+    
+    Produces the same map as create_risk_map() but only computes the fill
+    colour of each parcel per request instead of rebuilding and rendering the
+    folium map.
+    
+    Parameters:
+    date_str (str): Date string in format 'YYYY-MM-DD'
+    climate_data (DataFrame): Climate risk data
+    parcels_gdf (GeoDataFrame): Parcels data
+    risk_type (str): Type of risk to display ('general', 'drought', 'flood', 'pest')
+    crop_type (str): Crop filter ('all', a crop such as 'soja', or comma-separated crops)
+    zoom (int): Map zoom selecting simplified geometries from the pyramid, or None
+    pyramid (GeometryPyramid): Simplified geometries of parcels_gdf, in row order
+    crop_index (CropIndex): Crop index of parcels_gdf; built for this call if None, so
+        callers serving many requests should pass the index they keep
+    risk_store (RiskStore): Indexed climate_data; the levels of the date are read from
+        its date slice instead of filtering the whole table
+    
+    Returns:
+    str: Map page HTML
+    """
+    if risk_store is not None:
+        data_date = date_str if risk_store.has_date(date_str) else risk_store.min_date
+        risk_map = dict(zip(*risk_store.risk_levels(data_date, risk_type)))
     else:
-        # Default general risk (green-yellow-red)
-        colormap = cm.LinearColormap(
-            colors=['#4caf50', '#cddc39', '#ffeb3b', '#ff9800', '#f44336'],
-            vmin=0, vmax=1,
-            caption='Risk Level'
-        )
-        map_title = 'General Risk Map'
+        risk_map = _date_risk_levels(date_str, climate_data, risk_type)
+    crop_index = _crop_index_for(parcels_gdf, crop_index)
+    shell = _risk_map_shell(parcels_gdf, risk_type, crop_type, crop_index, zoom, pyramid)
+    
+    # Style table: parcel id -> fill colour for this date ('</' is escaped so
+    # no value can close the script element it is written into)
+    filtered_parcels = _filter_parcels(parcels_gdf, crop_type, crop_index)
+    styles = _parcel_colors(filtered_parcels['id'].tolist(), risk_map, get_colormap(risk_type))
+    return shell.replace(STYLE_TABLE_PLACEHOLDER, json.dumps(styles).replace('</', '<\\/'), 1)
+
+def create_animated_risk_map(parcels_gdf, climate_data, risk_type='general', crop_type='all', crop_index=None):
+    """
+    Create an animated risk map showing changes over time
     
-    # Prepare features for TimestampedGeoJson
-    features = []
+    Parameters:
+    parcels_gdf (GeoDataFrame): Parcels data
+    climate_data (DataFrame): Climate risk data
+    risk_type (str): Type of risk to display ('general', 'drought', 'flood', 'pest')
+    crop_type (str): Crop filter ('all', a crop such as 'soja', or comma-separated crops)
+    crop_index (CropIndex): Crop index of parcels_gdf, built for this call if None
     
-    # Get unique dates
-    dates = sorted(climate_data['date'].unique())
+    Returns:
+    folium.Map: Map with time-based animation
+    """
+    lut = get_colormap(risk_type)
     
     # Center coordinates for the map
     map_center = [-32.71, -58.08]  # San Javier parcels center coordinates
@@ -312,27 +617,23 @@ def create_animated_risk_map(parcels_gdf, climate_data, risk_type='general', cro
     )
     
     # Apply crop type filter if not 'all'
-    filtered_parcels = parcels_gdf
-    if crop_type != 'all':
-        if crop_type.lower() == 'soja':
-            filtered_parcels = parcels_gdf[parcels_gdf['crop'].str.lower() == 'soja']
-        elif crop_type.lower() == 'maiz':
-            filtered_parcels = parcels_gdf[parcels_gdf['crop'].str.lower() == 'maiz']
-    
-    # Add base GeoJSON of parcels
-    folium.GeoJson(
-        filtered_parcels,
-        name='Parcels (Base)',
+    filtered_parcels = _filter_parcels(parcels_gdf, crop_type, crop_index)
+    
+    # Add the GeoJSON of parcels once; the time slider restyles it per date
+    parcels_layer = folium.GeoJson(
+        filtered_parcels[['id', 'area', 'soil_type', 'geometry']],
+        name='Parcels',
         style_function=lambda feature: {
             'fillColor': 'lightgray',
             'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.1
-        }
+            'weight': 2,
+            'fillOpacity': 0.49
+        },
+        tooltip=None if filtered_parcels.empty else folium.GeoJsonTooltip(fields=['id'], labels=False)
     ).add_to(m)
     
     # Add colormap
-    m.add_child(colormap)
+    m.add_child(lut.legend())
     
     # Add terrain tiles directly
     folium.TileLayer(
@@ -361,85 +662,15 @@ def create_animated_risk_map(parcels_gdf, climate_data, risk_type='general', cro
         overlay=False
     ).add_to(m)
 
-    # Process each date
-    for date_str in dates:
-        # Filter data for this date
-        date_data = climate_data[climate_data['date'] == date_str]
-        
-        # Calculate risk level if not present
-        if 'risk_level' not in date_data.columns:
-            if risk_type == 'drought':
-                date_data['risk_level'] = date_data['drought_probability'] / 100.0
-            elif risk_type == 'flood':
-                date_data['risk_level'] = date_data['flood_probability'] / 100.0
-            elif risk_type == 'pest':
-                date_data['risk_level'] = date_data['hail_probability'] / 100.0
-            else:
-                date_data['risk_level'] = date_data['general_risk'] / 100.0
-        
-        # Create dictionaries for quick lookup
-        risk_map = dict(zip(date_data['parcel_id'], date_data['risk_level']))
-        alerts_map = dict(zip(date_data['parcel_id'], date_data['alert']))
-        premium_map = dict(zip(date_data['parcel_id'], date_data['premium_ha']))
-        category_map = dict(zip(date_data['parcel_id'], date_data['risk_category']))
-        
-        for idx, row in parcels_gdf.iterrows():
-            parcel_id = row['id']
-            risk_level = risk_map.get(parcel_id, 0)
-            alert = alerts_map.get(parcel_id)
-            premium = premium_map.get(parcel_id, 0)
-            category = category_map.get(parcel_id, 'Unknown')
-            
-            # Set color based on risk level
-            color = colormap(risk_level)
-            
-            # Create popup content
-            popup_html = f'''
-            <div style="width:200px">
-                <h4>{parcel_id}</h4>
-                <b>Area:</b> {row['area']} ha<br>
-                <b>Soil type:</b> {row['soil_type']}<br>
-                <b>Risk level:</b> {category} ({risk_level:.2f})<br>
-                <b>Premium:</b> ${premium:.2f}/ha<br>
-                <b>Total premium:</b> ${premium * row['area']:.2f}<br>
-            '''
-            
-            if alert:
-                popup_html += f'<div style="color:red;"><b>Alert:</b> {alert}</div>'
-                
-            popup_html += '</div>'
-            
-            # Create feature for this parcel at this time
-            feature = {
-                'type': 'Feature',
-                'geometry': row['geometry'].__geo_interface__,
-                'properties': {
-                    'time': date_str,
-                    'popup': popup_html,
-                    'tooltip': parcel_id,
-                    'style': {
-                        'color': 'black',
-                        'weight': 2,
-                        'fillColor': color,
-                        'fillOpacity': 0.49
-                    }
-                }
-            }
-            
-            features.append(feature)
-    
-    # Create TimestampedGeoJson layer
-    TimestampedGeoJson(
-        {'type': 'FeatureCollection', 'features': features},
-        period='P1D',  # One day per step
-        add_last_point=False,
-        auto_play=False,
-        loop=False,
-        max_speed=1,
-        loop_button=True,
-        date_options='YYYY-MM-DD',
-        time_slider_drag_update=True
-    ).add_to(m)
+    # Per-parcel colours and popup values indexed by time step
+    animation_data = _animation_data(filtered_parcels, climate_data, lut, risk_type)
+    # '</' is escaped so text values cannot close the script element
+    animation_json = json.dumps(animation_data, separators=(',', ':')).replace('</', '<\\/')
+    animation_script = (ANIMATION_SCRIPT
+                        .replace('__ANIMATION_DATA__', animation_json)
+                        .replace('__MAP__', m.get_name())
+                        .replace('__PARCELS_LAYER__', parcels_layer.get_name()))
+    m.get_root().html.add_child(folium.Element(animation_script))
     
     # Add JavaScript for handling postMessage commands from parent window
     message_listener = """
@@ -0,0 +1,66 @@
+"""
+Parcel areas in hectares.
+Geometries are reprojected in one vectorized pass per UTM zone, with the zone
+of every parcel chosen from its centroid and one cached pyproj Transformer
+per zone, so recomputing the areas of all the parcels at startup does not
+build a transformer per parcel and stays correct outside UTM zone 21S.
+"""
+from functools import lru_cache
+import numpy as np
+import pyproj
+import shapely
+
+
+def utm_epsg(lon, lat):
+    """
+    Return the EPSG codes of the WGS84 UTM zones containing points
+
+    Parameters:
+    lon (array-like): Longitudes in degrees
+    lat (array-like): Latitudes in degrees
+
+    Returns:
+    ndarray: EPSG code of every point (326xx north, 327xx south)
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    zone = np.clip(np.floor((lon + 180) / 6).astype(int) + 1, 1, 60)
+    return np.where(lat >= 0, 32600, 32700) + zone
+
+
+@lru_cache(maxsize=None)
+def utm_transformer(epsg):
+    """Return the (cached) WGS84 -> UTM transformer of an EPSG code"""
+    return pyproj.Transformer.from_crs('EPSG:4326', f'EPSG:{epsg}', always_xy=True)
+
+
+def areas_in_hectares(geometries):
+    """
+    Calculate the area of lon/lat geometries in hectares
+
+    Parameters:
+    geometries (GeoSeries or array-like): Shapely geometries in WGS84 (EPSG:4326)
+
+    Returns:
+    ndarray: Area of every geometry in hectares rounded to 2 decimals (NaN for
+    missing or empty geometries)
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    areas = np.full(len(geometries), np.nan)
+    valid = ~(shapely.is_missing(geometries) | shapely.is_empty(geometries))
+    if not valid.any():
+        return areas
+
+    positions = np.flatnonzero(valid)
+    centroids = shapely.centroid(geometries[positions])
+    epsgs = utm_epsg(shapely.get_x(centroids), shapely.get_y(centroids))
+    for epsg in np.unique(epsgs):
+        zone_positions = positions[epsgs == epsg]
+        transformer = utm_transformer(int(epsg))
+        projected = shapely.transform(
+            geometries[zone_positions],
+            lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+        )
+        # Area in square meters to hectares (1 hectare = 10,000 m²)
+        areas[zone_positions] = shapely.area(projected) / 10000
+    return np.round(areas, 2)
@@ -0,0 +1,179 @@
+"""
+Service for the parcel endpoints over the parcels loaded at startup.
+Keeps every feature's geometry and properties as pre-serialized JSON fragments
+and the risk-related properties as NumPy arrays, so the parcel endpoints can
+assemble their responses from cached bytes. The geometry pyramid, spatial
+index and crop index are shared with the map endpoints.
+"""
+import threading
+import numpy as np
+import pandas as pd
+from data.geojson_fragments import ZoomFeatureFragments, dumps
+from data.geometry_pyramid import zoom_band
+
+
+# Probability properties a parcel feature may carry (percentages, 0-100)
+PROBABILITY_PROPERTIES = ['drought_probability', 'flood_probability', 'hail_probability', 'pest_probability']
+
+
+class ParcelsService:
+    """
+    Parcels served from pre-serialized fragments.
+    """
+
+    def __init__(self, pyramid, properties, index, crop_index, members=None):
+        """
+        Build the fragments and property arrays
+
+        Parameters:
+        pyramid (GeometryPyramid): Parcel geometries with their simplified levels
+        properties (list): Property dict per parcel, in the order of the geometries
+        index (ParcelIndex): Spatial index over the pyramid geometries
+        crop_index (CropIndex): Crop index of the parcels
+        members (dict): Top-level members of the FeatureCollection other than
+        the features (type, name, crs...)
+        """
+        self._members = dict(members or {'type': 'FeatureCollection'})
+
+        # JSON fragments of every feature's geometry and properties, with
+        # simplified geometries per zoom band
+        self.fragments = ZoomFeatureFragments(pyramid, properties, ids=[props.get('id') for props in properties])
+
+        # Spatial index for the bbox filter and the point queries
+        self.index = index
+
+        # Property columns used by the risk and summary calculations
+        self.ids = np.array([props.get('id') for props in properties], dtype=object)
+        self.crop_index = crop_index
+        self.base_risk = np.array([props.get('base_risk') or 0 for props in properties], dtype=float)
+        self.probabilities = {
+            name: np.array([props.get(name) or 0 for props in properties], dtype=float)
+            for name in PROBABILITY_PROPERTIES
+        }
+
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_geodataframe(cls, gdf, pyramid, index, crop_index, members=None):
+        """
+        Build the service for the parcels of a GeoDataFrame
+
+        Parameters:
+        gdf (GeoDataFrame): Parcels, in the order of the pyramid geometries
+        pyramid (GeometryPyramid): Geometries of the parcels
+        index (ParcelIndex): Spatial index over the pyramid geometries
+        crop_index (CropIndex): Crop index of the parcels
+        members (dict): Top-level members of the FeatureCollection
+
+        Returns:
+        ParcelsService: Service over every non-geometry column of the frame
+        """
+        columns = gdf.drop(columns=gdf.geometry.name)
+        # Missing values are served as null, as in the GeoJSON file
+        properties = columns.astype(object).where(pd.notna(columns), None).to_dict('records')
+        return cls(pyramid, properties, index, crop_index, members=members)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def high_risk_count(self, threshold=0.35):
+        """Return the number of parcels whose base risk exceeds the threshold"""
+        return int((self.base_risk > threshold).sum())
+
+    def crop_mask(self, crop_type='all'):
+        """Return a boolean mask of the parcels matching the crop filter"""
+        return self.crop_index.mask(crop_type)
+
+    def risk_levels(self, risk_type='general'):
+        """
+        Return the risk level (0-1) of every parcel for a risk type
+
+        Single risk types use their probability property. The general risk is
+        the average of the non-zero drought, flood, hail and pest probabilities.
+        """
+        if risk_type in ('drought', 'flood', 'pest'):
+            return self.probabilities[f'{risk_type}_probability'] / 100
+
+        stacked = np.column_stack([self.probabilities[name] for name in PROBABILITY_PROPERTIES])
+        positive = stacked > 0
+        counts = positive.sum(axis=1)
+        totals = np.where(positive, stacked, 0).sum(axis=1)
+        return np.divide(totals, counts * 100, out=np.zeros(len(self)), where=counts > 0)
+
+    def feature_collection(self, mask=None, extra_properties=None, zoom=None):
+        """
+        Assemble a FeatureCollection from the cached fragments
+
+        Parameters:
+        mask (ndarray): Boolean mask of the features to include, or None for all
+        extra_properties (dict): Property name -> array of per-feature values to append
+        zoom (int): Map zoom selecting the simplified geometries, or None for full resolution
+
+        Returns:
+        bytes: Serialized GeoJSON FeatureCollection
+        """
+        positions = None if mask is None else np.flatnonzero(mask)
+        return self.fragments.at(zoom).feature_collection(positions, extra_properties, members=self._members)
+
+    def cached(self, key, build):
+        """Return the cached response for a key, building it on first use"""
+        response = self._responses.get(key)
+        if response is None:
+            with self._lock:
+                response = self._responses.get(key)
+                if response is None:
+                    response = build()
+                    self._responses[key] = response
+        return response
+
+    def parcels_geojson(self, zoom=None, bbox=None):
+        """
+        Return the parcels FeatureCollection with the geometries of a map zoom
+
+        Parameters:
+        zoom (int): Map zoom selecting the simplified geometries, or None for full resolution
+        bbox (tuple): (west, south, east, north) to return only the parcels
+        intersecting the box, or None for all (only the full response is cached)
+        """
+        band = zoom_band(zoom)
+        if bbox is not None:
+            positions = self.index.bbox(*bbox)
+            return self.fragments.at(band).feature_collection(positions, members=self._members)
+        return self.cached(('parcels', band), lambda: self.feature_collection(zoom=band))
+
+    def parcels_at(self, lon, lat, zoom=None):
+        """Return the parcels containing a point as a FeatureCollection"""
+        positions = self.index.containing(lon, lat)
+        return self.fragments.at(zoom_band(zoom)).feature_collection(positions, members=self._members)
+
+    def nearest_parcels(self, lon, lat, k=1, zoom=None):
+        """Return the k parcels nearest to a point, nearest first, with their distance_m"""
+        positions, distances = self.index.nearest(lon, lat, k)
+        # Distances are appended per feature position, in result order
+        distance_m = np.zeros(len(self))
+        distance_m[positions] = np.round(distances, 1)
+        return self.fragments.at(zoom_band(zoom)).feature_collection(
+            positions, extra_properties={'distance_m': distance_m}, members=self._members
+        )
+
+    def parcels_topojson(self, zoom=None):
+        """Return the parcels as a quantized TopoJSON Topology for a map zoom"""
+        band = zoom_band(zoom)
+        return self.cached(('topojson', band), lambda: dumps(self.fragments.topojson(band, object_name='parcels')))
+
+    def risk_map_geojson(self, risk_type='general', crop_type='all', zoom=None):
+        """Return the parcels matching a crop filter with their risk_level for a risk type"""
+        # Normalize the key so unknown values share one cached response
+        if risk_type not in ('drought', 'flood', 'pest'):
+            risk_type = 'general'
+        crop_type = self.crop_index.filter_key(crop_type)
+        band = zoom_band(zoom)
+        return self.cached(
+            ('risk_map', risk_type, crop_type, band),
+            lambda: self.feature_collection(
+                mask=self.crop_mask(crop_type),
+                extra_properties={'risk_level': self.risk_levels(risk_type)},
+                zoom=band
+            )
+        )
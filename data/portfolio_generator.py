@@ -0,0 +1,305 @@
+"""
+Synthetic large parcel portfolios (10k to 1M parcels) for benchmarks.
+Parcels are laid out on a regular grid with one irregular polygon inside each
+cell, so they never overlap. Chunks of parcels are generated by a process
+pool, each chunk from its own seeded random stream, and written in order to a
+GeoJSON or GeoParquet file as they complete, so memory stays bounded by a few
+chunks whatever the size of the portfolio.
+
+Usage:
+    python -m data.portfolio_generator output.geojson [--parcels 100000] [--seed 0] [--workers 4]
+    python -m data.portfolio_generator output.parquet --parcels 1000000
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import shapely
+try:
+    from data.parcel_areas import areas_in_hectares
+except ImportError:  # Running this file directly from the data directory
+    from parcel_areas import areas_in_hectares
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, GeoJSON output is always available
+    pa = None
+    pq = None
+
+
+# Centre of the portfolio (same region as the bundled parcels)
+BASE_LON, BASE_LAT = -56.2, -32.8
+
+# Side of a grid cell in degrees (about 1.4 x 1.7 km at the portfolio latitude);
+# parcels cover 30-75 ha, about 50 ha on average
+CELL_SIZE = 0.015
+
+# Parcels generated (and written) per task
+CHUNK_SIZE = 10000
+
+SOIL_TYPES = ['Franco-arcilloso', 'Arcilloso', 'Franco-arenoso', 'Limoso']
+CROPS = ['Soja', 'Maiz']
+CROP_SHARES = [0.7, 0.3]
+
+# Coordinates are rounded to about 0.1 m to keep the files compact
+COORDINATE_DECIMALS = 6
+
+# Output format by file extension
+FORMATS = {'.geojson': 'geojson', '.json': 'geojson', '.parquet': 'parquet', '.geoparquet': 'parquet'}
+
+
+def parcel_name(i):
+    """
+    Return the spreadsheet-style letters of a parcel number, unique for any
+    number of parcels (0 -> 'A', 25 -> 'Z', 26 -> 'AA', 701 -> 'ZZ', 702 -> 'AAA')
+    """
+    letters = ''
+    i += 1
+    while i > 0:
+        i, remainder = divmod(i - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class GridLayout:
+    """
+    Square grid of parcel cells, row by row from the south-west corner,
+    centred on the portfolio centre.
+    """
+
+    def __init__(self, n, cell_size=CELL_SIZE, center=(BASE_LON, BASE_LAT)):
+        """
+        Parameters:
+        n (int): Number of parcels
+        cell_size (float): Side of a cell in degrees
+        center (tuple): (lon, lat) of the centre of the grid
+        """
+        self.cell_size = cell_size
+        self.columns = max(1, math.ceil(math.sqrt(n)))
+        self.rows = max(1, math.ceil(n / self.columns))
+        self.west = center[0] - self.columns * cell_size / 2
+        self.south = center[1] - self.rows * cell_size / 2
+
+    @property
+    def bounds(self):
+        """Return (west, south, east, north) of the grid"""
+        return (self.west, self.south,
+                self.west + self.columns * self.cell_size, self.south + self.rows * self.cell_size)
+
+    def cell_centers(self, start, stop):
+        """Return the (lon, lat) arrays of the centres of the cells of parcels start..stop-1"""
+        row, column = np.divmod(np.arange(start, stop), self.columns)
+        return (self.west + (column + 0.5) * self.cell_size,
+                self.south + (row + 0.5) * self.cell_size)
+
+
+def generate_chunk(seed, start, stop, layout):
+    """
+    Generate the parcels start..stop-1 of a portfolio
+
+    Parameters:
+    seed (SeedSequence): Random stream of the chunk
+    start (int): Number of the first parcel
+    stop (int): Number after the last parcel
+    layout (GridLayout): Grid of the portfolio
+
+    Returns:
+    dict: Columns id, area, soil_type, crop, base_risk and geometry (shapely array)
+    """
+    rng = np.random.default_rng(seed)
+    n = stop - start
+    half_cell = layout.cell_size / 2
+
+    # Parcel centre jittered inside its cell; the farthest vertex is at most
+    # (0.7 * 1.2 + 0.15) of half a cell from the cell centre, so parcels never overlap
+    lon, lat = layout.cell_centers(start, stop)
+    lon = lon + rng.uniform(-0.15, 0.15, n) * half_cell
+    lat = lat + rng.uniform(-0.15, 0.15, n) * half_cell
+    size = rng.uniform(0.5, 0.7, n) * half_cell
+
+    # 4-7 vertices per parcel at regular angles with irregular radii
+    num_points = rng.integers(4, 8, n)
+    parcel = np.repeat(np.arange(n), num_points)
+    vertex = np.arange(len(parcel)) - np.repeat(np.cumsum(num_points) - num_points, num_points)
+    angle = vertex * (2 * np.pi / num_points[parcel])
+    radius = size[parcel] * rng.uniform(0.8, 1.2, len(parcel))
+    coords = np.round(np.column_stack([
+        lon[parcel] + radius * np.sin(angle),
+        lat[parcel] + radius * np.cos(angle)
+    ]), COORDINATE_DECIMALS)
+    geometries = shapely.polygons(shapely.linearrings(coords, indices=parcel))
+
+    return {
+        'id': [f'Field_{parcel_name(i)}' for i in range(start, stop)],
+        'area': areas_in_hectares(geometries),
+        'soil_type': np.array(SOIL_TYPES)[rng.integers(0, len(SOIL_TYPES), n)],
+        'crop': rng.choice(CROPS, n, p=CROP_SHARES),
+        'base_risk': np.round(rng.uniform(0.1, 0.7, n), 2),
+        'geometry': geometries
+    }
+
+
+def _geojson_features(chunk):
+    """Serialize the parcels of a chunk as comma-separated GeoJSON features"""
+    geometries = shapely.to_geojson(chunk['geometry'])
+    features = []
+    for i, geometry in enumerate(geometries):
+        properties = json.dumps({
+            'id': chunk['id'][i],
+            'area': float(chunk['area'][i]),
+            'soil_type': str(chunk['soil_type'][i]),
+            'crop': str(chunk['crop'][i]),
+            'base_risk': float(chunk['base_risk'][i])
+        }, separators=(',', ':'))
+        features.append(f'{{"type":"Feature","properties":{properties},"geometry":{geometry}}}')
+    return ',\n'.join(features).encode('utf-8')
+
+
+def _parquet_schema(layout):
+    # GeoParquet 1.0 metadata; without a 'crs' member coordinates are OGC:CRS84 (lon/lat WGS84)
+    geo = {
+        'version': '1.0.0',
+        'primary_column': 'geometry',
+        'columns': {
+            'geometry': {'encoding': 'WKB', 'geometry_types': ['Polygon'], 'bbox': list(layout.bounds)}
+        }
+    }
+    return pa.schema([
+        ('id', pa.string()),
+        ('area', pa.float64()),
+        ('soil_type', pa.string()),
+        ('crop', pa.string()),
+        ('base_risk', pa.float64()),
+        ('geometry', pa.binary())
+    ], metadata={b'geo': json.dumps(geo).encode('utf-8')})
+
+
+def _parquet_table(chunk, layout):
+    """Convert the parcels of a chunk to an Arrow table with WKB geometries"""
+    columns = dict(chunk, geometry=shapely.to_wkb(chunk['geometry']))
+    return pa.Table.from_pydict(columns, schema=_parquet_schema(layout))
+
+
+def _chunk_output(output_format, seed, start, stop, layout):
+    """Generate a chunk and return it serialized for the output format (run by the workers)"""
+    chunk = generate_chunk(seed, start, stop, layout)
+    if output_format == 'parquet':
+        return _parquet_table(chunk, layout)
+    return _geojson_features(chunk)
+
+
+class _GeoJSONWriter:
+    """Writes a FeatureCollection one chunk of serialized features at a time."""
+
+    def __init__(self, path, layout):
+        self._file = open(path, 'wb')
+        self._file.write(b'{"type":"FeatureCollection","name":"parcels","features":[\n')
+        self._empty = True
+
+    def write(self, features):
+        if not features:
+            return
+        if not self._empty:
+            self._file.write(b',\n')
+        self._file.write(features)
+        self._empty = False
+
+    def close(self):
+        self._file.write(b'\n]}\n')
+        self._file.close()
+
+
+class _GeoParquetWriter:
+    """Writes a GeoParquet file with one row group per chunk."""
+
+    def __init__(self, path, layout):
+        self._writer = pq.ParquetWriter(path, _parquet_schema(layout))
+
+    def write(self, table):
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+def output_format(path):
+    """Return the output format ('geojson' or 'parquet') of a file path"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported portfolio file extension '{extension}', "
+                         f"expected one of {', '.join(sorted(FORMATS))}")
+    return FORMATS[extension]
+
+
+def generate_portfolio(path, n, seed=0, workers=None, chunk_size=CHUNK_SIZE, cell_size=CELL_SIZE, overwrite=False):
+    """
+    Generate a synthetic parcel portfolio and stream it to a file
+
+    Parameters:
+    path (str): Output file (.geojson or .parquet); written atomically
+    n (int): Number of parcels
+    seed (int): Seed of the portfolio; the same seed and chunk size give the same parcels
+    workers (int): Worker processes, defaults to one per CPU (1 generates in this process)
+    chunk_size (int): Parcels generated and written per task
+    cell_size (float): Side of the grid cell of each parcel in degrees
+    overwrite (bool): Replace the output file if it exists
+
+    Returns:
+    str: Path of the output file
+    """
+    fmt = output_format(path)
+    if fmt == 'parquet' and pq is None:
+        raise ImportError('pyarrow is required to write GeoParquet files')
+    if os.path.exists(path) and not overwrite:
+        raise FileExistsError(f"{path} already exists")
+
+    layout = GridLayout(n, cell_size)
+    chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    workers = min(workers or os.cpu_count() or 1, max(len(chunks), 1))
+
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    writer = (_GeoParquetWriter if fmt == 'parquet' else _GeoJSONWriter)(temp_path, layout)
+    try:
+        if workers == 1:
+            for chunk_seed, (start, stop) in zip(seeds, chunks):
+                writer.write(_chunk_output(fmt, chunk_seed, start, stop, layout))
+        else:
+            # Chunks are written in order; at most two per worker are pending at
+            # any time so finished chunks do not pile up in memory
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                pending = deque()
+                for chunk_seed, (start, stop) in zip(seeds, chunks):
+                    pending.append(executor.submit(_chunk_output, fmt, chunk_seed, start, stop, layout))
+                    if len(pending) >= 2 * workers:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+    except BaseException:
+        writer.close()
+        os.remove(temp_path)
+        raise
+    writer.close()
+    os.replace(temp_path, path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic parcel portfolio')
+    parser.add_argument('output', help='Output file (.geojson or .parquet)')
+    parser.add_argument('--parcels', type=int, default=100000, help='Number of parcels (default: 100000)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'Parcels per chunk (default: {CHUNK_SIZE})')
+    parser.add_argument('--force', action='store_true', help='Overwrite the output file if it exists')
+    args = parser.parse_args()
+
+    path = generate_portfolio(args.output, args.parcels, seed=args.seed, workers=args.workers,
+                              chunk_size=args.chunk_size, overwrite=args.force)
+    print(f"Generated {args.parcels} parcels in {path}")
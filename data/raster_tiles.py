@@ -0,0 +1,233 @@
+"""
+PNG raster tiles of the parcel risk colours.
+The parcels of a tile are rasterized together with a vectorized even-odd
+scanline fill and encoded with a minimal PNG writer (zlib only), so low-zoom
+overviews of large portfolios can be drawn by the browser as plain image
+tiles. Parcels only a few pixels wide are drawn without a border, and parcels
+smaller than a pixel still colour the pixel they fall in.
+"""
+import struct
+import zlib
+import numpy as np
+import shapely
+from data.vector_tiles import project_to_tile
+
+
+PNG_MIMETYPE = 'image/png'
+
+TILE_SIZE = 256
+
+# Same fill opacity and border colour as the parcels layer of the folium maps
+FILL_ALPHA = 125
+BORDER_RGBA = (0, 0, 0, 255)
+
+# Parcels narrower or shorter than this (in pixels) are drawn without a
+# border, which would otherwise cover their whole fill at low zooms
+MIN_BORDER_PIXELS = 8
+
+
+def encode_png(rgba):
+    """
+    Encode an RGBA image as PNG
+
+    Parameters:
+    rgba (ndarray): uint8 array of shape (height, width, 4)
+
+    Returns:
+    bytes: PNG file contents
+    """
+    height, width, _ = rgba.shape
+    # Filter type 0 (None) before every scanline
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def rasterize(geometries, size=TILE_SIZE):
+    """
+    Rasterize (Multi)Polygons in pixel coordinates with the even-odd rule
+
+    Parameters:
+    geometries (ndarray): Geometries in tile pixel coordinates
+    size (int): Tile width and height in pixels
+
+    Returns:
+    tuple: (geometry position, row, column) arrays of the pixels whose centre
+    is inside each geometry, in geometry order
+    """
+    rings, ring_geometry = shapely.get_rings(geometries, return_index=True)
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    empty = np.empty(0, dtype=np.intp)
+    if len(coords) == 0:
+        return empty, empty, empty
+
+    # Every ring segment as (x0, y0, x1, y1) with the geometry it belongs to
+    same_ring = ring_index[1:] == ring_index[:-1]
+    x0, y0 = coords[:-1][same_ring].T
+    x1, y1 = coords[1:][same_ring].T
+    segment_geometry = ring_geometry[ring_index[:-1][same_ring]]
+
+    # Pixel rows whose centre each segment crosses (half-open in y)
+    lo, hi = np.minimum(y0, y1), np.maximum(y0, y1)
+    first = np.clip(np.ceil(lo - 0.5), 0, size).astype(np.intp)
+    last = np.clip(np.ceil(hi - 0.5), 0, size).astype(np.intp)
+    counts = last - first
+    segment = np.repeat(np.arange(len(counts)), counts)
+    rows = first[segment] + np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)
+    centers = rows + 0.5
+    xs = x0[segment] + (centers - y0[segment]) * (x1[segment] - x0[segment]) / (y1[segment] - y0[segment])
+
+    # First pixel centre right of each crossing; sorted per geometry and row,
+    # consecutive pairs of crossings bound the spans inside the geometry
+    columns = np.clip(np.ceil(xs - 0.5), 0, size).astype(np.intp)
+    geometry = segment_geometry[segment]
+    order = np.lexsort((columns, rows, geometry))
+    geometry, rows, columns = geometry[order], rows[order], columns[order]
+    span_geometry, span_row = geometry[0::2], rows[0::2]
+    span_start, span_stop = columns[0::2], columns[1::2]
+
+    # Every pixel of every span
+    lengths = span_stop - span_start
+    span = np.repeat(np.arange(len(lengths)), lengths)
+    pixel_columns = span_start[span] + np.arange(len(span)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return span_geometry[span], span_row[span], pixel_columns
+
+
+def polygon_mask(geometry, size=TILE_SIZE):
+    """
+    Rasterize a (Multi)Polygon in pixel coordinates with the even-odd rule
+
+    Parameters:
+    geometry (Polygon or MultiPolygon): Geometry in tile pixel coordinates
+    size (int): Tile width and height in pixels
+
+    Returns:
+    ndarray: Boolean mask of the pixels whose centre is inside the geometry
+    """
+    mask = np.zeros((size, size), dtype=bool)
+    _, rows, columns = rasterize(np.array([geometry], dtype=object), size)
+    mask[rows, columns] = True
+    return mask
+
+
+def _borders(geometry, rows, columns, size=TILE_SIZE):
+    """
+    Return the pixels of each geometry that touch a pixel outside it
+
+    Parameters:
+    geometry, rows, columns (ndarray): Pixels of the geometries, as returned by rasterize()
+    size (int): Tile width and height in pixels
+
+    Returns:
+    ndarray: Boolean array, True for the border pixels (pixels on the tile
+    edge only count the neighbours inside the tile)
+    """
+    keys = (geometry.astype(np.int64) * size + rows) * size + columns
+    sorted_keys = np.sort(keys)
+
+    def contains(neighbour_keys):
+        found = np.clip(np.searchsorted(sorted_keys, neighbour_keys), 0, len(sorted_keys) - 1)
+        return sorted_keys[found] == neighbour_keys
+
+    border = np.zeros(len(keys), dtype=bool)
+    for valid, offset in ((rows > 0, -size), (rows < size - 1, size),
+                          (columns > 0, -1), (columns < size - 1, 1)):
+        border |= valid & ~contains(keys + offset)
+    return border
+
+
+class RasterTiles:
+    """
+    PNG tile renderer for the parcels of a ParcelTiles source.
+    """
+
+    def __init__(self, parcel_tiles):
+        """
+        Parameters:
+        parcel_tiles (ParcelTiles): Parcel geometries per zoom band and tile lookup
+        """
+        self.parcel_tiles = parcel_tiles
+
+    def render(self, z, x, y, colors):
+        """
+        Render one tile
+
+        Parameters:
+        z, x, y (int): Tile address
+        colors (ndarray): uint8 RGB colour per parcel, shape (parcels, 3)
+
+        Returns:
+        bytes: PNG tile (transparent when no parcel touches the tile)
+        """
+        positions = self.parcel_tiles.positions(z, x, y)
+        if len(positions) == 0:
+            return EMPTY_TILE
+
+        geometries, _ = self.parcel_tiles.shapes(z)
+        projected = project_to_tile(geometries[positions], z, x, y, extent=TILE_SIZE)
+        projected = np.where(shapely.is_empty(projected) | shapely.is_missing(projected), None, projected)
+        geometry, rows, columns = rasterize(projected)
+
+        # Parcels smaller than a pixel cover no pixel centre: they colour the
+        # pixel of a point inside them instead
+        covered = np.zeros(len(projected), dtype=bool)
+        covered[geometry] = True
+        small = np.flatnonzero(~covered & ~shapely.is_missing(projected))
+        if len(small):
+            points = shapely.get_coordinates(shapely.point_on_surface(projected[small]))
+            point_columns, point_rows = np.floor(points).astype(np.intp).T
+            inside = (point_columns >= 0) & (point_columns < TILE_SIZE) & (point_rows >= 0) & (point_rows < TILE_SIZE)
+            geometry = np.concatenate([geometry, small[inside]])
+            rows = np.concatenate([rows, point_rows[inside]])
+            columns = np.concatenate([columns, point_columns[inside]])
+
+        # Parcels later in the tile are drawn over earlier ones
+        owner = np.full(TILE_SIZE * TILE_SIZE, -1, dtype=np.intp)
+        np.maximum.at(owner, rows * TILE_SIZE + columns, geometry)
+        owner = owner.reshape(TILE_SIZE, TILE_SIZE)
+        filled = owner >= 0
+
+        image = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+        image[filled, :3] = colors[positions[owner[filled]]]
+        image[filled, 3] = FILL_ALPHA
+
+        # Borders only for parcels large enough to keep their fill visible
+        bounds = shapely.bounds(projected)
+        bordered = np.fmin(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]) >= MIN_BORDER_PIXELS
+        pixels = bordered[geometry]
+        border = _borders(geometry[pixels], rows[pixels], columns[pixels])
+        image[rows[pixels][border], columns[pixels][border]] = BORDER_RGBA
+        return encode_png(image)
+
+
+def tile_range(bounds, z):
+    """
+    Return the tile columns and rows covering a longitude/latitude box
+
+    Parameters:
+    bounds (tuple): (west, south, east, north) in degrees
+    z (int): Zoom level
+
+    Returns:
+    tuple: (range of x, range of y)
+    """
+    n = 2 ** z
+    west, south, east, north = bounds
+
+    def column(lon):
+        return min(max(int((lon + 180.0) / 360.0 * n), 0), n - 1)
+
+    def row(lat):
+        lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+        return min(max(int((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n), 0), n - 1)
+
+    return range(column(west), column(east) + 1), range(row(north), row(south) + 1)
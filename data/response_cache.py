@@ -0,0 +1,72 @@
+"""
+Bounded in-memory cache for serialized HTTP responses.
+Entries are evicted in least-recently-used order and hit/miss counters are
+kept so cache efficiency can be checked from the API.
+"""
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache mapping a request key to response bytes.
+    """
+
+    def __init__(self, name, maxsize=256):
+        """
+        Parameters:
+        name (str): Name reported in the cache statistics
+        maxsize (int): Maximum number of entries kept before evicting
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value for a key, or None (counts a hit or a miss)"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries (used when the underlying data is reloaded)"""
+        with self._lock:
+            self._entries.clear()
+
+    def discard(self, predicate):
+        """Drop the entries whose key matches a predicate (used when only part of the data changes)"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def stats(self):
+        """Return the size and hit/miss counters of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
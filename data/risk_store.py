@@ -0,0 +1,311 @@
+"""
+Indexed columnar store for the climate risk data.
+Holds every climate column as a NumPy array sorted by date and indexed by
+parcel, so the web routes can answer per-date and per-parcel queries without
+scanning the whole table.
+"""
+import copy
+import numpy as np
+import pandas as pd
+
+
+# Columns used to derive risk_level when the climate file does not provide it
+RISK_TYPE_COLUMNS = {
+    'drought': 'drought_probability',
+    'flood': 'flood_probability',
+    'pest': 'hail_probability',
+    'general': 'general_risk'
+}
+
+# Per-risk-type level columns (0-1) of the climate file
+RISK_LEVEL_COLUMNS = {
+    'drought': 'drought_risk_level',
+    'flood': 'flood_risk_level',
+    'pest': 'pest_risk_level',
+    'general': 'risk_level'
+}
+
+
+def _column_values(series):
+    """Return the values of a column as an array, with missing text values (e.g. empty alerts) as None"""
+    values = series.to_numpy()
+    if values.dtype == object:
+        values = np.where(pd.isna(values) | (values == ''), None, values)
+    return values
+
+
+def _date_index(date_values):
+    """Return the distinct dates of a sorted date array and the contiguous slice of rows of each"""
+    if len(date_values):
+        date_starts = np.flatnonzero(np.append(True, date_values[1:] != date_values[:-1]))
+    else:
+        date_starts = np.empty(0, dtype=np.intp)
+    date_stops = np.append(date_starts[1:], len(date_values))
+    dates = date_values[date_starts]
+    return dates, {
+        date: slice(int(start), int(stop))
+        for date, start, stop in zip(dates.tolist(), date_starts, date_stops)
+    }
+
+
+def _parcel_index(parcel_values):
+    """Return the distinct parcel ids and the row positions of each (in row order)"""
+    order = np.argsort(parcel_values, kind='stable')
+    parcel_ids, parcel_starts = np.unique(parcel_values[order], return_index=True)
+    parcel_stops = np.append(parcel_starts[1:], len(parcel_values))
+    return parcel_ids, {
+        parcel_id: order[start:stop]
+        for parcel_id, start, stop in zip(parcel_ids.tolist(), parcel_starts, parcel_stops)
+    }
+
+
+class RiskStore:
+    """
+    Columnar in-memory view of the climate risk table.
+
+    Rows are sorted by date (keeping the file order of parcels), so all the
+    rows of one date are a contiguous slice of every column array. A second
+    index keeps, for each parcel, the row positions of its history in date
+    order.
+    """
+
+    def __init__(self, climate_data):
+        """
+        Build the store from a climate risk DataFrame
+
+        Parameters:
+        climate_data (DataFrame): Climate risk data with 'parcel_id' and 'date' columns
+        """
+        # Stable sort keeps the file order of parcels within each date
+        df = climate_data.sort_values('date', kind='mergesort').reset_index(drop=True)
+
+        self.columns = list(df.columns)
+        self._arrays = {column: _column_values(df[column]) for column in self.columns}
+
+        # Date index: every date maps to a contiguous slice of rows
+        self.dates, self._date_slices = _date_index(self._arrays['date'])
+
+        # Parcel index: row positions of each parcel, already in date order
+        self.parcel_ids, self._parcel_rows = _parcel_index(self._arrays['parcel_id'])
+
+        # Alerts are only shown on the index page, keep them in the file order
+        if 'alert' in climate_data.columns:
+            self.alert_records = climate_data.dropna(subset=['alert']).to_dict('records')
+        else:
+            self.alert_records = []
+
+        # Identifier of the row order, carried in pagination cursors (set by the app)
+        self.version = None
+
+    def __len__(self):
+        return len(self._arrays['date'])
+
+    def append(self, rows, version=None):
+        """
+        Return a new store with climate rows added, updating the date and parcel
+        indexes instead of sorting and indexing the whole table again. The
+        existing store is left unchanged for the requests still reading it.
+
+        Rows of dates after the last date go to the end of the columns and only
+        add entries to the indexes; rows of loaded dates (e.g. parcels added to
+        the portfolio) are merged into the slices of their dates.
+
+        Parameters:
+        rows (DataFrame): New climate rows with the columns of the store
+        version (str): Version of the new store when rows of loaded dates are
+        merged, which moves the existing rows; appending later dates keeps the
+        version of this store
+
+        Returns:
+        RiskStore: Store with the old and the new rows
+        """
+        missing = [column for column in self.columns if column not in rows.columns]
+        if missing:
+            raise ValueError(f"Climate rows are missing columns: {', '.join(missing)}")
+
+        store = copy.copy(self)
+        if len(rows) == 0:
+            return store
+
+        # Stable sort keeps the file order of parcels within each new date
+        new = rows.sort_values('date', kind='mergesort').reset_index(drop=True)
+        new_arrays = {column: _column_values(new[column]) for column in self.columns}
+        old_count, new_count = len(self), len(new)
+        new_dates = new_arrays['date']
+
+        if self.max_date is None or new_dates[0] > self.max_date:
+            # Only later dates: the existing rows keep their positions
+            old_positions = None
+            new_positions = np.arange(old_count, old_count + new_count)
+        else:
+            # Merge by date, the new rows of a date going after its existing rows
+            old_dates = self._arrays['date']
+            old_positions = np.arange(old_count) + np.searchsorted(new_dates, old_dates, side='left')
+            new_positions = np.arange(new_count) + np.searchsorted(old_dates, new_dates, side='right')
+            store.version = version
+
+        store._arrays = {}
+        for column in self.columns:
+            old_values, new_values = self._arrays[column], new_arrays[column]
+            values = np.empty(old_count + new_count, dtype=np.result_type(old_values, new_values))
+            values[slice(0, old_count) if old_positions is None else old_positions] = old_values
+            values[new_positions] = new_values
+            store._arrays[column] = values
+
+        # Date index: new slices only, unless the slices of loaded dates moved
+        if old_positions is None:
+            added_dates, added_slices = _date_index(new_dates)
+            store.dates = np.append(self.dates, added_dates)
+            store._date_slices = dict(self._date_slices)
+            for date, rows_slice in added_slices.items():
+                store._date_slices[date] = slice(rows_slice.start + old_count, rows_slice.stop + old_count)
+        else:
+            store.dates, store._date_slices = _date_index(store._arrays['date'])
+
+        # Parcel index: the new positions of each parcel are added to its history
+        if old_positions is None:
+            store._parcel_rows = dict(self._parcel_rows)
+        else:
+            store._parcel_rows = {parcel_id: old_positions[parcel_rows]
+                                  for parcel_id, parcel_rows in self._parcel_rows.items()}
+        added_ids, added_rows = _parcel_index(new_arrays['parcel_id'])
+        new_parcels = False
+        for parcel_id, parcel_rows in added_rows.items():
+            parcel_rows = new_positions[parcel_rows]
+            if parcel_id in store._parcel_rows:
+                parcel_rows = np.concatenate([store._parcel_rows[parcel_id], parcel_rows])
+                if old_positions is not None:
+                    parcel_rows.sort()
+            else:
+                new_parcels = True
+            store._parcel_rows[parcel_id] = parcel_rows
+        if new_parcels:
+            store.parcel_ids = np.union1d(self.parcel_ids, added_ids)
+
+        if 'alert' in rows.columns:
+            store.alert_records = self.alert_records + rows.dropna(subset=['alert']).to_dict('records')
+        return store
+
+    @property
+    def min_date(self):
+        return self.dates[0] if len(self.dates) else None
+
+    @property
+    def max_date(self):
+        return self.dates[-1] if len(self.dates) else None
+
+    def has_date(self, date):
+        return date in self._date_slices
+
+    def date_rows(self, date):
+        """Return the slice of rows for a date (an empty slice if the date is unknown)"""
+        return self._date_slices.get(date, slice(0, 0))
+
+    def parcel_rows(self, parcel_id, start_date=None, end_date=None):
+        """
+        Return the row positions of a parcel, optionally limited to a date range
+
+        Parameters:
+        parcel_id (str): Parcel identifier
+        start_date (str): First date to include ('YYYY-MM-DD'), or None
+        end_date (str): Last date to include ('YYYY-MM-DD'), or None
+
+        Returns:
+        ndarray: Row positions in date order
+        """
+        rows = self._parcel_rows.get(parcel_id)
+        if rows is None:
+            return np.empty(0, dtype=np.intp)
+
+        if start_date is not None or end_date is not None:
+            parcel_dates = self._arrays['date'][rows]
+            lo = np.searchsorted(parcel_dates, start_date, side='left') if start_date is not None else 0
+            hi = np.searchsorted(parcel_dates, end_date, side='right') if end_date is not None else len(rows)
+            rows = rows[lo:hi]
+
+        return rows
+
+    def column(self, column, date):
+        """Return the values of a column for all parcels on a date"""
+        return self._arrays[column][self.date_rows(date)]
+
+    def values(self, column, rows):
+        """Return the values of a column for the given rows"""
+        return self._arrays[column][rows]
+
+    def for_date(self, date, columns=None):
+        """Return the rows of a date as a DataFrame"""
+        return self._frame(self.date_rows(date), columns)
+
+    def parcel_history(self, parcel_id, start_date=None, end_date=None, columns=None):
+        """Return the history of a parcel over a date range as a DataFrame"""
+        return self._frame(self.parcel_rows(parcel_id, start_date, end_date), columns)
+
+    def risk_levels(self, date, risk_type='general'):
+        """
+        Return the parcel ids and risk levels (0-1) for a date
+
+        The stored 'risk_level' column is used when present, otherwise the
+        level is derived from the probability column of the risk type.
+
+        Returns:
+        tuple: (parcel_ids, risk_levels) arrays aligned by position
+        """
+        rows = self.date_rows(date)
+        parcel_ids = self._arrays['parcel_id'][rows]
+
+        if 'risk_level' in self._arrays:
+            levels = self._arrays['risk_level'][rows]
+        else:
+            column = RISK_TYPE_COLUMNS.get(risk_type, RISK_TYPE_COLUMNS['general'])
+            levels = self._arrays[column][rows] / 100.0
+
+        return parcel_ids, levels
+
+    def risk_type_levels(self, date):
+        """
+        Return the parcel ids and the level (0-1) of every risk type for a date
+
+        Each risk type uses its level column when present, otherwise its
+        probability column divided by 100.
+
+        Returns:
+        tuple: (parcel_ids, dict of risk type -> levels array aligned with parcel_ids)
+        """
+        rows = self.date_rows(date)
+        levels = {}
+        for risk_type, column in RISK_LEVEL_COLUMNS.items():
+            if column in self._arrays:
+                levels[risk_type] = self._arrays[column][rows].astype(float)
+            else:
+                levels[risk_type] = self._arrays[RISK_TYPE_COLUMNS[risk_type]][rows] / 100.0
+        return self._arrays['parcel_id'][rows], levels
+
+    def records(self, rows, columns=None):
+        """
+        Return the given rows as a list of JSON-ready dicts (NaN becomes None)
+
+        Parameters:
+        rows (slice or ndarray): Rows to convert
+        columns (list): Columns to include, defaults to all columns
+
+        Returns:
+        list: One dict per row
+        """
+        columns = columns or self.columns
+        values = [self._json_values(column, rows) for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def _json_values(self, column, rows):
+        values = self._arrays[column][rows]
+        if values.dtype.kind == 'f':
+            missing = np.flatnonzero(np.isnan(values))
+            values = values.tolist()
+            for i in missing:
+                values[i] = None
+            return values
+        return values.tolist()
+
+    def _frame(self, rows, columns=None):
+        columns = columns or self.columns
+        return pd.DataFrame({column: self._arrays[column][rows] for column in columns})
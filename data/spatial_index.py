@@ -0,0 +1,133 @@
+"""
+Spatial index over the parcel geometries.
+Wraps a shapely STRtree so viewport (bounding box), point-in-parcel and
+nearest-parcel queries only test the parcels near the query instead of
+iterating the whole portfolio.
+"""
+import math
+import numpy as np
+import shapely
+from shapely.geometry import box, Point
+
+
+# Metres per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111320.0
+
+# Most parcels a nearest query may return
+MAX_NEAREST = 100
+
+
+def parse_bbox(value):
+    """
+    Parse a 'west,south,east,north' bounding box query parameter
+
+    Parameters:
+    value (str): Query parameter value, or None
+
+    Returns:
+    tuple: (west, south, east, north) as floats, or None when no box was given
+
+    Raises:
+    ValueError: If the value is not four numbers with west <= east and south <= north
+    """
+    if not value:
+        return None
+    try:
+        west, south, east, north = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise ValueError(f"Invalid bbox '{value}': expected west,south,east,north")
+    if not all(math.isfinite(v) for v in (west, south, east, north)) or west > east or south > north:
+        raise ValueError(f"Invalid bbox '{value}': expected west <= east and south <= north")
+    return west, south, east, north
+
+
+def parse_point(args):
+    """
+    Parse the lon/lat query parameters of a point query
+
+    Returns:
+    tuple: (lon, lat) as floats
+
+    Raises:
+    ValueError: If lon or lat is missing or not a finite number
+    """
+    try:
+        lon, lat = float(args['lon']), float(args['lat'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('lon and lat are required numbers')
+    if not (math.isfinite(lon) and math.isfinite(lat)):
+        raise ValueError('lon and lat are required numbers')
+    return lon, lat
+
+
+class ParcelIndex:
+    """
+    STRtree over a list of parcel geometries; queries return parcel positions.
+    """
+
+    def __init__(self, geometries):
+        """
+        Parameters:
+        geometries (list): Shapely geometries (or None) in parcel order
+        """
+        self.geometries = np.array(geometries, dtype=object)
+        self.tree = shapely.STRtree(self.geometries)
+        # Missing or empty geometries are not stored in the tree
+        self.indexed_count = int((~shapely.is_missing(self.geometries) & ~shapely.is_empty(self.geometries)).sum())
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def bbox(self, west, south, east, north):
+        """Return the sorted positions of the parcels intersecting a bounding box"""
+        hits = self.tree.query(box(west, south, east, north), predicate='intersects')
+        return np.sort(hits)
+
+    def bbox_candidates(self, west, south, east, north):
+        """Return the sorted positions of the parcels whose bounds intersect a box (no exact test)"""
+        return np.sort(self.tree.query(box(west, south, east, north)))
+
+    def containing(self, lon, lat):
+        """Return the sorted positions of the parcels containing a point (borders included)"""
+        return np.sort(self.tree.query(Point(lon, lat), predicate='intersects'))
+
+    def nearest(self, lon, lat, k=1):
+        """
+        Return the k parcels nearest to a point
+
+        Distances are measured on a local equirectangular projection around the
+        point, which is accurate at farm and region scale.
+
+        Parameters:
+        lon, lat (float): Query point in degrees
+        k (int): Number of parcels to return
+
+        Returns:
+        tuple: (positions, distances in metres), nearest first; parcels
+        containing the point have distance 0
+        """
+        k = min(k, self.indexed_count)
+        if k <= 0:
+            return np.array([], dtype=np.intp), np.array([])
+
+        # Longitude degrees are shorter away from the equator
+        x_scale = max(math.cos(math.radians(lat)), 1e-6)
+        point = Point(0.0, 0.0)
+
+        def to_local(coords):
+            return np.column_stack([(coords[:, 0] - lon) * x_scale, coords[:, 1] - lat])
+
+        # Grow a search box until it holds k parcels within its radius: any
+        # parcel nearer than the radius intersects the box, so the result is exact
+        radius = max(self.tree.query_nearest(Point(lon, lat), return_distance=True)[1].min(), 1e-6)
+        while True:
+            candidates = self.tree.query(box(lon - radius / x_scale, lat - radius,
+                                             lon + radius / x_scale, lat + radius))
+            distances = shapely.distance(shapely.transform(self.geometries[candidates], to_local), point)
+            within = distances <= radius
+            if within.sum() >= k or len(candidates) == self.indexed_count:
+                break
+            radius *= 2
+
+        order = np.lexsort((candidates, distances))[:k]
+        return candidates[order], distances[order] * METERS_PER_DEGREE
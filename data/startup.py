@@ -0,0 +1,111 @@
+"""
+Concurrent, instrumented loading of the application datasets.
+Runs each dataset loader in a thread pool, records how long every import and
+load phase takes and reports readiness for the health endpoint.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class DataLoader:
+    """
+    Runs named dataset loaders concurrently and keeps per-phase timings.
+
+    Each loader is a callable taking the DataLoader itself, so it can time
+    its own sub-phases (such as importing a heavy library) with phase().
+    """
+
+    def __init__(self, loaders, max_workers=None):
+        """
+        Parameters:
+        loaders (dict): Dataset name -> callable(loader) returning the dataset
+        max_workers (int): Thread pool size, defaults to one thread per loader
+        """
+        self.loaders = dict(loaders)
+        self.max_workers = max_workers or max(1, len(self.loaders))
+        self.timings = {}
+        self._futures = None
+        self._started_at = None
+        self._finished_at = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager recording the duration of a named phase in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 4)
+
+    def start(self):
+        """Submit all loaders to the thread pool (only the first call has an effect)"""
+        with self._lock:
+            if self._futures is None:
+                self._started_at = time.perf_counter()
+                self._pending = len(self.loaders)
+                executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='data-loader')
+                self._futures = {
+                    name: executor.submit(self._run, name, loader)
+                    for name, loader in self.loaders.items()
+                }
+                executor.shutdown(wait=False)
+        return self
+
+    def _run(self, name, loader):
+        try:
+            with self.phase(f'load {name}'):
+                return loader(self)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if self._pending == 0:
+                    self._finished_at = time.perf_counter()
+
+    def result(self):
+        """Start loading if needed, wait for every loader and return name -> dataset"""
+        self.start()
+        return {name: future.result() for name, future in self._futures.items()}
+
+    @property
+    def started(self):
+        return self._futures is not None
+
+    @property
+    def ready(self):
+        """True once every loader has finished without errors"""
+        return self.started and all(
+            future.done() and future.exception() is None for future in self._futures.values()
+        )
+
+    def status(self):
+        """Return the loading state, per-dataset status and phase timings"""
+        if not self.started:
+            return {'state': 'not_started', 'datasets': {name: 'pending' for name in self.loaders}, 'timings': dict(self.timings)}
+
+        datasets = {}
+        for name, future in self._futures.items():
+            if not future.done():
+                datasets[name] = 'loading'
+            elif future.exception() is not None:
+                datasets[name] = f'failed: {future.exception()}'
+            else:
+                datasets[name] = 'ready'
+
+        if any(state.startswith('failed') for state in datasets.values()):
+            state = 'failed'
+        elif all(state == 'ready' for state in datasets.values()):
+            state = 'ready'
+        else:
+            state = 'loading'
+
+        end = self._finished_at or time.perf_counter()
+        return {
+            'state': state,
+            'datasets': datasets,
+            'timings': dict(self.timings),
+            'elapsed': round(end - self._started_at, 4)
+        }
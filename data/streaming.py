@@ -0,0 +1,135 @@
+"""
+Cursor pagination and NDJSON streaming for the tabular API endpoints.
+Rows are selected by position in the in-memory stores; a cursor is the
+position of the last row returned, so the next page starts right after it
+without re-counting the rows before it. Cursors carry the version of the
+rows they were issued for, so a cursor of rows that have since been
+renumbered (a reload, or parcels merged into loaded dates) is rejected
+instead of skipping or repeating rows. NDJSON responses convert and
+serialize the selected rows in fixed-size chunks, keeping memory bounded.
+"""
+import json
+import numpy as np
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Rows converted to dicts at a time while streaming
+STREAM_CHUNK_SIZE = 1000
+
+# Largest page size accepted by the limit parameter
+MAX_PAGE_SIZE = 10000
+
+
+class StaleCursorError(ValueError):
+    """Raised for a cursor issued for a previous version of the rows"""
+
+
+def parse_page_args(args):
+    """
+    Read the format, limit and after query parameters
+
+    Parameters:
+    args (MultiDict): Request query parameters
+
+    Returns:
+    tuple: (format, limit, after) with limit as int or None and the after
+    cursor as str or None (checked by paginate())
+
+    Raises:
+    ValueError: If a parameter is not a valid value
+    """
+    response_format = args.get('format', 'json').lower()
+    if response_format not in ('json', 'ndjson'):
+        raise ValueError(f"Invalid format '{response_format}', expected 'json' or 'ndjson'")
+
+    limit = args.get('limit')
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    return response_format, limit, args.get('after')
+
+
+def encode_cursor(position, version=None):
+    """Return the cursor of a row position: '<version>:<position>', or the position without a version"""
+    return str(position) if version is None else f'{version}:{position}'
+
+
+def decode_cursor(cursor, version=None):
+    """
+    Return the row position of a cursor
+
+    Parameters:
+    cursor (str): Cursor returned with a previous page
+    version (str): Current version of the rows, or None if they are not versioned
+
+    Returns:
+    int: Position of the last row of the previous page
+
+    Raises:
+    StaleCursorError: If the cursor was issued for another version of the rows
+    ValueError: If the cursor is not valid
+    """
+    cursor_version, _, position = cursor.rpartition(':')
+    try:
+        position = int(position)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if (cursor_version or None) != version:
+        raise StaleCursorError(f"Cursor '{cursor}' is from a previous version of the data, "
+                               f"request the first page again")
+    return position
+
+
+def row_positions(rows, length):
+    """Return a slice or array of row positions as a sorted position array"""
+    if isinstance(rows, slice):
+        return np.arange(length)[rows]
+    return np.sort(np.asarray(rows, dtype=np.intp))
+
+
+def paginate(rows, limit=None, after=None, version=None):
+    """
+    Select one page of row positions after a cursor
+
+    Parameters:
+    rows (ndarray): Sorted row positions of the whole selection
+    limit (int): Maximum number of rows in the page, or None for all
+    after (str): Cursor returned with the previous page, or None to start
+    version (str): Version of the row positions, changed whenever rows are renumbered
+
+    Returns:
+    tuple: (page rows, next cursor or None when this is the last page)
+
+    Raises:
+    StaleCursorError: If the cursor was issued for another version of the rows
+    ValueError: If the cursor is not valid
+    """
+    if after is not None:
+        rows = rows[np.searchsorted(rows, decode_cursor(after, version), side='right'):]
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(int(page[-1]), version)
+
+
+def ndjson_lines(records_for, rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Generate NDJSON lines for the given rows, one chunk of records at a time
+
+    Parameters:
+    records_for (callable): Converts an array of rows to a list of dicts
+    rows (ndarray): Row positions to stream
+    chunk_size (int): Number of rows converted per chunk
+
+    Yields:
+    bytes: Newline-terminated JSON documents, one per record
+    """
+    for start in range(0, len(rows), chunk_size):
+        records = records_for(rows[start:start + chunk_size])
+        yield b''.join(
+            json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+            for record in records
+        )
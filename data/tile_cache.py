@@ -0,0 +1,80 @@
+"""
+On-disk cache for generated map tiles.
+Tiles are stored under a directory per data version, so a reload of the data
+files starts a new cache instead of serving tiles built from old data; the
+directories of the previous versions are deleted with prune().
+"""
+import os
+import shutil
+import tempfile
+
+
+class DiskTileCache:
+    """
+    Tile files stored as <root>/<version>/<layer>/<z>/<x>/<y>.<extension>.
+    """
+
+    def __init__(self, root, extension):
+        """
+        Parameters:
+        root (str): Cache directory
+        extension (str): File extension of the tiles (e.g. 'mvt', 'png')
+        """
+        self.root = root
+        self.extension = extension
+
+    def path(self, version, layer, z, x, y):
+        """Return the file path of a tile"""
+        return os.path.join(self.root, version, layer, str(z), str(x), f'{y}.{self.extension}')
+
+    def get(self, version, layer, z, x, y):
+        """Return the cached tile bytes, or None if the tile is not on disk"""
+        try:
+            with open(self.path(version, layer, z, x, y), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, version, layer, z, x, y, data):
+        """Write a tile to disk (atomically, so readers never see partial files)"""
+        path = self.path(version, layer, z, x, y)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temporary file per writer, so threads and processes
+            # rendering the same tile do not write into each other's file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'{y}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                os.unlink(temp_path)
+                raise
+        except OSError as e:
+            # The disk cache is an optimization, tiles are still served from memory
+            print(f"Could not write tile cache file {path}: {str(e)}")
+
+    def prune(self, version):
+        """
+        Delete the tiles of every data version other than the given one
+
+        The cache directory only holds version directories, so every other
+        directory in it belongs to a previous version of the data.
+
+        Parameters:
+        version (str): Data version whose tiles are kept
+
+        Returns:
+        list: Versions whose directories were deleted
+        """
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        removed = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            if name != version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+        return removed
@@ -0,0 +1,277 @@
+"""
+Mapbox Vector Tiles (MVT 2.1) for the parcels.
+Cuts the parcel geometries of the zoom band into Web Mercator tiles and
+encodes them with a minimal protobuf writer, so no extra dependency is needed.
+"""
+import math
+import struct
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from shapely.geometry.polygon import orient
+from data.geometry_pyramid import zoom_band
+from data.spatial_index import ParcelIndex
+
+
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+# Tile coordinate range and the margin kept around each tile for clipping
+EXTENT = 4096
+BUFFER = 64
+
+LAYER_NAME = 'parcels'
+
+
+def tile_bounds(z, x, y):
+    """
+    Return the longitude/latitude bounds of a Web Mercator tile
+
+    Returns:
+    tuple: (west, south, east, north) in degrees
+    """
+    n = 2 ** z
+
+    def latitude(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)
+
+
+def project_to_tile(geometries, z, x, y, extent=EXTENT):
+    """
+    Project longitude/latitude geometries to the pixel coordinates of a tile
+
+    Parameters:
+    geometries (ndarray): Shapely geometries in degrees
+    z, x, y (int): Tile address
+    extent (int): Tile coordinate range (Web Mercator, y pointing down)
+
+    Returns:
+    ndarray: Projected geometries
+    """
+    n = 2 ** z
+
+    def to_tile(coords):
+        lon, lat = coords[:, 0], np.radians(np.clip(coords[:, 1], -85.0511, 85.0511))
+        tx = ((lon + 180.0) / 360.0 * n - x) * extent
+        ty = ((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n - y) * extent
+        return np.column_stack([tx, ty])
+
+    return shapely.transform(geometries, to_tile)
+
+
+def valid_tile(z, x, y):
+    """Return True if z/x/y addresses an existing tile"""
+    return 0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+# Protobuf encoding
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, data):
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _uint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(value) for value in values))
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _value(value):
+    """Encode a tile attribute value message"""
+    if isinstance(value, str):
+        return _bytes_field(1, value.encode('utf-8'))
+    if isinstance(value, bool):
+        return _uint_field(7, int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint((value << 1) ^ (value >> 63))
+    return _key(3, 1) + struct.pack('<d', float(value))
+
+
+def _ring_commands(coords, cursor):
+    """Encode one ring as MoveTo, LineTo and ClosePath commands"""
+    commands = []
+    points = coords[:-1]
+    dx, dy = points[0][0] - cursor[0], points[0][1] - cursor[1]
+    commands += [(1 << 3) | 1, _zigzag(dx), _zigzag(dy)]
+    commands.append(((len(points) - 1) << 3) | 2)
+    for previous, point in zip(points[:-1], points[1:]):
+        commands += [_zigzag(point[0] - previous[0]), _zigzag(point[1] - previous[1])]
+    commands.append((1 << 3) | 7)
+    return commands, points[-1]
+
+
+def polygon_commands(geometry):
+    """
+    Encode a (Multi)Polygon in integer tile coordinates as MVT geometry commands
+
+    Exterior rings are oriented with positive area and interior rings with
+    negative area in tile coordinates, as the specification requires.
+    """
+    polygons = list(geometry.geoms) if geometry.geom_type == 'MultiPolygon' else [geometry]
+    commands = []
+    cursor = (0, 0)
+    for polygon in polygons:
+        if polygon.is_empty:
+            continue
+        polygon = orient(polygon, sign=1.0)
+        for ring in [polygon.exterior] + list(polygon.interiors):
+            coords = [(int(px), int(py)) for px, py in ring.coords]
+            if len(coords) < 4:
+                continue
+            ring_commands, cursor = _ring_commands(coords, cursor)
+            commands += ring_commands
+    return commands
+
+
+def encode_layer(name, features, extent=EXTENT):
+    """
+    Encode a vector tile layer
+
+    Parameters:
+    name (str): Layer name
+    features (list): (feature id, geometry commands, properties dict) tuples
+    extent (int): Tile coordinate range
+
+    Returns:
+    bytes: Serialized Layer message
+    """
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    encoded_features = []
+
+    for feature_id, commands, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value), value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags += [key_index[key], value_index[value_key]]
+
+        encoded_features.append(_bytes_field(2, (
+            _uint_field(1, feature_id)
+            + _packed_field(2, tags)
+            + _uint_field(3, 3)  # POLYGON
+            + _packed_field(4, commands)
+        )))
+
+    layer = (
+        _uint_field(15, 2)
+        + _bytes_field(1, name.encode('utf-8'))
+        + b''.join(encoded_features)
+        + b''.join(_bytes_field(3, key.encode('utf-8')) for key in keys)
+        + b''.join(_bytes_field(4, _value(value)) for value in values)
+        + _uint_field(5, extent)
+    )
+    return layer
+
+
+def encode_tile(layers):
+    """Encode a Tile message from serialized Layer messages"""
+    return b''.join(_bytes_field(3, layer) for layer in layers)
+
+
+class ParcelTiles:
+    """
+    Vector tile generator for the parcel geometries of a GeometryPyramid.
+    """
+
+    def __init__(self, pyramid, properties):
+        """
+        Parameters:
+        pyramid (GeometryPyramid): Parcel geometries with simplified zoom levels
+        properties (list): Static properties dict per parcel (e.g. id and crop)
+        """
+        self.pyramid = pyramid
+        self.properties = properties
+        self._bands = {}
+
+    def shapes(self, z):
+        """Return the geometries for a zoom and their spatial index (cached per band)"""
+        band = zoom_band(z)
+        cached = self._bands.get(band)
+        if cached is None:
+            geometries = np.array(
+                [shape(geometry) if geometry else None for geometry in self.pyramid.geojson(band)],
+                dtype=object
+            )
+            cached = (geometries, ParcelIndex(geometries))
+            self._bands[band] = cached
+        return cached
+
+    def positions(self, z, x, y):
+        """Return the positions of the parcels whose bounds intersect a tile (with buffer)"""
+        _, index = self.shapes(z)
+        west, south, east, north = tile_bounds(z, x, y)
+        margin_x = (east - west) * BUFFER / EXTENT
+        margin_y = (north - south) * BUFFER / EXTENT
+        return index.bbox_candidates(west - margin_x, south - margin_y, east + margin_x, north + margin_y)
+
+    def render(self, z, x, y, attributes=None, positions=None):
+        """
+        Render one tile
+
+        Parameters:
+        z, x, y (int): Tile address
+        attributes (dict): Attribute name -> array of per-parcel values
+        positions (ndarray): Candidate parcels, defaults to the bounds intersection test
+
+        Returns:
+        bytes: MVT tile (empty when no parcel touches the tile)
+        """
+        geometries, _ = self.shapes(z)
+        if positions is None:
+            positions = self.positions(z, x, y)
+        if len(positions) == 0:
+            return b''
+        attributes = attributes or {}
+
+        # Project to tile coordinates, clip and snap to the integer grid
+        projected = project_to_tile(geometries[positions], z, x, y)
+        clipped = shapely.clip_by_rect(projected, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+        snapped = shapely.set_precision(clipped, 1.0)
+
+        features = []
+        for position, geometry in zip(positions.tolist(), snapped):
+            if geometry is None or geometry.is_empty or geometry.geom_type not in ('Polygon', 'MultiPolygon'):
+                continue
+            commands = polygon_commands(geometry)
+            if not commands:
+                continue
+            properties = dict(self.properties[position])
+            for name, values in attributes.items():
+                value = values[position]
+                properties[name] = None if value is None or value != value else round(float(value), 4)
+            features.append((position + 1, commands, properties))
+
+        if not features:
+            return b''
+        return encode_tile([encode_layer(LAYER_NAME, features)])
@@ -0,0 +1,189 @@
+"""
+Cached, typed store for the yield predictions file.
+Parses the file once into typed NumPy columns indexed by date and parcel, and
+only parses it again when the file's modification time changes. The binary
+columnar copy of the file is used when it is up to date.
+"""
+import threading
+import numpy as np
+import pandas as pd
+from data.columnar_storage import read_table, table_mtime
+
+
+# Numeric columns of yield_predictions.csv
+NUMERIC_COLUMNS = ['predicted_yield', 'confidence', 'drought_probability', 'flood_probability', 'hail_probability']
+
+# API field names for the probability columns (hail is shown as pest for now)
+RISK_FIELDS = {
+    'drought_risk': 'drought_probability',
+    'flood_risk': 'flood_probability',
+    'pest_risk': 'hail_probability'
+}
+
+
+class YieldTable:
+    """
+    Typed columns of one version of the yield predictions file.
+    """
+
+    def __init__(self, df, version=None):
+        """
+        Parameters:
+        df (DataFrame): Contents of the yield predictions file
+        version (str): Identifier of this version of the file, carried in pagination cursors
+        """
+        self.version = version
+        self.columns = list(df.columns)
+        self._arrays = {}
+        for column in self.columns:
+            if column in NUMERIC_COLUMNS:
+                # Invalid or empty values become NaN instead of failing row by row
+                self._arrays[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+            else:
+                values = df[column].to_numpy(dtype=object)
+                self._arrays[column] = np.where(pd.isna(values), None, values)
+
+        # Indexes from date and parcel_id to row positions (in file order)
+        self._date_rows = self._build_index('date')
+        self._parcel_rows = self._build_index('parcel_id')
+
+        self.dates = sorted(self._date_rows)
+        self.crop_metrics = self._compute_crop_metrics()
+
+    def __len__(self):
+        return len(next(iter(self._arrays.values()))) if self._arrays else 0
+
+    def _build_index(self, column):
+        if column not in self._arrays:
+            return {}
+        values = self._arrays[column]
+        # Rows without a value are left out (instead of indexed under 'None')
+        present = np.flatnonzero(pd.notna(values))
+        keys = values[present].astype(str)
+        order = np.argsort(keys, kind='stable')
+        keys, starts = np.unique(keys[order], return_index=True)
+        stops = np.append(starts[1:], len(order))
+        positions = present[order]
+        return {key: positions[start:stop] for key, start, stop in zip(keys.tolist(), starts, stops)}
+
+    def rows(self, date=None, parcel_id=None):
+        """
+        Return the row positions matching an optional date and parcel
+
+        Parameters:
+        date (str): Date to filter by ('YYYY-MM-DD'), or None for all dates
+        parcel_id (str): Parcel to filter by, or None for all parcels
+
+        Returns:
+        ndarray or slice: Row positions in file order
+        """
+        empty = np.empty(0, dtype=np.intp)
+        if date and parcel_id:
+            return np.intersect1d(self._date_rows.get(date, empty), self._parcel_rows.get(parcel_id, empty))
+        if date:
+            return self._date_rows.get(date, empty)
+        if parcel_id:
+            return self._parcel_rows.get(parcel_id, empty)
+        return slice(0, len(self))
+
+    def values(self, column, rows):
+        return self._arrays[column][rows]
+
+    def records(self, rows):
+        """
+        Return rows as JSON-ready dicts in the shape served by the API
+
+        Missing numeric values are reported as 0 and a missing crop as
+        'Unknown', and the probability columns are also exposed as
+        drought_risk, flood_risk and pest_risk.
+        """
+        fields = {}
+        for column in self.columns:
+            values = self._arrays[column][rows]
+            if column in NUMERIC_COLUMNS:
+                values = np.nan_to_num(values, nan=0.0)
+                if column == 'confidence':
+                    values = values.astype(int)
+            fields[column] = values.tolist()
+
+        count = len(next(iter(fields.values()))) if fields else 0
+        for field, column in RISK_FIELDS.items():
+            fields[field] = fields[column] if column in fields else [0.0] * count
+
+        if 'crop' in fields:
+            fields['crop'] = [crop if crop else 'Unknown' for crop in fields['crop']]
+
+        names = list(fields)
+        return [dict(zip(names, row)) for row in zip(*fields.values())]
+
+    def _compute_crop_metrics(self):
+        """Average yield and risks per crop, skipping rows with invalid numbers"""
+        required_fields = ['crop', 'predicted_yield', 'drought_probability', 'flood_probability', 'hail_probability']
+        missing_fields = [field for field in required_fields if field not in self._arrays]
+        if missing_fields:
+            print(f"Missing required field in yield_predictions.csv: {missing_fields[0]}")
+            return {}
+
+        df = pd.DataFrame({field: self._arrays[field] for field in required_fields}).dropna()
+        if df.empty:
+            return {}
+
+        means = df.groupby('crop', sort=False).mean()
+        crop_metrics = {}
+        for crop, row in means.iterrows():
+            crop_metrics[crop] = {
+                'average_yield': round(row['predicted_yield'], 2),
+                'average_risks': {
+                    'drought': round(row['drought_probability'], 2),
+                    'flood': round(row['flood_probability'], 2),
+                    'pest': round(row['hail_probability'], 2)
+                }
+            }
+        return crop_metrics
+
+
+class YieldStore:
+    """
+    Yield predictions file served from memory.
+
+    The file is parsed into a YieldTable on first use and again only when its
+    modification time changes, so requests always see the latest predictions
+    without re-reading the CSV.
+    """
+
+    def __init__(self, yield_file='data/yield_predictions.csv'):
+        self.yield_file = yield_file
+        self._mtime = None
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        """Return the current YieldTable, reloading it if the file has changed"""
+        return self.refresh()
+
+    def refresh(self):
+        """Parse the file if it has not been parsed yet or has changed on disk"""
+        mtime = table_mtime(self.yield_file)
+
+        if self._table is None or mtime != self._mtime:
+            with self._lock:
+                if self._table is None or mtime != self._mtime:
+                    df = read_table(self.yield_file)
+                    self._table = YieldTable(df, version=f'{int(mtime * 1000000):x}')
+                    self._mtime = mtime
+        return self._table
+
+    def __len__(self):
+        return len(self.table)
+
+    def query(self, date=None, parcel_id=None):
+        """Return the predictions for an optional date and parcel as dicts"""
+        table = self.table
+        return table.records(table.rows(date, parcel_id))
+
+    def page(self, offset, limit):
+        """Return one page of predictions without building the others"""
+        table = self.table
+        offset = max(0, offset)
+        return table.records(slice(offset, offset + limit))
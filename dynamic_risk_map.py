@@ -14,8 +14,14 @@ from functools import partial
 from shapely.ops import transform
 # Import map_rendering module
 from data.map_rendering import create_risk_map, create_animated_risk_map
+# Import columnar storage loader (uses the binary files when present)
+from data.columnar_storage import read_table
 # Import data_generation module
 from data.data_generation_new import generate_climate_data, generate_insurance_products, calculate_area_in_hectares
+# Import batch parcel area calculation
+from data.parcel_areas import areas_in_hectares
+# Import unique parcel naming (Field_A ... Field_Z, Field_AA, ...)
+from data.portfolio_generator import parcel_name
 
 # Force folium to load all required plugins for terrain maps
 folium.Map._default_js = [
@@ -84,7 +90,7 @@ def generate_parcels(n=7):
         area = calculate_area_in_hectares(polygon, center_lat)
         
         parcel = {
-            'id': f'Field_{chr(65+i)}',
+            'id': f'Field_{parcel_name(i)}',
             'area': area,
             'soil_type': random.choice(soil_types),
             'crop': 'Soja',
@@ -107,14 +113,8 @@ if os.path.exists(parcels_file):
     parcels_gdf = gpd.read_file(parcels_file)
     print(f"Loaded existing parcels from {parcels_file}")
     
-    # Recalculate areas based on actual geometries
-    for idx, row in parcels_gdf.iterrows():
-        # Get the centroid latitude for better projection
-        centroid = row['geometry'].centroid
-        lat_center = centroid.y
-        
-        # Update area with calculated value - convert to float first to avoid dtype warning
-        parcels_gdf.at[idx, 'area'] = float(calculate_area_in_hectares(row['geometry'], lat_center))
+    # Recalculate areas based on actual geometries (one vectorized pass per UTM zone)
+    parcels_gdf['area'] = areas_in_hectares(parcels_gdf.geometry)
         
 else:
     # Only generate new parcels if file doesn't exist
@@ -129,7 +129,7 @@ os.makedirs('data', exist_ok=True)
 
 # Load or generate climate data
 if os.path.exists(climate_file):
-    climate_data = pd.read_csv(climate_file)
+    climate_data = read_table(climate_file)
     print(f"Loaded existing climate data from {climate_file}")
 else:
     climate_data = generate_climate_data(parcels_gdf)
@@ -139,7 +139,7 @@ else:
 # Load or generate yield predictions
 # CRITICAL: We want to preserve existing yield predictions to maintain crop types
 if os.path.exists(yield_file):
-    yield_predictions = pd.read_csv(yield_file)
+    yield_predictions = read_table(yield_file)
     print(f"Loaded existing yield predictions from {yield_file}")
 else:
     # IMPORTANT: We are NO LONGER generating yield predictions here
@@ -0,0 +1,18 @@
+"""
+Import of the Flask application for the endpoint tests.
+The data is loaded on the first request from the files of the repository,
+and the generated tiles and map pages are written to temporary directories.
+"""
+import os
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('AGRORISK_STARTUP', 'lazy')
+os.environ.setdefault('AGRORISK_TILE_CACHE', tempfile.mkdtemp(prefix='agrorisk-tiles-'))
+os.environ.setdefault('AGRORISK_MAP_CACHE', tempfile.mkdtemp(prefix='agrorisk-maps-'))
+
+import app as app_module
+
+for name in ('PARCELS_FILE', 'CLIMATE_FILE', 'YIELD_FILE', 'INSURANCE_FILE'):
+    setattr(app_module, name, os.path.join(ROOT, getattr(app_module, name)))
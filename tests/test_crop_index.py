@@ -0,0 +1,63 @@
+"""
+Tests for the crop filters (data/crop_index.py) and the crop filtered
+/map_data responses.
+"""
+import json
+import unittest
+import numpy as np
+
+from data.crop_index import CropIndex, normalize_crop_filter, ALL_CROPS, NO_CROPS
+from tests.app_env import app_module
+
+
+class CropIndexTestCase(unittest.TestCase):
+    """Test case for the crop positions and cache keys"""
+
+    def setUp(self):
+        self.index = CropIndex(['Soja', 'Maiz', ' soja ', None, 'Trigo'])
+
+    def test_positions(self):
+        self.assertIsNone(self.index.positions('all'))
+        np.testing.assert_array_equal(self.index.positions('SOJA'), [0, 2])
+        np.testing.assert_array_equal(self.index.positions('trigo,soja'), [0, 2, 4])
+
+    def test_unknown_crop(self):
+        """Test that a crop that is not in the data matches no parcels"""
+        self.assertEqual(self.index.filter_key('girasol'), NO_CROPS)
+        self.assertEqual(len(self.index.positions('girasol')), 0)
+        self.assertFalse(self.index.mask('girasol').any())
+
+        # Unknown crops are dropped from a combined filter
+        self.assertEqual(self.index.filter_key('girasol,Maiz'), 'maiz')
+        np.testing.assert_array_equal(self.index.positions('girasol,Maiz'), [1])
+
+    def test_unknown_crops_share_a_cache_key(self):
+        """Test that arbitrary filter values cannot create new cache keys"""
+        keys = {self.index.filter_key(crop) for crop in ('girasol', 'xyz', 'foo,bar', 'GIRASOL ')}
+        self.assertEqual(keys, {NO_CROPS})
+        self.assertEqual(normalize_crop_filter('all,soja'), ALL_CROPS)
+
+
+class UnknownCropEndpointTestCase(unittest.TestCase):
+    """Test case for /map_data with crop filters that match no parcels"""
+
+    def setUp(self):
+        """Set up a test client and load the data"""
+        self.client = app_module.app.test_client()
+        self.client.get('/map_data?date=2025-01-20')
+        app_module.map_data_cache.clear()
+
+    def test_no_features(self):
+        response = self.client.get('/map_data?date=2025-01-20&crop_type=girasol')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['features'], [])
+
+    def test_unknown_crops_cached_once(self):
+        """Test that different unknown crops reuse one cached response"""
+        for crop in ('girasol', 'xyz', 'abc', 'Girasol'):
+            self.client.get(f'/map_data?date=2025-01-20&crop_type={crop}')
+        self.assertEqual(len(app_module.map_data_cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,312 @@
+"""
+Tests for the vectorized synthetic data generators (data/data_generation2.py):
+the generated data is compared with the per-row computation it replaced and
+with the data generated by other interpreter runs.
+"""
+import csv
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from data.data_generation2 import (
+    generate_climate_data, get_risk_category, parcel_streams, stable_seed, update_yield_predictions,
+    correlate_risks, calculate_correlated_risks, update_risk_correlations
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARCELS_FILE = os.path.join(ROOT, 'data', 'parcels.geojson')
+
+
+def run_in_interpreter(code, hash_seed):
+    """Run Python code in a new interpreter with a PYTHONHASHSEED and return its output"""
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def climate_rows(parcels_gdf, days, seed):
+    """
+    Compute the climate rows one parcel and day at a time, as the loop replaced by
+    generate_climate_data did, with the random values of the parcel streams
+    """
+    rows = []
+    for stream, (_, parcel) in zip(parcel_streams(parcels_gdf['id'], seed), parcels_gdf.iterrows()):
+        rng = np.random.default_rng(stream)
+        base_risk = parcel.get('base_risk', np.nan)
+        fallback_base_risk = rng.uniform(0.1, 0.5)
+        if not base_risk == base_risk:
+            base_risk = fallback_base_risk
+        for day in range(days):
+            drought_noise, flood_noise, pest_noise, swap_noise = rng.random(4)
+            day_phase = (day % 7) / 7.0
+            season_phase = (day % 30) / 30.0
+            drought_risk = 0.2 + day * 0.01 + 0.1 * np.sin(day_phase * 2 * np.pi)
+            flood_risk = 0.3 - day * 0.005 + 0.15 * np.sin(season_phase * 2 * np.pi)
+            pest_risk = 0.1 + day * 0.003 + 0.05 * np.sin((day_phase + 0.5) * 2 * np.pi)
+            drought_risk = max(0.01, min(0.95, drought_risk + (drought_noise * 0.2 - 0.1)))
+            flood_risk = max(0.01, min(0.95, flood_risk + (flood_noise * 0.2 - 0.1)))
+            pest_risk = max(0.01, min(0.95, pest_risk + (pest_noise * 0.1 - 0.05)))
+            if drought_risk > 0.5:
+                flood_risk = 0.01 + swap_noise * 0.04
+            elif flood_risk > 0.5:
+                drought_risk = 0.01 + swap_noise * 0.04
+            drought_risk = 0.7 * drought_risk + 0.3 * base_risk
+            flood_risk = 0.7 * flood_risk + 0.3 * base_risk
+            pest_risk = 0.7 * pest_risk + 0.3 * base_risk
+            general_risk = (drought_risk + flood_risk + pest_risk) / 3
+
+            alert, alert_type = None, None
+            if drought_risk > 0.5:
+                alert, alert_type = f'High drought risk: {round(drought_risk * 100)}%', 'drought'
+            elif flood_risk > 0.5:
+                alert, alert_type = f'Flood warning: {round(flood_risk * 100)}%', 'flood'
+            elif pest_risk > 0.5:
+                alert, alert_type = f'Pest outbreak: {round(pest_risk * 100)}%', 'pest'
+            rows.append({
+                'parcel_id': parcel['id'],
+                'drought_probability': round(drought_risk * 100),
+                'flood_probability': round(flood_risk * 100),
+                'hail_probability': round(pest_risk * 100),
+                'general_risk': round(general_risk * 100),
+                'alert': alert,
+                'alert_type': alert_type,
+                'risk_level': general_risk,
+                'drought_risk_level': drought_risk,
+                'flood_risk_level': flood_risk,
+                'pest_risk_level': pest_risk,
+                'premium_ha': round(general_risk * 300, 2),
+                'risk_category': get_risk_category(general_risk),
+            })
+    return rows
+
+
+# Yield ranges (Soja, Maiz) and drought baseline of the locations of the test parcels
+YIELD_RANGES = {'Paysandu': ((2.0, 2.5), (6.0, 7.0)), 'Dolores': ((2.8, 3.5), (7.0, 8.0))}
+DEFAULT_YIELD_RANGES = ((2.5, 3.5), (6.5, 7.5))
+DROUGHT_BASES = {'Paysandu': 45, 'Dolores': 40}
+
+
+def yield_rows(parcels_gdf, days):
+    """
+    Compute the yield prediction rows one parcel and day at a time, as the loop
+    replaced by update_yield_predictions did, with the random values of the
+    stable parcel streams
+    """
+    rows = []
+    for parcel_id, crop in zip(parcels_gdf['id'], parcels_gdf['crop']):
+        location = parcel_id.split('_')[1]
+        soja_range, maiz_range = YIELD_RANGES.get(location, DEFAULT_YIELD_RANGES)
+        min_yield, max_yield = {'Soja': soja_range, 'Maiz': maiz_range}.get(crop, (2.5, 3.5))
+        uniforms = np.random.default_rng(stable_seed(parcel_id)).random(1 + 2 * days)
+        parcel_drought_base = DROUGHT_BASES.get(location, 50) * (0.9 + 0.2 * uniforms[0])
+        for day in range(days):
+            predicted_yield = round(max(min_yield, max_yield - (max_yield - min_yield) * (day / 30) * 0.5), 2)
+            daily_variation = 0.95 + 0.1 * uniforms[1 + day]
+            day_factor = 1 + (day / 30) * 0.5
+            drought_risk = min(95, int(parcel_drought_base * day_factor * daily_variation))
+            drought_normalized = drought_risk / 100.0
+            if drought_normalized > 0.9:
+                flood_risk = max(1, int(5 * (1 - drought_normalized) ** 2))
+            elif drought_normalized > 0.7:
+                flood_risk = max(1, int(10 * (1 - drought_normalized) ** 1.5))
+            else:
+                flood_risk = max(1, int(50 * (1 - drought_normalized)))
+            hail_risk = 5 + int(11 * uniforms[1 + days + day])
+            rows.append([parcel_id, (datetime(2025, 1, 15) + timedelta(days=day)).strftime('%Y-%m-%d'),
+                         str(predicted_yield), str(max(40, 85 - day)),
+                         str(drought_risk), str(flood_risk), str(hail_risk), crop])
+    return rows
+
+
+def correlated_risks(drought_prob, flood_prob, hail_prob):
+    """Correlate one set of probabilities, as the scalar transform replaced by correlate_risks did"""
+    flood = flood_prob * (1 - 0.8) + (100 - drought_prob) * 0.8
+    drought = drought_prob * (1 - 0.8) + (100 - flood_prob) * 0.8
+    hail = hail_prob * (1 - 0.4) + flood_prob * 0.4 * 0.2
+    return round(drought), round(flood), round(hail)
+
+
+class ClimateDataTestCase(unittest.TestCase):
+    """Test case for generate_climate_data"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Parcels with and without a base risk
+        cls.parcels = gpd.read_file(PARCELS_FILE)
+        cls.parcels.loc[cls.parcels.index[::2], 'base_risk'] = np.nan
+
+    def test_matches_per_row_computation(self):
+        """Test that the vectorized columns match the per-row computation"""
+        df = generate_climate_data(self.parcels, days=40, seed=7)
+        expected = climate_rows(self.parcels, days=40, seed=7)
+        self.assertEqual(len(df), len(expected))
+        for column in ('parcel_id', 'drought_probability', 'flood_probability', 'hail_probability',
+                       'general_risk', 'risk_category'):
+            self.assertEqual(df[column].tolist(), [row[column] for row in expected], column)
+        for column in ('alert', 'alert_type'):
+            self.assertEqual([None if value != value else value for value in df[column].tolist()],
+                             [row[column] for row in expected], column)
+        for column in ('risk_level', 'drought_risk_level', 'flood_risk_level', 'pest_risk_level'):
+            np.testing.assert_allclose(df[column], [row[column] for row in expected], rtol=1e-12, err_msg=column)
+        np.testing.assert_allclose(df['premium_ha'], [row['premium_ha'] for row in expected], atol=0.005 + 1e-9)
+        self.assertEqual(df['date'].iloc[:2].tolist(), ['2025-01-15', '2025-01-16'])
+
+    def test_date_ranges(self):
+        """Test that a later date range generated on its own matches the full series"""
+        full = generate_climate_data(self.parcels, days=12, seed=3)
+        later = generate_climate_data(self.parcels, days=4, seed=3, start_day=8)
+        full = full[full['date'] >= '2025-01-23']
+        self.assertEqual(full.to_csv(index=False), later.to_csv(index=False))
+
+    def test_parcel_order(self):
+        """Test that the data of a parcel does not depend on the other parcels"""
+        df = generate_climate_data(self.parcels, days=5, seed=11)
+        reversed_df = generate_climate_data(self.parcels.iloc[::-1], days=5, seed=11)
+        first = self.parcels['id'].iloc[0]
+        self.assertEqual(df[df['parcel_id'] == first].to_csv(index=False),
+                         reversed_df[reversed_df['parcel_id'] == first].to_csv(index=False))
+
+    def test_same_data_in_every_interpreter(self):
+        """Test that a seed gives the same data under any hash randomization"""
+        code = ('import hashlib, geopandas as gpd\n'
+                'from data.data_generation2 import generate_climate_data\n'
+                f'df = generate_climate_data(gpd.read_file({PARCELS_FILE!r}), days=10, seed=5)\n'
+                'print(hashlib.sha256(df.to_csv(index=False).encode()).hexdigest())')
+        digests = {run_in_interpreter(code, hash_seed) for hash_seed in (0, 1, 12345)}
+        df = generate_climate_data(gpd.read_file(PARCELS_FILE), days=10, seed=5)
+        self.assertEqual(digests, {hashlib.sha256(df.to_csv(index=False).encode()).hexdigest()})
+
+
+
+class YieldPredictionsTestCase(unittest.TestCase):
+    """Test case for update_yield_predictions"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.parcels_file = os.path.join(self.directory, 'parcels.geojson')
+        self.parcels = gpd.GeoDataFrame({
+            'id': ['Chacra_Paysandu_A_1', 'Chacra_Paysandu_B_2', 'Campo_Dolores_C_3', 'Campo_Rivera_D_4',
+                   'Campo_Dolores_E_5'],
+            'crop': ['Soja', 'Maiz', 'Maiz', 'Soja', 'Trigo'],
+        }, geometry=[box(-58 + i * 0.01, -33, -57.995 + i * 0.01, -32.995) for i in range(5)], crs='EPSG:4326')
+        self.parcels.to_file(self.parcels_file, driver='GeoJSON')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_rows(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))
+
+    def test_matches_per_row_computation(self):
+        """Test that the vectorized file matches the per-row computation"""
+        output_file = os.path.join(self.directory, 'yield_predictions.csv')
+        update_yield_predictions(self.parcels_file, output_file, days=30)
+        rows = self.read_rows(output_file)
+        self.assertEqual(rows[0], ['parcel_id', 'date', 'predicted_yield', 'confidence',
+                                   'drought_probability', 'flood_probability', 'hail_probability', 'crop'])
+        self.assertEqual(rows[1:], yield_rows(self.parcels, days=30))
+
+    def test_same_file_in_every_interpreter(self):
+        """Test that the file is identical under any hash randomization"""
+        outputs = []
+        for hash_seed in (0, 1, 12345):
+            output_file = os.path.join(self.directory, f'yield_{hash_seed}.csv')
+            run_in_interpreter('from data.data_generation2 import update_yield_predictions\n'
+                               f'update_yield_predictions({self.parcels_file!r}, {output_file!r}, days=10)', hash_seed)
+            with open(output_file, 'rb') as f:
+                outputs.append(f.read())
+        output_file = os.path.join(self.directory, 'yield.csv')
+        update_yield_predictions(self.parcels_file, output_file, days=10)
+        with open(output_file, 'rb') as f:
+            outputs.append(f.read())
+        self.assertEqual(len(set(outputs)), 1)
+
+
+
+class RiskCorrelationTestCase(unittest.TestCase):
+    """Test case for correlate_risks and update_risk_correlations"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'yield_predictions.csv')
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({
+            'parcel_id': [f'Field_{i}' for i in range(25)],
+            'date': '2025-01-15',
+            'predicted_yield': np.round(rng.uniform(2, 9, 25), 2),
+            'drought_probability': rng.integers(0, 101, 25),
+            'flood_probability': rng.integers(0, 101, 25),
+            'hail_probability': rng.integers(0, 101, 25),
+            'crop': 'Soja',
+        })
+        self.df.to_csv(self.path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_matches_scalar_transform(self):
+        """Test every combination of whole percentages against the scalar transform"""
+        drought, flood, hail = np.meshgrid(np.arange(101), np.arange(101), np.arange(0, 101, 5), indexing='ij')
+        results = correlate_risks(drought, flood, hail)
+        expected = np.array([correlated_risks(*values) for values in
+                             zip(drought.ravel().tolist(), flood.ravel().tolist(), hail.ravel().tolist())])
+        for result, column in zip(results, expected.T):
+            np.testing.assert_array_equal(result.ravel(), column)
+        self.assertEqual(calculate_correlated_risks(70, 20, 10), correlated_risks(70, 20, 10))
+
+    def test_in_place(self):
+        """Test that the results can be written over the input arrays"""
+        columns = [self.df[column].to_numpy().copy()
+                   for column in ('drought_probability', 'flood_probability', 'hail_probability')]
+        expected = correlate_risks(*columns)
+        correlate_risks(*columns, out=columns)
+        for result, column in zip(expected, columns):
+            np.testing.assert_array_equal(result, column)
+
+    def test_update_file_in_chunks(self):
+        """Test that the file updated in chunks matches the per-row update"""
+        update_risk_correlations(self.path, chunk_rows=7)
+        expected = self.df.copy()
+        for i, row in self.df.iterrows():
+            (expected.at[i, 'drought_probability'], expected.at[i, 'flood_probability'],
+             expected.at[i, 'hail_probability']) = correlated_risks(
+                float(row['drought_probability']), float(row['flood_probability']), float(row['hail_probability']))
+        pd.testing.assert_frame_equal(pd.read_csv(self.path), expected)
+
+    def test_same_file_in_every_interpreter(self):
+        """Test that the updated file is identical under any hash randomization"""
+        outputs = set()
+        for hash_seed in (0, 1):
+            path = os.path.join(self.directory, f'yield_{hash_seed}.csv')
+            shutil.copy(self.path, path)
+            run_in_interpreter('from data.data_generation2 import update_risk_correlations\n'
+                               f'update_risk_correlations({path!r}, chunk_rows=4)', hash_seed)
+            with open(path, 'rb') as f:
+                outputs.add(f.read())
+        update_risk_correlations(self.path)
+        with open(self.path, 'rb') as f:
+            outputs.add(f.read())
+        self.assertEqual(len(outputs), 1)
+
+    def test_missing_probability(self):
+        """Test that correlated probabilities depending on a missing one are left empty"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('Field_X,2025-01-15,3.1,,40,10,Maiz\n')
+        update_risk_correlations(self.path)
+        with open(self.path, newline='', encoding='utf-8') as f:
+            last = list(csv.reader(f))[-1]
+        self.assertEqual(last, ['Field_X', '2025-01-15', '3.1', '', '', '9', 'Maiz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
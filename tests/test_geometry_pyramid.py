@@ -0,0 +1,109 @@
+"""
+Tests for the shared-border geometry pyramid of the main application
+(data/geometry_pyramid.py).
+"""
+import unittest
+import numpy as np
+from shapely.geometry import Polygon, MultiPolygon, shape
+
+from data.geometry_pyramid import GeometryPyramid, zoom_band, ZOOM_LEVELS
+from tests.app_env import app_module
+
+
+def neighbouring_parcels():
+    """Two parcels of about 1 km sharing a border with small (about 1 m) zigzags"""
+    rng = np.random.default_rng(0)
+    lats = np.linspace(-33.0, -32.99, 60)
+    lons = -57.99 + rng.uniform(-0.00001, 0.00001, len(lats))
+    border = list(zip(lons, lats))
+    west = Polygon([(-58.0, -33.0)] + border + [(-58.0, -32.99)])
+    east = Polygon(border + [(-57.98, -32.99), (-57.98, -33.0)])
+    return [west, east]
+
+
+class ZoomBandTestCase(unittest.TestCase):
+    """Test case for the zoom to level mapping"""
+
+    def test_zoom_band(self):
+        self.assertEqual([zoom_band(zoom) for zoom in (0, 8, 9, 11, 12, 14)], [8, 8, 11, 11, 14, 14])
+        self.assertIsNone(zoom_band(15))
+        self.assertIsNone(zoom_band(None))
+
+
+class GeometryPyramidTestCase(unittest.TestCase):
+    """Test case for the topology and the simplified levels"""
+
+    def setUp(self):
+        self.geometries = neighbouring_parcels()
+        self.pyramid = GeometryPyramid(self.geometries)
+
+    def test_full_resolution(self):
+        """Test that zooms past the last level serve the original geometries"""
+        for zoom in (None, 15):
+            for geometry, original in zip(self.pyramid.geojson(zoom), self.geometries):
+                self.assertTrue(shape(geometry).equals(original))
+
+    def test_shared_border_is_one_arc(self):
+        """Test that both parcels reference the same arc for their common border"""
+        west_arcs, east_arcs = (
+            {arc if arc >= 0 else ~arc for arc in shapes[0][0]} for shapes in self.pyramid.topology['shapes']
+        )
+        self.assertEqual(len(west_arcs & east_arcs), 1)
+
+    def test_levels_are_simplified_without_gaps(self):
+        """Test that simplified neighbours still tile the same area without overlaps"""
+        full_vertices = self.pyramid.vertex_count()
+        union_area = self.geometries[0].area + self.geometries[1].area
+        for level in ZOOM_LEVELS:
+            self.assertLess(self.pyramid.vertex_count(level), full_vertices)
+            west, east = (shape(geometry) for geometry in self.pyramid.geojson(level))
+            self.assertTrue(west.is_valid and east.is_valid)
+            self.assertAlmostEqual(west.intersection(east).area, 0.0, places=12)
+            self.assertAlmostEqual(west.union(east).area, union_area, places=7)
+
+    def test_topojson(self):
+        """Test that the delta-encoded arcs decode to the topology arcs"""
+        properties = [{'id': 'Field_A'}, {'id': 'Field_B'}]
+        topology = self.pyramid.topojson(properties=properties, positions=[1])
+
+        geometries = topology['objects']['parcels']['geometries']
+        self.assertEqual(len(geometries), 1)
+        self.assertEqual(geometries[0]['type'], 'Polygon')
+        self.assertEqual(geometries[0]['properties'], {'id': 'Field_B'})
+
+        decoded = [np.cumsum(arc, axis=0) for arc in topology['arcs']]
+        for arc, expected in zip(decoded, self.pyramid.topology['arcs']):
+            np.testing.assert_array_equal(arc, expected)
+
+    def test_build(self):
+        """Test that build() computes the topology and every level up front"""
+        pyramid = GeometryPyramid(self.geometries)
+        self.assertIs(pyramid.build(), pyramid)
+        self.assertIsNotNone(pyramid._topology)
+        self.assertEqual(sorted(pyramid._levels), list(ZOOM_LEVELS))
+        self.assertEqual(pyramid.geojson(9), self.pyramid.geojson(9))
+
+    def test_multipolygon_and_missing_geometries(self):
+        multipolygon = MultiPolygon(neighbouring_parcels())
+        pyramid = GeometryPyramid([multipolygon, None])
+        multi, missing = pyramid.geojson(11)
+        self.assertEqual(multi['type'], 'MultiPolygon')
+        self.assertEqual(len(multi['coordinates']), 2)
+        self.assertIsNone(missing)
+        self.assertEqual(pyramid.topojson(11)['objects']['parcels']['geometries'][1], {'type': None})
+
+
+
+class LoadedPyramidTestCase(unittest.TestCase):
+    """Test case for the pyramid of the application's parcels"""
+
+    def test_built_while_loading(self):
+        """Test that the parcels are simplified in a timed phase of the data load"""
+        app_module.app.test_client().get('/api/parcels')
+        pyramid = app_module.parcel_features.pyramid
+        self.assertEqual(sorted(pyramid._levels), list(ZOOM_LEVELS))
+        self.assertIn('simplify parcel geometries', app_module.data_loader.timings)
+
+
+if __name__ == '__main__':
+    unittest.main()
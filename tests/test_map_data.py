@@ -0,0 +1,53 @@
+"""
+Tests for the /map_data responses and the cache of the time slider frames.
+"""
+import json
+import unittest
+from unittest import mock
+
+from data import compression
+from tests.app_env import app_module
+
+
+class MapDataCacheTestCase(unittest.TestCase):
+    """Test case for the responses kept in map_data_cache"""
+
+    def setUp(self):
+        """Set up a test client and load the data"""
+        self.client = app_module.app.test_client()
+        self.client.get('/map_data?date=2025-01-20')
+        app_module.map_data_cache.clear()
+
+    def test_slider_frames_cached(self):
+        self.client.get('/map_data?date=2025-01-20&risk_type=flood')
+        self.assertEqual(len(app_module.map_data_cache), 1)
+
+    def test_viewport_responses_not_cached(self):
+        """Test that panning the map does not fill the cache or evict the slider frames"""
+        self.client.get('/map_data?date=2025-01-20')
+        for i in range(20):
+            response = self.client.get(f'/map_data?date=2025-01-20&bbox={-58.3 + i * 0.01},-33,-57.5,-32.5')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(app_module.map_data_cache), 1)
+
+        # The viewport response only holds the parcels in view, the cached frame all of them
+        in_view = json.loads(self.client.get('/map_data?date=2025-01-20&bbox=-58.1,-32.75,-58.0,-32.7').data)
+        everything = json.loads(self.client.get('/map_data?date=2025-01-20').data)
+        self.assertLess(len(in_view['features']), len(everything['features']))
+        self.assertEqual(len(everything['features']), len(app_module.parcels_gdf))
+
+    def test_compression_levels(self):
+        """Test that viewport bodies use the fast levels and cached frames the stored ones"""
+        headers = {'Accept-Encoding': 'gzip'}
+        with mock.patch.object(compression, 'compress', wraps=compression.compress) as compress:
+            response = self.client.get('/map_data?date=2025-01-20&bbox=-58.3,-33,-57.5,-32.5', headers=headers)
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(compress.call_args.kwargs, {'stored': False})
+
+            compress.reset_mock()
+            self.client.get('/map_data?date=2025-01-20', headers=headers)
+            self.assertEqual(compress.call_args.kwargs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Tests for the /map page rendered from the cached map shells
+(data/map_rendering.py).
+"""
+import json
+import re
+import unittest
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import box
+
+from data.crop_index import CropIndex
+from data.map_rendering import render_risk_map, clear_map_shells
+
+
+class RenderRiskMapTestCase(unittest.TestCase):
+    """Test case for the per-date style table of the map pages"""
+
+    def setUp(self):
+        self.parcels = gpd.GeoDataFrame({
+            'id': ['Field_A', 'Field_</script><script>alert(1)//'],
+            'area': [50, 60],
+            'soil_type': ['Arcilloso', 'Arenoso'],
+            'crop': ['Soja', 'Maiz'],
+        }, geometry=[box(-58.1, -32.8, -58.09, -32.79), box(-58.08, -32.8, -58.07, -32.79)], crs='EPSG:4326')
+        self.climate = pd.DataFrame({
+            'parcel_id': self.parcels['id'].tolist(),
+            'date': ['2025-01-20', '2025-01-20'],
+            'drought_probability': [10, 90],
+            'flood_probability': [10, 90],
+            'hail_probability': [10, 90],
+            'risk_level': [0.1, 0.9],
+        })
+        self.crop_index = CropIndex(self.parcels['crop'])
+
+    def tearDown(self):
+        clear_map_shells()
+
+    def style_table(self, html):
+        """Return the style table text written into the page"""
+        return re.search(r'var parcelStyles = (.*);\n', html).group(1)
+
+    def test_style_table_cannot_close_the_script(self):
+        """Test that '</' in the style table is escaped"""
+        html = render_risk_map('2025-01-20', self.climate, self.parcels, crop_index=self.crop_index)
+        table = self.style_table(html)
+        self.assertNotIn('</', table)
+        self.assertEqual(sorted(json.loads(table)), sorted(self.parcels['id']))
+
+    def test_crop_filter(self):
+        """Test that the style table only holds the parcels of the crop filter"""
+        html = render_risk_map('2025-01-20', self.climate, self.parcels, crop_type='soja', crop_index=self.crop_index)
+        self.assertEqual(list(json.loads(self.style_table(html))), ['Field_A'])
+
+    def test_without_crop_index(self):
+        """Test that a crop index is built for the call when none is given"""
+        html = render_risk_map('2025-01-20', self.climate, self.parcels, crop_type='maiz')
+        self.assertEqual(len(json.loads(self.style_table(html))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+"""
+Tests for the parcel endpoints and the parcel structures they share with the
+map endpoints.
+"""
+import json
+import unittest
+
+from tests.app_env import app_module
+
+
+class ParcelsTestCase(unittest.TestCase):
+    """Test case for /api/parcels and the shared parcel structures"""
+
+    def setUp(self):
+        """Set up a test client and load the data"""
+        self.client = app_module.app.test_client()
+        self.response = self.client.get('/api/parcels')
+
+    def test_structures_are_shared(self):
+        """Test that the parcel endpoints use the pyramid and indexes of the map endpoints"""
+        service = app_module.parcels_service
+        self.assertIs(service.fragments.pyramid, app_module.parcel_features.pyramid)
+        self.assertIs(service.index, app_module.parcel_index)
+        self.assertIs(service.crop_index, app_module.crop_index)
+
+    def test_parcels_match_the_file(self):
+        """Test that /api/parcels serves the features of the GeoJSON file"""
+        with open(app_module.PARCELS_FILE, encoding='utf-8') as f:
+            expected = json.load(f)
+        served = json.loads(self.response.data)
+        self.assertEqual(served['name'], expected['name'])
+        self.assertEqual([feature['properties'] for feature in served['features']],
+                         [feature['properties'] for feature in expected['features']])
+        self.assertEqual([feature['geometry']['coordinates'] for feature in served['features']],
+                         [feature['geometry']['coordinates'] for feature in expected['features']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+"""
+Tests for the synthetic portfolio generator (data/portfolio_generator.py).
+"""
+import unittest
+import numpy as np
+import shapely
+
+from data.portfolio_generator import GridLayout, generate_chunk, parcel_name
+
+
+class PortfolioGeneratorTestCase(unittest.TestCase):
+    """Test case for the generated parcels"""
+
+    def setUp(self):
+        layout = GridLayout(5000)
+        self.chunk = generate_chunk(np.random.SeedSequence(1), 0, 5000, layout)
+
+    def test_parcel_names(self):
+        self.assertEqual([parcel_name(i) for i in (0, 25, 26, 701, 702)], ['A', 'Z', 'AA', 'ZZ', 'AAA'])
+        self.assertEqual(len(set(self.chunk['id'])), 5000)
+
+    def test_parcel_areas(self):
+        """Test the parcel areas documented next to CELL_SIZE"""
+        areas = np.asarray(self.chunk['area'])
+        self.assertTrue(45 <= areas.mean() <= 55)
+        low, high = np.percentile(areas, [5, 95])
+        self.assertGreaterEqual(low, 30)
+        self.assertLessEqual(high, 75)
+
+    def test_parcels_do_not_overlap(self):
+        geometries = self.chunk['geometry']
+        tree = shapely.STRtree(geometries)
+        pairs = tree.query(geometries, predicate='overlaps')
+        self.assertEqual(pairs.shape[1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
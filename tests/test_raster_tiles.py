@@ -0,0 +1,103 @@
+"""
+Tests for the PNG raster risk tiles (data/raster_tiles.py), decoding the
+rendered tiles and checking the colour of the parcel pixels.
+"""
+import struct
+import unittest
+import zlib
+import numpy as np
+from shapely.geometry import Polygon, box
+
+from data.geometry_pyramid import GeometryPyramid
+from data.vector_tiles import ParcelTiles, project_to_tile
+from data.raster_tiles import (
+    RasterTiles, polygon_mask, tile_range, EMPTY_TILE, FILL_ALPHA, BORDER_RGBA, TILE_SIZE
+)
+
+
+def decode_png(data):
+    """Decode a PNG written by encode_png (8-bit RGBA, no scanline filters)"""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    idat = b''
+    offset = 8
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset + 4])
+        if data[offset + 4:offset + 8] == b'IDAT':
+            idat += data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+    raw = np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(TILE_SIZE, TILE_SIZE * 4 + 1)
+    assert not raw[:, 0].any()
+    return raw[:, 1:].reshape(TILE_SIZE, TILE_SIZE, 4)
+
+
+def pixel_of(geometry, z, x, y):
+    """Return the (row, column) of the tile pixel holding a point inside the geometry"""
+    point = project_to_tile(np.array([geometry.representative_point()]), z, x, y, extent=TILE_SIZE)[0]
+    return int(point.y), int(point.x)
+
+
+class RasterTilesTestCase(unittest.TestCase):
+    """Test case for the raster tiles of small and large parcels"""
+
+    def setUp(self):
+        # Parcels of about 700 m, as in the San Javier portfolio, plus one of 20 m
+        self.geometries = [
+            box(-58.10, -32.72, -58.092, -32.713),
+            box(-58.08, -32.72, -58.072, -32.713),
+            box(-58.06, -32.70, -58.052, -32.693),
+            box(-58.05, -32.69, -58.0498, -32.6898),
+        ]
+        self.colors = np.array([[200, 0, 0], [0, 200, 0], [0, 0, 200], [200, 200, 0]], dtype=np.uint8)
+        pyramid = GeometryPyramid(self.geometries).build()
+        self.tiles = RasterTiles(ParcelTiles(pyramid, [{'id': str(i)} for i in range(len(self.geometries))]))
+        bounds = (-58.10, -32.72, -58.0498, -32.6898)
+        columns, rows = tile_range(bounds, 8)
+        self.address = {8: (columns[0], rows[0])}
+
+    def test_low_zoom_fill_colours(self):
+        """Test that at zoom 8 every parcel shows its own fill colour, not a border"""
+        x, y = self.address[8]
+        image = decode_png(self.tiles.render(8, x, y, self.colors))
+        for geometry, color in zip(self.geometries, self.colors):
+            row, column = pixel_of(geometry, 8, x, y)
+            np.testing.assert_array_equal(image[row, column], list(color) + [FILL_ALPHA])
+        self.assertFalse((image == BORDER_RGBA).all(axis=2).any())
+
+    def test_sub_pixel_parcel(self):
+        """Test that a parcel smaller than a pixel colours the pixel it falls in"""
+        x, y = self.address[8]
+        image = decode_png(self.tiles.render(8, x, y, self.colors))
+        row, column = pixel_of(self.geometries[3], 8, x, y)
+        np.testing.assert_array_equal(image[row, column], [200, 200, 0, FILL_ALPHA])
+
+    def test_high_zoom_border(self):
+        """Test that parcels many pixels wide get a border around their fill"""
+        z = 16
+        columns, rows = tile_range(self.geometries[0].representative_point().bounds, z)
+        x, y = columns[0], rows[0]
+        image = decode_png(self.tiles.render(z, x, y, self.colors))
+        row, column = pixel_of(self.geometries[0], z, x, y)
+        self.assertEqual(image[row, column, 3], FILL_ALPHA)
+        self.assertTrue((image == BORDER_RGBA).all(axis=2).any())
+
+    def test_empty_tile(self):
+        self.assertEqual(self.tiles.render(8, 0, 0, self.colors), EMPTY_TILE)
+
+    def test_polygon_mask(self):
+        """Test the pixel centres inside a polygon, with a hole"""
+        polygon = Polygon([(2, 2), (12, 2), (12, 10), (2, 10)], [[(5, 5), (9, 5), (9, 8), (5, 8)]])
+        mask = polygon_mask(polygon, size=16)
+        expected = np.zeros((16, 16), dtype=bool)
+        expected[2:10, 2:12] = True
+        expected[5:8, 5:9] = False
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_polygon_mask_clipped_to_tile(self):
+        mask = polygon_mask(box(-5, -5, 3, 20), size=16)
+        expected = np.zeros((16, 16), dtype=bool)
+        expected[:, :3] = True
+        np.testing.assert_array_equal(mask, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for POST /api/reload: who may reload the data and which cached
+responses are dropped when it is reloaded.
+"""
+import unittest
+from unittest import mock
+
+from tests.app_env import app_module
+
+
+class ReloadTestCase(unittest.TestCase):
+    """Test case for the reload endpoint"""
+
+    def setUp(self):
+        """Set up a test client and load the data"""
+        self.client = app_module.app.test_client()
+        self.assertEqual(self.client.get('/map_data?date=2025-01-20').status_code, 200)
+
+    def reload(self, remote_addr='127.0.0.1', headers=None):
+        return self.client.post('/api/reload', environ_base={'REMOTE_ADDR': remote_addr}, headers=headers)
+
+    def test_local_request_allowed(self):
+        response = self.reload()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'reloaded')
+
+    def test_remote_request_rejected(self):
+        """Test that a remote request without a token cannot reload the data"""
+        with mock.patch.object(app_module, 'reload_data') as reload_data:
+            response = self.reload(remote_addr='203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+        reload_data.assert_not_called()
+
+    def test_token(self):
+        """Test that with a token configured only requests carrying it may reload, local or not"""
+        with mock.patch.object(app_module, 'RELOAD_TOKEN', 's3cret'):
+            self.assertEqual(self.reload(remote_addr='203.0.113.7',
+                                         headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+            self.assertEqual(self.reload(headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            self.assertEqual(self.reload().status_code, 403)
+
+    def test_reload_drops_cached_responses(self):
+        """Test that the cached responses and map shells built from the old data are dropped"""
+        from data import map_rendering
+
+        self.client.get('/map_data/batch?risk_type=flood')
+        self.client.get('/api/parcels')
+        self.client.get('/map?date=2025-01-20&zoom=9')
+        self.assertGreater(len(app_module.map_data_cache), 0)
+        self.assertGreater(len(app_module.payload_cache), 0)
+        self.assertGreater(len(map_rendering._map_shells), 0)
+        old_store = app_module.risk_store
+
+        self.assertEqual(self.reload().status_code, 200)
+        self.assertEqual(len(app_module.map_data_cache), 0)
+        self.assertEqual(len(app_module.payload_cache), 0)
+        self.assertEqual(len(app_module.vector_tile_cache), 0)
+        self.assertEqual(len(map_rendering._map_shells), 0)
+        self.assertIsNot(app_module.risk_store, old_store)
+
+        # Responses are built again from the reloaded data
+        response = self.client.get('/map_data?date=2025-01-20')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['features']), len(app_module.parcels_gdf))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+Tests for the indexed climate risk store of the main application
+(data/risk_store.py), in particular the incremental RiskStore.append(), and
+for the daily climate update appended to the file and to the loaded data.
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from data.data_generation2 import generate_climate_data, update_climate_data
+from data.risk_store import RiskStore
+from tests.app_env import app_module, ROOT
+
+
+def climate_rows(parcel_ids, dates, seed=0):
+    """Build climate rows (one per parcel and date, parcels first) with some alerts"""
+    rng = np.random.default_rng(seed)
+    parcels = np.repeat(parcel_ids, len(dates))
+    days = np.tile(dates, len(parcel_ids))
+    drought = rng.integers(0, 100, len(parcels))
+    return pd.DataFrame({
+        'parcel_id': parcels,
+        'date': days,
+        'drought_probability': drought,
+        'flood_probability': rng.integers(0, 100, len(parcels)),
+        'hail_probability': rng.integers(0, 100, len(parcels)),
+        'general_risk': rng.integers(0, 100, len(parcels)),
+        'alert': np.where(drought > 70, 'High drought risk', None),
+        'risk_level': rng.random(len(parcels)),
+    })
+
+
+class RiskStoreAppendTestCase(unittest.TestCase):
+    """Test case checking that appending rows gives the same store as a full rebuild"""
+
+    dates = ['2025-01-15', '2025-01-16', '2025-01-17', '2025-01-18']
+    parcels = ['Field_A', 'Field_B', 'Field_C']
+
+    def assertSameStore(self, store, expected):
+        self.assertEqual(len(store), len(expected))
+        self.assertEqual(store.columns, expected.columns)
+        self.assertEqual(store.dates.tolist(), expected.dates.tolist())
+        self.assertEqual(store.parcel_ids.tolist(), expected.parcel_ids.tolist())
+        for date in expected.dates.tolist():
+            self.assertEqual(store.date_rows(date), expected.date_rows(date))
+            pd.testing.assert_frame_equal(store.for_date(date), expected.for_date(date))
+        for parcel_id in expected.parcel_ids.tolist():
+            np.testing.assert_array_equal(store.parcel_rows(parcel_id), expected.parcel_rows(parcel_id))
+            pd.testing.assert_frame_equal(store.parcel_history(parcel_id, '2025-01-16', '2025-01-17'),
+                                          expected.parcel_history(parcel_id, '2025-01-16', '2025-01-17'))
+        self.assertEqual(store.records(slice(0, len(store))), expected.records(slice(0, len(expected))))
+        self.assertEqual(len(store.alert_records), len(expected.alert_records))
+
+    def test_append_new_dates(self):
+        """Test appending the rows of dates after the last loaded date"""
+        old = climate_rows(self.parcels, self.dates[:2], seed=1)
+        new = climate_rows(self.parcels, self.dates[2:], seed=2)
+        store = RiskStore(old).append(new)
+        self.assertSameStore(store, RiskStore(pd.concat([old, new], ignore_index=True)))
+        self.assertEqual(store.max_date, self.dates[-1])
+
+    def test_append_new_parcels_on_loaded_dates(self):
+        """Test merging the history of new parcels into the loaded dates"""
+        old = climate_rows(self.parcels[:2], self.dates[:3], seed=1)
+        new = pd.concat([
+            climate_rows(self.parcels[2:], self.dates, seed=2),
+            climate_rows(self.parcels[:2], self.dates[3:], seed=3),
+        ], ignore_index=True)
+        store = RiskStore(old).append(new)
+        self.assertSameStore(store, RiskStore(pd.concat([old, new], ignore_index=True)))
+        self.assertIn('Field_C', store.parcel_ids.tolist())
+
+    def test_append_to_empty_store(self):
+        rows = climate_rows(self.parcels, self.dates)
+        self.assertSameStore(RiskStore(rows.iloc[:0]).append(rows), RiskStore(rows))
+
+    def test_append_no_rows(self):
+        rows = climate_rows(self.parcels, self.dates)
+        self.assertSameStore(RiskStore(rows).append(rows.iloc[:0]), RiskStore(rows))
+
+    def test_original_store_unchanged(self):
+        """Test that the store being appended to keeps serving its own rows"""
+        old = climate_rows(self.parcels[:2], self.dates[:2], seed=1)
+        store = RiskStore(old)
+        store.append(climate_rows(self.parcels, self.dates[1:], seed=2))
+        self.assertSameStore(store, RiskStore(old))
+
+    def test_missing_columns(self):
+        rows = climate_rows(self.parcels, self.dates)
+        with self.assertRaises(ValueError):
+            RiskStore(rows).append(rows.drop(columns=['risk_level']))
+
+
+
+class ClimateAppendTestCase(unittest.TestCase):
+    """Test case checking that appending days gives the same data as regenerating the file"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.climate_file = os.path.join(self.directory, 'climate_risk.csv')
+        self.parcels = gpd.read_file(os.path.join(ROOT, 'data', 'parcels.geojson'))
+        self.client = app_module.app.test_client()
+
+        # Cleanups run last first: the climate file of the repository is loaded again at the end
+        self.addCleanup(app_module.reload_data)
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = mock.patch.object(app_module, 'CLIMATE_FILE', self.climate_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def responses(self):
+        """Return the climate responses served from the loaded data"""
+        dates = app_module.risk_store.dates.tolist()
+        bodies = [json.loads(self.client.get(f'/map_data/batch?risk_type={risk_type}').data)
+                  for risk_type in ('general', 'drought', 'flood')]
+        bodies += [json.loads(self.client.get(f'/api/risk_data?date={date}').data) for date in dates]
+        bodies.append(json.loads(self.client.get('/api/risk_data?parcel_id=' + self.parcels['id'][0]).data))
+        return bodies
+
+    def test_file_matches_regeneration(self):
+        """Test that the appended file holds the rows of a file generated with every day and parcel"""
+        generate_climate_data(self.parcels.iloc[:-3], days=5, seed=9).to_csv(self.climate_file, index=False)
+        update_climate_data(self.parcels, self.climate_file, new_days=1, seed=9)
+        update_climate_data(self.parcels, self.climate_file, new_days=2, seed=9)
+
+        appended = pd.read_csv(self.climate_file).sort_values(['parcel_id', 'date'], ignore_index=True)
+        expected = generate_climate_data(self.parcels, days=8, seed=9)
+        expected = pd.read_csv(io.StringIO(expected.to_csv(index=False)))
+        pd.testing.assert_frame_equal(appended, expected.sort_values(['parcel_id', 'date'], ignore_index=True))
+
+    def test_loaded_data_matches_reload(self):
+        """Test that the appended rows serve the same responses as reloading every dataset"""
+        generate_climate_data(self.parcels, days=5, seed=9).to_csv(self.climate_file, index=False)
+        app_module.reload_data()
+        self.responses()
+        old_store = app_module.risk_store
+
+        update_climate_data(self.parcels, self.climate_file, new_days=2, seed=9)
+        self.assertEqual(app_module.append_climate_data(), 2 * len(self.parcels))
+        self.assertIsNot(app_module.risk_store, old_store)
+        self.assertEqual(app_module.risk_store.max_date, '2025-01-21')
+        appended = self.responses()
+        self.assertEqual(len(appended[0]['dates']), 7)
+
+        app_module.reload_data()
+        self.assertEqual(appended, self.responses())
+
+
+if __name__ == '__main__':
+    unittest.main()
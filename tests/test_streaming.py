@@ -0,0 +1,182 @@
+"""
+Tests for the cursor pagination and NDJSON streaming of the main application
+(data/streaming.py).
+"""
+import json
+import unittest
+import numpy as np
+import pandas as pd
+from werkzeug.datastructures import MultiDict
+
+from data.risk_store import RiskStore
+from data.streaming import (
+    parse_page_args, row_positions, paginate, ndjson_lines, StaleCursorError, MAX_PAGE_SIZE
+)
+from tests.app_env import app_module
+
+
+def all_pages(rows, limit, version=None):
+    """Follow the cursors from the first page to the last one"""
+    pages = []
+    after = None
+    while True:
+        page, after = paginate(rows, limit=limit, after=after, version=version)
+        pages.append(page)
+        if after is None:
+            return pages
+
+
+class PaginationTestCase(unittest.TestCase):
+    """Test case for the cursor pagination"""
+
+    def test_pages_cover_every_row_once(self):
+        """Test that following the cursors returns every row exactly once, in order"""
+        selections = [
+            row_positions(slice(0, 95), 95),
+            row_positions(np.array([90, 3, 17, 4, 58, 21, 77]), 95),
+            row_positions(np.arange(0, 200, 3), 200),
+        ]
+        for rows in selections:
+            for limit in (1, 2, 7, 10, len(rows), len(rows) + 1):
+                pages = all_pages(rows, limit, version='v1')
+                self.assertTrue(all(len(page) <= limit for page in pages))
+                np.testing.assert_array_equal(np.concatenate(pages), rows)
+
+    def test_last_page_has_no_cursor(self):
+        """Test that only pages followed by more rows return a cursor"""
+        rows = np.arange(10)
+        page, cursor = paginate(rows, limit=5, version='v1')
+        self.assertEqual(cursor, 'v1:4')
+        page, cursor = paginate(rows, limit=5, after=cursor, version='v1')
+        np.testing.assert_array_equal(page, np.arange(5, 10))
+        self.assertIsNone(cursor)
+
+    def test_cursor_after_the_selection(self):
+        """Test that a cursor past the last row returns an empty page"""
+        page, cursor = paginate(np.array([2, 5, 9]), limit=2, after='9')
+        self.assertEqual(len(page), 0)
+        self.assertIsNone(cursor)
+
+    def test_cursor_between_rows(self):
+        """Test that a cursor that is not a selected row starts at the next row"""
+        page, _ = paginate(np.array([2, 5, 9, 14]), limit=2, after='6')
+        np.testing.assert_array_equal(page, [9, 14])
+
+    def test_stale_cursor(self):
+        """Test that a cursor of another version of the rows is rejected"""
+        rows = np.arange(10)
+        _, cursor = paginate(rows, limit=5, version='v1')
+        for version in ('v2', None):
+            with self.assertRaises(StaleCursorError):
+                paginate(rows, limit=5, after=cursor, version=version)
+        with self.assertRaises(StaleCursorError):
+            paginate(rows, limit=5, after='4', version='v1')
+
+    def test_invalid_cursor(self):
+        for cursor in ('x', 'v1:', 'v1:x'):
+            with self.assertRaises(ValueError):
+                paginate(np.arange(10), limit=5, after=cursor, version='v1')
+
+    def test_row_positions(self):
+        """Test the conversion of slices and unsorted arrays to sorted positions"""
+        np.testing.assert_array_equal(row_positions(slice(2, 5), 10), [2, 3, 4])
+        np.testing.assert_array_equal(row_positions(slice(8, 20), 10), [8, 9])
+        np.testing.assert_array_equal(row_positions([7, 1, 4], 10), [1, 4, 7])
+
+
+class PageArgsTestCase(unittest.TestCase):
+    """Test case for the query parameter parsing"""
+
+    def test_defaults(self):
+        self.assertEqual(parse_page_args(MultiDict()), ('json', None, None))
+
+    def test_values(self):
+        args = MultiDict({'format': 'NDJSON', 'limit': '50', 'after': 'v1:120'})
+        self.assertEqual(parse_page_args(args), ('ndjson', 50, 'v1:120'))
+
+    def test_invalid_values(self):
+        for args in ({'format': 'xml'}, {'limit': '0'}, {'limit': str(MAX_PAGE_SIZE + 1)},
+                     {'limit': 'ten'}):
+            with self.assertRaises(ValueError):
+                parse_page_args(MultiDict(args))
+
+
+class RiskStoreVersionTestCase(unittest.TestCase):
+    """Test case for the version of the row order of the risk store"""
+
+    def setUp(self):
+        self.store = RiskStore(pd.DataFrame({'parcel_id': ['A', 'B', 'A', 'B'], 'date': ['d1', 'd1', 'd2', 'd2']}))
+        self.store.version = 'v1'
+
+    def test_later_dates_keep_the_version(self):
+        """Test that appending later dates, which keeps the row positions, keeps the version"""
+        store = self.store.append(pd.DataFrame({'parcel_id': ['A', 'B'], 'date': ['d3', 'd3']}), version='v2')
+        self.assertEqual(store.version, 'v1')
+
+    def test_merged_rows_change_the_version(self):
+        """Test that merging rows into loaded dates, which moves rows, changes the version"""
+        store = self.store.append(pd.DataFrame({'parcel_id': ['C'], 'date': ['d1']}), version='v2')
+        self.assertEqual(store.version, 'v2')
+        self.assertEqual(self.store.version, 'v1')
+
+
+class PaginatedEndpointTestCase(unittest.TestCase):
+    """Test case for the paginated /api/risk_data endpoint"""
+
+    def setUp(self):
+        """Set up a test client and load the data"""
+        self.client = app_module.app.test_client()
+        self.client.get('/api/ready')
+
+    def test_pages_cover_every_row_once(self):
+        """Test that following X-Next-Cursor returns the same rows as the unpaginated response"""
+        expected = self.client.get('/api/risk_data?date=2025-01-20').get_json()
+        rows, cursor = [], None
+        while True:
+            url = '/api/risk_data?date=2025-01-20&limit=7' + (f'&after={cursor}' if cursor else '')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            rows.extend(response.get_json())
+            cursor = response.headers.get('X-Next-Cursor')
+            if cursor is None:
+                break
+        self.assertEqual(rows, expected)
+
+    def test_stale_cursor_conflict(self):
+        """Test that a cursor issued before the rows were renumbered is answered with 409"""
+        cursor = self.client.get('/api/risk_data?date=2025-01-20&limit=5').headers['X-Next-Cursor']
+        store = app_module.risk_store
+        try:
+            app_module.risk_store = store.append(store.for_date('2025-01-20').iloc[:1], version='renumbered')
+            response = self.client.get(f'/api/risk_data?date=2025-01-20&limit=5&after={cursor}')
+        finally:
+            app_module.risk_store = store
+        self.assertEqual(response.status_code, 409)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/risk_data?limit=5&after=abc').status_code, 400)
+
+
+class NDJSONTestCase(unittest.TestCase):
+    """Test case for the NDJSON streaming"""
+
+    def test_lines_in_chunks(self):
+        """Test that every row is streamed once as one JSON line, in bounded chunks"""
+        rows = np.arange(25)
+        chunks_sizes = []
+
+        def records_for(chunk_rows):
+            chunks_sizes.append(len(chunk_rows))
+            return [{'row': int(row)} for row in chunk_rows]
+
+        body = b''.join(ndjson_lines(records_for, rows, chunk_size=10))
+        lines = body.decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['row'] for line in lines], list(range(25)))
+        self.assertEqual(chunks_sizes, [10, 10, 5])
+
+    def test_no_rows(self):
+        self.assertEqual(list(ndjson_lines(lambda rows: [], np.array([], dtype=np.intp))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
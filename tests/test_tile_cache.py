@@ -0,0 +1,89 @@
+"""
+Tests for the on-disk tile cache (data/tile_cache.py) and the removal of the
+tiles of previous data versions.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from data.tile_cache import DiskTileCache
+from tests.app_env import app_module
+
+
+class DiskTileCacheTestCase(unittest.TestCase):
+    """Test case for the tile files of each data version"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = DiskTileCache(self.root, 'mvt')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get('v1', 'parcels', 3, 1, 2))
+        self.cache.put('v1', 'parcels', 3, 1, 2, b'tile')
+        self.assertEqual(self.cache.get('v1', 'parcels', 3, 1, 2), b'tile')
+        self.assertEqual(os.listdir(os.path.dirname(self.cache.path('v1', 'parcels', 3, 1, 2))), ['2.mvt'])
+
+    def test_concurrent_writers(self):
+        """Test that threads writing the same tile do not share a temporary file"""
+        temp_paths = []
+        barrier = threading.Barrier(8)
+        replace = os.replace
+
+        def slow_replace(source, target):
+            temp_paths.append(source)
+            barrier.wait(timeout=5)
+            replace(source, target)
+
+        with mock.patch('data.tile_cache.os.replace', side_effect=slow_replace):
+            threads = [threading.Thread(target=self.cache.put, args=('v1', 'parcels', 3, 1, 2, bytes([n]) * 1000))
+                       for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(set(temp_paths)), 8)
+        tile = self.cache.get('v1', 'parcels', 3, 1, 2)
+        self.assertEqual(len(tile), 1000)
+        self.assertEqual(len(set(tile)), 1)
+
+    def test_prune(self):
+        """Test that only the tiles of the kept version remain"""
+        for version in ('v1', 'v2', 'v3'):
+            self.cache.put(version, 'parcels', 3, 1, 2, b'tile')
+        self.assertEqual(sorted(self.cache.prune('v3')), ['v1', 'v2'])
+        self.assertEqual(os.listdir(self.root), ['v3'])
+        self.assertEqual(self.cache.get('v3', 'parcels', 3, 1, 2), b'tile')
+
+    def test_prune_missing_directory(self):
+        self.assertEqual(DiskTileCache(os.path.join(self.root, 'missing'), 'png').prune('v1'), [])
+
+
+class TileVersionTestCase(unittest.TestCase):
+    """Test case for the tile directories of the application"""
+
+    def test_reload_removes_old_versions(self):
+        """Test that installing the data deletes the tile directories of other versions"""
+        client = app_module.app.test_client()
+        self.assertEqual(client.get('/tiles/flood/8/86/152.png?date=2025-01-20').status_code, 200)
+        stale = os.path.join(app_module.TILE_CACHE_DIR, 'stale0version')
+        os.makedirs(os.path.join(stale, 'parcels'))
+
+        self.assertEqual(client.post('/api/reload').status_code, 200)
+        for _ in range(50):
+            if not os.path.exists(stale):
+                break
+            time.sleep(0.05)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.isdir(os.path.join(app_module.TILE_CACHE_DIR, app_module.data_version)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+"""
+Tests for the Mapbox Vector Tile encoder of the main application
+(data/vector_tiles.py). Tiles are decoded with a small protobuf reader and
+compared with the parcel geometries they were rendered from.
+"""
+import struct
+import unittest
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, box
+
+from data.geometry_pyramid import GeometryPyramid
+from data.vector_tiles import (
+    ParcelTiles, LAYER_NAME, EXTENT, BUFFER, tile_bounds, project_to_tile, polygon_commands, valid_tile
+)
+
+
+# Protobuf decoding
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+
+def read_fields(data):
+    """Return the (field number, value) pairs of a message (bytes for length-delimited fields)"""
+    fields = []
+    offset = 0
+    while offset < len(data):
+        key, offset = read_varint(data, offset)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, offset = read_varint(data, offset)
+        elif wire_type == 1:
+            value = data[offset:offset + 8]
+            offset += 8
+        elif wire_type == 2:
+            length, offset = read_varint(data, offset)
+            value = data[offset:offset + length]
+            offset += length
+        else:
+            raise ValueError(f'Unexpected wire type {wire_type}')
+        fields.append((field, value))
+    return fields
+
+
+def read_packed(data):
+    values = []
+    offset = 0
+    while offset < len(data):
+        value, offset = read_varint(data, offset)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    field, value = read_fields(data)[0]
+    if field == 1:
+        return value.decode('utf-8')
+    if field == 3:
+        return struct.unpack('<d', value)[0]
+    if field == 6:
+        return unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise ValueError(f'Unexpected value field {field}')
+
+
+def decode_rings(commands):
+    """Decode MVT geometry commands into lists of (x, y) rings"""
+    rings, ring = [], None
+    x = y = 0
+    i = 0
+    while i < len(commands):
+        command, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            rings.append(ring + [ring[0]])
+            continue
+        for _ in range(count):
+            x += unzigzag(commands[i])
+            y += unzigzag(commands[i + 1])
+            i += 2
+            if command == 1:
+                ring = [(x, y)]
+            else:
+                ring.append((x, y))
+    return rings
+
+
+def decode_tile(data):
+    """Decode a tile into {layer name: {'version', 'extent', 'features'}}"""
+    layers = {}
+    for field, layer_data in read_fields(data):
+        assert field == 3
+        layer = {'features': [], 'keys': [], 'values': []}
+        for layer_field, value in read_fields(layer_data):
+            if layer_field == 15:
+                layer['version'] = value
+            elif layer_field == 1:
+                layer['name'] = value.decode('utf-8')
+            elif layer_field == 2:
+                layer['features'].append(read_fields(value))
+            elif layer_field == 3:
+                layer['keys'].append(value.decode('utf-8'))
+            elif layer_field == 4:
+                layer['values'].append(decode_value(value))
+            elif layer_field == 5:
+                layer['extent'] = value
+
+        features = []
+        for feature_fields in layer['features']:
+            feature = dict(feature_fields)
+            tags = read_packed(feature.get(2, b''))
+            features.append({
+                'id': feature[1],
+                'type': feature[3],
+                'properties': {layer['keys'][k]: layer['values'][v] for k, v in zip(tags[::2], tags[1::2])},
+                'rings': decode_rings(read_packed(feature[4]))
+            })
+        layers[layer['name']] = {'version': layer['version'], 'extent': layer['extent'], 'features': features}
+    return layers
+
+
+def signed_area(ring):
+    """Shoelace area of a ring (positive for clockwise rings on screen, y pointing down)"""
+    xs, ys = np.array(ring, dtype=float).T
+    return 0.5 * np.sum(xs[:-1] * ys[1:] - xs[1:] * ys[:-1])
+
+
+def square(lon, lat, size):
+    return box(lon, lat, lon + size, lat + size)
+
+
+class VectorTileTestCase(unittest.TestCase):
+    """Test case decoding rendered parcel tiles"""
+
+    def setUp(self):
+        # Zoom 1 tiles are the four quadrants around (0, 0): two parcels in the
+        # north-west, one in the south-east and one across the south meridian
+        self.geometries = [
+            square(-60, 30, 10),
+            square(-40, 30, 10),
+            square(50, -40, 10),
+            Polygon([(-5, -30), (5, -30), (5, -20), (-5, -20)]),
+        ]
+        self.properties = [{'id': f'Field_{name}', 'crop': 'Soja'} for name in 'ABCD']
+        self.tiles = ParcelTiles(GeometryPyramid(self.geometries), self.properties)
+
+    def test_round_trip(self):
+        """Test that a decoded tile holds the parcels' ids, properties and geometry"""
+        levels = np.array([0.25, 0.123456, np.nan, 1.0])
+        layers = decode_tile(self.tiles.render(1, 0, 0, {'general_risk': levels}))
+
+        layer = layers[LAYER_NAME]
+        self.assertEqual(layer['version'], 2)
+        self.assertEqual(layer['extent'], EXTENT)
+        features = {feature['id']: feature for feature in layer['features']}
+        self.assertEqual(sorted(features), [1, 2])
+
+        self.assertEqual(features[1]['type'], 3)
+        self.assertEqual(features[1]['properties'], {'id': 'Field_A', 'crop': 'Soja', 'general_risk': 0.25})
+        self.assertEqual(features[2]['properties']['general_risk'], 0.1235)
+
+        for feature_id, feature in features.items():
+            expected = shapely.set_precision(project_to_tile(np.array([self.geometries[feature_id - 1]]), 1, 0, 0)[0], 1.0)
+            self.assertEqual(len(feature['rings']), 1)
+            decoded = Polygon(feature['rings'][0])
+            self.assertAlmostEqual(decoded.symmetric_difference(expected).area, 0.0)
+            # Exterior rings are clockwise on screen (positive area in tile coordinates)
+            self.assertGreater(signed_area(feature['rings'][0]), 0)
+
+    def test_missing_attribute_values_are_omitted(self):
+        layers = decode_tile(self.tiles.render(1, 1, 1, {'general_risk': np.array([0.1, 0.2, np.nan, 0.4])}))
+        properties = {feature['id']: feature['properties'] for feature in layers[LAYER_NAME]['features']}
+        self.assertNotIn('general_risk', properties[3])
+        self.assertEqual(properties[4]['general_risk'], 0.4)
+
+    def test_feature_counts_per_tile(self):
+        """Test that every tile holds exactly the parcels that intersect it"""
+        expected = {(0, 0): [1, 2], (1, 0): [], (0, 1): [4], (1, 1): [3, 4]}
+        for (x, y), feature_ids in expected.items():
+            tile = self.tiles.render(1, x, y)
+            if not feature_ids:
+                self.assertEqual(tile, b'')
+                continue
+            features = decode_tile(tile)[LAYER_NAME]['features']
+            self.assertEqual(sorted(feature['id'] for feature in features), feature_ids)
+
+    def test_clipped_to_tile_buffer(self):
+        """Test that a parcel crossing the tile edge is clipped to the buffer"""
+        features = decode_tile(self.tiles.render(1, 0, 1))[LAYER_NAME]['features']
+        xs = [x for ring in features[0]['rings'] for x, _ in ring]
+        self.assertLessEqual(max(xs), EXTENT + BUFFER)
+        self.assertGreaterEqual(min(xs), -BUFFER)
+
+    def test_polygon_with_hole(self):
+        """Test that interior rings are encoded counter-clockwise on screen"""
+        polygon = Polygon([(0, 0), (0, 100), (100, 100), (100, 0)], [[(20, 20), (80, 20), (80, 80), (20, 80)]])
+        rings = decode_rings(polygon_commands(polygon))
+        self.assertEqual(len(rings), 2)
+        self.assertGreater(signed_area(rings[0]), 0)
+        self.assertLess(signed_area(rings[1]), 0)
+        self.assertAlmostEqual(Polygon(rings[0], [rings[1]]).area, polygon.area)
+
+    def test_tile_bounds(self):
+        self.assertEqual(tile_bounds(0, 0, 0)[::2], (-180.0, 180.0))
+        west, south, east, north = tile_bounds(1, 1, 0)
+        self.assertEqual((west, south, east), (0.0, 0.0, 180.0))
+        self.assertAlmostEqual(north, 85.0511, places=4)
+
+    def test_valid_tile(self):
+        self.assertTrue(valid_tile(3, 7, 0))
+        self.assertFalse(valid_tile(3, 8, 0))
+        self.assertFalse(valid_tile(-1, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()